@@ -115,7 +115,13 @@ async def search(
     )
 
     # Get the most relevant text chunks
-    relevant_texts = similarity_search(question, latest_filter=True)
+    relevant_texts = similarity_search(
+        question,
+        latest_filter=True,
+        embedding_model_name=CONFIG["db"]["embedding_model_name"],
+        embedding_backend=CONFIG["db"].get("embedding_backend", "pytorch"),
+        onnx_quantize=CONFIG["db"].get("onnx_quantize", False),
+    )
 
     specific_prompt = _extractive_prompt.format(
         QuestionPlaceholder=question,
@@ -0,0 +1,148 @@
+"""
+Benchmark FAISS index types on the vectors of a built vector store.
+
+A sample of chunks is held out as queries, and every index type is built
+from the remaining vectors. Reports the build time, recall@k against exact
+search, p50/p99 single-query latency and bytes per stored vector.
+
+Usage:
+    python statschat/embedding/benchmark_indexes.py [FAISS_DB_ROOT]
+        [--types flat ivf_flat ivf_pq hnsw sq8] [--k 10] [--n-queries 500]
+        [--index-params '{"nprobe": 32}'] [--questions QUESTIONS_TXT]
+
+FAISS_DB_ROOT defaults to the store in the [db] config, and index parameters
+to its `index_params`. With --questions, each line of the file is embedded
+with the store's model and used as a query instead of held-out chunks.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from statschat.embedding.faiss_ids import index_vectors
+from statschat.embedding.index_types import INDEX_TYPES, build_index
+
+
+def store_vectors(faiss_db_root: Path) -> np.ndarray:
+    """Every vector in a saved store (approximate if the index is quantised)."""
+    index = faiss.read_index(str(Path(faiss_db_root) / "index.faiss"))
+    if isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+        return index_vectors(index)[1]
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def embed_questions(faiss_db_root: Path, questions_path: Path) -> np.ndarray:
+    """Embeds one question per line with the store's embedding model."""
+    from statschat.embedding.manifest import load_vector_store
+
+    with open(questions_path) as questions_file:
+        questions = [line.strip() for line in questions_file if line.strip()]
+    embeddings = load_vector_store(faiss_db_root).embedding_function
+    return np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+
+
+def benchmark(
+    index_type: str, vectors: np.ndarray, queries: np.ndarray, exact, k: int, params
+) -> dict:
+    """
+    Builds one index type and measures it against exact search.
+
+    Args:
+        index_type (str): One of `INDEX_TYPES`.
+        vectors (np.ndarray): Vectors to index.
+        queries (np.ndarray): Query vectors.
+        exact (np.ndarray): Exact top-k labels of each query.
+        k (int): Neighbours retrieved per query.
+        params (dict): Index parameters, see `build_index`.
+
+    Returns:
+        dict: Build seconds, recall@k, p50/p99 latency in ms and bytes per
+        vector.
+    """
+    start = time.perf_counter()
+    index = build_index(index_type, vectors, params)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, labels = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(labels[0])
+
+    recall = np.mean(
+        [len(set(row) & set(exact_row)) / k for row, exact_row in zip(found, exact)]
+    )
+    return {
+        "build_s": build_seconds,
+        "recall": recall,
+        "p50_ms": 1000 * np.percentile(latencies, 50),
+        "p99_ms": 1000 * np.percentile(latencies, 99),
+        "bytes_per_vector": len(faiss.serialize_index(index)) / len(vectors),
+    }
+
+
+def main():
+    from statschat import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("faiss_db_root", nargs="?", default=None, type=Path)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-queries", type=int, default=500)
+    parser.add_argument("--index-params", type=json.loads, default=None)
+    parser.add_argument("--questions", type=Path, default=None)
+    args = parser.parse_args()
+
+    config = load_config(name="main")
+    faiss_db_root = args.faiss_db_root or Path(
+        config["preprocess"]["data_dir"] + config["db"]["faiss_db_root"]
+    )
+    params = args.index_params or config["db"].get("index_params", {})
+
+    vectors = store_vectors(faiss_db_root)
+    if args.questions:
+        queries = embed_questions(faiss_db_root, args.questions)
+    else:
+        # Hold chunks out as queries, so no query finds itself
+        held_out = np.random.default_rng(0).permutation(len(vectors))
+        held_out = held_out[: min(args.n_queries, len(vectors) // 10)]
+        queries = vectors[held_out]
+        vectors = np.delete(vectors, held_out, axis=0)
+    if not len(queries):
+        print(f"Not enough vectors in {faiss_db_root} to benchmark.")
+        return
+
+    exact_index = faiss.IndexFlatL2(vectors.shape[1])
+    exact_index.add(vectors)
+    _, exact = exact_index.search(queries, args.k)
+
+    print(
+        f"\n{len(vectors)} vectors of dimension {vectors.shape[1]}, "
+        f"{len(queries)} queries, recall@{args.k} against exact search"
+    )
+    print(
+        f"{'index':<9} {'build s':>8} {'recall':>7} {'p50 ms':>7} "
+        f"{'p99 ms':>7} {'bytes/vec':>10}"
+    )
+    for index_type in args.types:
+        try:
+            result = benchmark(index_type, vectors, queries, exact, args.k, params)
+        except ValueError as e:
+            print(f"Skipping {index_type}: {e}")
+            continue
+        print(
+            f"{index_type:<9} {result['build_s']:>8.2f} {result['recall']:>7.3f} "
+            f"{result['p50_ms']:>7.3f} {result['p99_ms']:>7.3f} "
+            f"{result['bytes_per_vector']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+On-disk cache of chunk embeddings.
+
+Vectors are appended to one memory-mapped float32 file per model, and a
+SQLite table maps (model, normalised text hash) to a row of that file. Re-runs
+only call the embedding model for chunks it has not embedded before.
+
+The hashes of every chunk text sent to be embedded are also recorded as the
+corpus, from the last `SETUP` run onwards. This includes chunks that the
+filters then kept out of the vector store, whose vectors are still needed on
+the next run. Run this module to compact the cache, dropping entries for
+chunks that are no longer in the corpus or the vector store:
+
+    python statschat/embedding/embedding_cache.py [--max-age-days N]
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+CACHE_DIR = "embedding_cache"
+
+# Maximum number of parameters bound in a single SQLite query
+QUERY_CHUNK = 500
+
+
+def text_key(text: str) -> str:
+    """SHA-256 of a chunk's text with whitespace normalised."""
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+
+def _chunks(items: list, size: int = QUERY_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class EmbeddingCache:
+    """
+    Embedding vectors keyed by (model name, text hash), stored under `root`.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.root / "index.sqlite", timeout=60)
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER);
+                CREATE TABLE IF NOT EXISTS entries (
+                    model TEXT, text_hash TEXT, row INTEGER, last_used REAL,
+                    PRIMARY KEY (model, text_hash)
+                );
+                CREATE TABLE IF NOT EXISTS corpus (text_hash TEXT PRIMARY KEY);
+                """
+            )
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def vectors_path(self, model: str) -> Path:
+        """Memory-mapped vector file of a model."""
+        return self.root / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}.f32"
+
+    def dim(self, model: str) -> int:
+        """Embedding dimension recorded for a model, or None."""
+        row = self.connection.execute(
+            "SELECT dim FROM models WHERE model = ?", (model,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _vectors(self, model: str) -> np.ndarray:
+        """Read-only (rows, dim) view of a model's vector file."""
+        dim = self.dim(model)
+        path = self.vectors_path(model)
+        if dim is None or not path.exists() or path.stat().st_size == 0:
+            return np.empty((0, dim or 0), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r").reshape(-1, dim)
+
+    def get_many(self, model: str, keys: list[str]) -> dict[str, np.ndarray]:
+        """
+        Looks up cached vectors.
+
+        Args:
+            model (str): Embedding model name.
+            keys (list[str]): Text hashes, see `text_key`.
+
+        Returns:
+            dict: {text hash: vector} for the keys found.
+        """
+        rows = {}
+        for chunk in _chunks(list(set(keys))):
+            rows.update(
+                self.connection.execute(
+                    "SELECT text_hash, row FROM entries WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                    (model, *chunk),
+                )
+            )
+        if not rows:
+            return {}
+
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE entries SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(time.time(), model, key) for key in rows],
+            )
+
+        vectors = self._vectors(model)
+        return {key: np.array(vectors[row]) for key, row in rows.items()}
+
+    def put_many(self, model: str, keys: list[str], vectors: np.ndarray):
+        """
+        Appends vectors to the cache.
+
+        Args:
+            model (str): Embedding model name.
+            keys (list[str]): Text hashes, one per vector.
+            vectors (np.ndarray): (len(keys), dim) array.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+
+        dim = self.dim(model)
+        if dim is None:
+            dim = vectors.shape[1]
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO models VALUES (?, ?)", (model, dim)
+                )
+        elif dim != vectors.shape[1]:
+            raise ValueError(
+                f"Cached embeddings for {model!r} have dimension {dim}, "
+                f"got {vectors.shape[1]}"
+            )
+
+        path = self.vectors_path(model)
+        first_row = path.stat().st_size // (4 * dim) if path.exists() else 0
+        with open(path, "ab") as vector_file:
+            vector_file.write(vectors.tobytes())
+
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                [
+                    (model, key, first_row + offset, now)
+                    for offset, key in enumerate(keys)
+                ],
+            )
+
+    def add_corpus_keys(self, keys: list[str]):
+        """Records text hashes of chunks in the current corpus."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO corpus VALUES (?)", [(key,) for key in keys]
+            )
+
+    def clear_corpus(self):
+        """Forgets the corpus, before a run that embeds all of it again."""
+        with self.connection:
+            self.connection.execute("DELETE FROM corpus")
+
+    def corpus_keys(self) -> set:
+        """Text hashes of every chunk recorded in the corpus."""
+        return {key for (key,) in self.connection.execute("SELECT * FROM corpus")}
+
+    def compact(self, live_keys: set = None, max_age_days: float = None) -> int:
+        """
+        Removes entries whose text is not in `live_keys`, or that have not
+        been used for `max_age_days`, and rewrites each vector file without
+        the freed rows.
+
+        Args:
+            live_keys (set, optional): Text hashes of the chunks still in the
+                corpus. Entries are not filtered by text if omitted.
+            max_age_days (float, optional): Maximum age since last use.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        min_used = time.time() - max_age_days * 86400 if max_age_days else 0
+        removed = 0
+        models = [
+            model for (model,) in self.connection.execute("SELECT model FROM models")
+        ]
+        for model in models:
+            entries = self.connection.execute(
+                "SELECT text_hash, row, last_used FROM entries WHERE model = ? "
+                "ORDER BY row",
+                (model,),
+            ).fetchall()
+            kept = [
+                (key, row, last_used)
+                for key, row, last_used in entries
+                if (live_keys is None or key in live_keys) and last_used >= min_used
+            ]
+            removed += len(entries) - len(kept)
+            self._rewrite(model, kept)
+
+        self.connection.execute("VACUUM")
+        return removed
+
+    def _rewrite(self, model: str, kept: list[tuple]):
+        """Writes the kept rows of a model to a new vector file, in order."""
+        vectors = self._vectors(model)
+        path = self.vectors_path(model)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "wb") as vector_file:
+            for chunk in _chunks(kept):
+                rows = [row for _, row, _ in chunk]
+                vector_file.write(np.asarray(vectors[rows]).tobytes())
+        del vectors
+
+        with self.connection:
+            self.connection.execute("DELETE FROM entries WHERE model = ?", (model,))
+            self.connection.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?)",
+                [
+                    (model, key, new_row, last_used)
+                    for new_row, (key, _, last_used) in enumerate(kept)
+                ],
+            )
+            os.replace(tmp_path, path)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model so `embed_documents` only encodes texts that
+    are not already in the `EmbeddingCache`. Queries are never cached.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        self.cache.add_corpus_keys(keys)
+        vectors = self.cache.get_many(self.model_name, keys)
+
+        # Encode each missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            new_vectors = np.asarray(
+                self.embeddings.embed_documents(list(missing.values())),
+                dtype=np.float32,
+            )
+            self.cache.put_many(self.model_name, list(missing), new_vectors)
+            vectors.update(zip(missing, new_vectors))
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def close(self):
+        """Closes the cache and the wrapped model's resources."""
+        self.cache.close()
+        if hasattr(self.embeddings, "close"):
+            self.embeddings.close()
+
+
+def vector_store_keys(faiss_db_roots: list[Path]) -> set:
+    """
+    Text hashes of every chunk in the given FAISS stores, read from their
+    pickled docstores.
+
+    Args:
+        faiss_db_roots (list[Path]): Vector store directories.
+
+    Returns:
+        set: Text hashes, see `text_key`.
+    """
+    keys = set()
+    for root in faiss_db_roots:
+        index_path = Path(root) / "index.pkl"
+        if not index_path.exists():
+            continue
+        with open(index_path, "rb") as index_file:
+            docstore, _ = pickle.load(index_file)
+        keys.update(text_key(doc.page_content) for doc in docstore._dict.values())
+    return keys
+
+
+def main():
+    from statschat import load_config
+
+    parser = argparse.ArgumentParser(
+        description="Drop cached embeddings of chunks no longer in the corpus."
+    )
+    parser.add_argument("--max-age-days", type=float, default=None)
+    args = parser.parse_args()
+
+    config = load_config(name="main")
+    data_dir = config["preprocess"]["data_dir"]
+    faiss_db_root = data_dir + config["db"]["faiss_db_root"]
+
+    cache = EmbeddingCache(Path(data_dir) / CACHE_DIR)
+    # The store covers caches filled before the corpus was recorded
+    live_keys = cache.corpus_keys() | vector_store_keys([faiss_db_root])
+    if not live_keys:
+        print("No corpus or vector store found; compacting by age only.")
+    removed = cache.compact(live_keys or None, args.max_age_days)
+    print(f"Removed {removed} cached embedding(s) from {cache.root}")
+
+
+if __name__ == "__main__":
+    main()
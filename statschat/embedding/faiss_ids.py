@@ -0,0 +1,234 @@
+"""
+In-place updates of a LangChain FAISS store, keyed by stable chunk ID.
+
+The FAISS labels are 63-bit hashes of the chunk IDs. IVF indexes store
+these labels in their inverted lists; other index types are wrapped in an
+`IndexIDMap2`. Adding or removing chunks then only touches those chunks,
+instead of rebuilding or merging the whole store. The saved files are still
+an ordinary LangChain FAISS store, so loaders need no changes.
+
+HNSW graphs cannot remove vectors, so chunks removed from them are only
+dropped from the docstore and their vectors marked as removed. The vectors
+are left out in one rebuild by `compact_index`, which must run before the
+store is searched or saved.
+"""
+
+import hashlib
+import weakref
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from statschat.embedding.index_types import empty_like, supports_removal
+
+# {store: storage positions of removed vectors still in the index}
+_removed_positions = weakref.WeakKeyDictionary()
+
+
+def faiss_id(chunk_id: str) -> int:
+    """Stable non-negative 63-bit FAISS label for a chunk ID."""
+    digest = hashlib.sha256(chunk_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def new_vector_store(
+    embeddings: Embeddings, dim: int, index: faiss.Index = None
+) -> FAISS:
+    """
+    Empty FAISS store labelled by chunk ID.
+
+    Args:
+        embeddings (Embeddings): Model used to embed queries.
+        dim (int): Embedding dimension.
+        index (faiss.Index, optional): Empty (trained) index, see
+            `index_types.build_index`. Defaults to a flat L2 index.
+
+    Returns:
+        FAISS: The store.
+    """
+    return FAISS(
+        embedding_function=embeddings,
+        index=with_ids(index or faiss.IndexFlatL2(dim)),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """
+    An empty index ready for `add_with_ids`: IVF indexes as they are, other
+    types wrapped in an `IndexIDMap2`.
+    """
+    return index if isinstance(index, faiss.IndexIVF) else faiss.IndexIDMap2(index)
+
+
+def ensure_id_mapped(db: FAISS) -> FAISS:
+    """
+    Converts a store built with positional labels (e.g. by
+    `FAISS.from_documents`) to chunk ID labels. This reads every vector once,
+    so it only happens the first time an older store is updated.
+
+    Args:
+        db (FAISS): The store, modified in place.
+
+    Returns:
+        FAISS: The same store.
+    """
+    if isinstance(db.index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+        return db
+
+    vectors = db.index.reconstruct_n(0, db.index.ntotal)
+    chunk_ids = [db.index_to_docstore_id[position] for position in range(len(vectors))]
+    labels = np.array([faiss_id(chunk_id) for chunk_id in chunk_ids], dtype=np.int64)
+
+    db.index = faiss.IndexIDMap2(faiss.IndexFlatL2(db.index.d))
+    db.index.add_with_ids(vectors, labels)
+    db.index_to_docstore_id = dict(zip(labels.tolist(), chunk_ids))
+
+    return db
+
+
+def index_vectors(index: faiss.Index) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Every label and vector of an ID-mapped or IVF index, in storage order.
+    Quantised indexes return their approximate reconstructions.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        labels = faiss.vector_to_array(index.id_map)
+        inner = faiss.downcast_index(index.index)
+        if not isinstance(inner, faiss.IndexIVF):
+            return labels, inner.reconstruct_n(0, inner.ntotal)
+        # Stores from before IVF indexes held their own labels
+        inner.make_direct_map()
+        vectors = inner.reconstruct_n(0, inner.ntotal)
+        inner.make_direct_map(False)
+        return labels, vectors
+
+    invlists = index.invlists
+    labels = np.concatenate(
+        [
+            faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy()
+            for list_no in range(index.nlist)
+            for size in [invlists.list_size(list_no)]
+            if size
+        ]
+        or [np.zeros(0, dtype=np.int64)]
+    )
+    # IVF lists need a direct map to reconstruct, which is not worth saving
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    vectors = index.reconstruct_batch(labels)
+    index.set_direct_map_type(faiss.DirectMap.NoMap)
+    return labels, vectors
+
+
+def labelled_vectors(db: FAISS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Every label and vector of a store, in storage order, leaving out the
+    vectors of removed chunks not yet compacted away.
+    """
+    labels, vectors = index_vectors(db.index)
+    removed = _removed_positions.get(db)
+    if removed:
+        keep = np.ones(len(labels), dtype=bool)
+        keep[list(removed)] = False
+        labels, vectors = labels[keep], vectors[keep]
+    return labels, vectors
+
+
+def rebuild_index(db: FAISS, index: faiss.Index) -> FAISS:
+    """
+    Moves the store's vectors into a new empty `index`, keeping their
+    labels and leaving out those of removed chunks.
+
+    Args:
+        db (FAISS): Store labelled by chunk ID, modified in place.
+        index (faiss.Index): Empty (trained) index.
+
+    Returns:
+        FAISS: The same store.
+    """
+    labels, vectors = labelled_vectors(db)
+    db.index = with_ids(index)
+    db.index.add_with_ids(vectors, labels)
+    _removed_positions.pop(db, None)
+
+    return db
+
+
+def compact_index(db: FAISS) -> FAISS:
+    """
+    Rebuilds an index that cannot remove vectors in place (HNSW), once,
+    without the vectors of chunks removed since it was loaded. Does nothing
+    if no chunks were removed.
+
+    Args:
+        db (FAISS): Store labelled by chunk ID, modified in place.
+
+    Returns:
+        FAISS: The same store.
+    """
+    if _removed_positions.get(db):
+        rebuild_index(db, empty_like(db.index))
+    return db
+
+
+def remove_chunks(db: FAISS, chunk_ids) -> int:
+    """
+    Removes chunks from the store by chunk ID, ignoring unknown IDs. Where
+    the index cannot remove vectors in place, they are marked for
+    `compact_index`.
+
+    Args:
+        db (FAISS): Store labelled by chunk ID, see `ensure_id_mapped`.
+        chunk_ids (Iterable[str]): Chunks to remove.
+
+    Returns:
+        int: Number of chunks removed.
+    """
+    labels = [faiss_id(chunk_id) for chunk_id in set(chunk_ids)]
+    labels = [label for label in labels if label in db.index_to_docstore_id]
+    if not labels:
+        return 0
+
+    labels = np.array(labels, dtype=np.int64)
+    if supports_removal(db.index):
+        db.index.remove_ids(labels)
+    else:
+        # Positions, not labels, since an upsert re-adds the same label
+        positions = np.isin(faiss.vector_to_array(db.index.id_map), labels)
+        removed = _removed_positions.setdefault(db, set())
+        removed.update(np.flatnonzero(positions).tolist())
+    db.docstore.delete(
+        [db.index_to_docstore_id.pop(label) for label in labels.tolist()]
+    )
+
+    return len(labels)
+
+
+def upsert_chunks(db: FAISS, documents: list[Document], vectors) -> FAISS:
+    """
+    Adds embedded chunks to the store, replacing any with the same chunk ID.
+
+    Args:
+        db (FAISS): Store labelled by chunk ID, see `new_vector_store`.
+        documents (list[Document]): Chunks, with their ID under `chunk_id`
+            in the metadata.
+        vectors: One embedding per chunk.
+
+    Returns:
+        FAISS: The same store.
+    """
+    chunk_ids = [document.metadata["chunk_id"] for document in documents]
+    remove_chunks(db, chunk_ids)
+
+    labels = np.array([faiss_id(chunk_id) for chunk_id in chunk_ids], dtype=np.int64)
+    db.index.add_with_ids(np.asarray(vectors, dtype=np.float32), labels)
+    db.docstore.add(dict(zip(chunk_ids, documents)))
+    db.index_to_docstore_id.update(zip(labels.tolist(), chunk_ids))
+
+    return db
@@ -0,0 +1,174 @@
+"""
+FAISS index types selectable in the `[db]` config.
+
+- `flat`: exact search (LangChain's default `IndexFlatL2`).
+- `ivf_flat`: inverted file of `nlist` k-means cells, `nprobe` searched.
+- `ivf_pq`: as `ivf_flat`, with vectors product-quantised to `pq_m` codes of
+  `pq_bits` bits.
+- `hnsw`: hierarchical navigable small-world graph with `hnsw_m` links.
+- `sq8`: exact scan over vectors quantised to 8 bits per dimension.
+
+All use L2 distance, like the stores LangChain builds.
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8")
+DEFAULT_INDEX_PARAMS = {
+    "nlist": 0,  # 0 picks about 4 * sqrt(number of vectors)
+    "nprobe": 16,
+    "pq_m": 16,
+    "pq_bits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "ef_search": 64,
+    "train_size": 100000,
+}
+
+
+def merge_index_params(index_params: dict = None) -> dict:
+    """`index_params` over the defaults, rejecting unknown keys."""
+    unknown = set(index_params or {}) - set(DEFAULT_INDEX_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown index_params: {', '.join(sorted(unknown))}")
+    return {**DEFAULT_INDEX_PARAMS, **(index_params or {})}
+
+
+def factory_string(index_type: str, dim: int, n_vectors: int, params: dict) -> str:
+    """`faiss.index_factory` description of an index type."""
+    nlist = params["nlist"] or max(
+        1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39)
+    )
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        if dim % params["pq_m"]:
+            raise ValueError(
+                f"pq_m={params['pq_m']} must divide the embedding dimension {dim}"
+            )
+        return f"IVF{nlist},PQ{params['pq_m']}x{params['pq_bits']}"
+    if index_type == "hnsw":
+        return f"HNSW{params['hnsw_m']}"
+    if index_type == "sq8":
+        return "SQ8"
+    raise ValueError(
+        f"Unknown index_type {index_type!r}; choose from {', '.join(INDEX_TYPES)}"
+    )
+
+
+def build_index(index_type: str, vectors, index_params: dict = None) -> faiss.Index:
+    """
+    Creates an empty index of `index_type`, trained on a sample of `vectors`
+    where the type needs training.
+
+    Args:
+        index_type (str): One of `INDEX_TYPES`.
+        vectors: (n, dim) embeddings the index will hold.
+        index_params (dict, optional): Overrides of `DEFAULT_INDEX_PARAMS`.
+
+    Returns:
+        faiss.Index: The trained, empty index with its search parameters set.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    params = merge_index_params(index_params)
+    n_vectors, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(index_type, dim, n_vectors, params))
+
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params["ef_construction"]
+    if not index.is_trained:
+        if index_type == "ivf_pq" and n_vectors < 2 ** params["pq_bits"]:
+            raise ValueError(
+                f"ivf_pq with pq_bits={params['pq_bits']} needs at least "
+                f"{2 ** params['pq_bits']} vectors to train, got {n_vectors}"
+            )
+        rng = np.random.default_rng(0)
+        sample = rng.permutation(n_vectors)[: params["train_size"]]
+        index.train(vectors[np.sort(sample)])
+
+    set_search_params(index, params)
+    return index
+
+
+def unwrap_index(index: faiss.Index) -> faiss.Index:
+    """
+    The index inside an ID map, downcast to its concrete class. The ID map
+    owns it, so keep a reference to the ID map while using it.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def set_search_params(index: faiss.Index, index_params: dict = None):
+    """
+    Applies `nprobe` (IVF) or `ef_search` (HNSW), where given, to an index
+    or to the index inside an ID map. Both are saved with the index.
+    """
+    params = index_params or {}
+    merge_index_params(params)
+    index = unwrap_index(index)
+    if isinstance(index, faiss.IndexIVF) and "nprobe" in params:
+        index.nprobe = params["nprobe"]
+    elif isinstance(index, faiss.IndexHNSW) and "ef_search" in params:
+        index.hnsw.efSearch = params["ef_search"]
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """
+    Whether vectors can be removed in place: from an IVF index holding its
+    own labels, or from a flat index inside an ID map. HNSW graphs cannot
+    remove vectors, and IVF lists inside an ID map keep their positions when
+    others are removed, so they would no longer line up with the map.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return True
+    return isinstance(unwrap_index(index), faiss.IndexFlatCodes)
+
+
+def empty_like(index: faiss.Index) -> faiss.Index:
+    """
+    Empty copy of an index (or of the index inside an ID map), keeping its
+    training and search parameters.
+    """
+    index = unwrap_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        empty = faiss.index_factory(index.d, f"HNSW{index.hnsw.nb_neighbors(1)}")
+        empty.hnsw.efConstruction = index.hnsw.efConstruction
+        empty.hnsw.efSearch = index.hnsw.efSearch
+        return empty
+
+    empty = faiss.clone_index(index)
+    empty.reset()
+    return empty
+
+
+def describe_index(index: faiss.Index) -> dict:
+    """Type and main parameters of an index, for the store manifest."""
+    index = unwrap_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return {
+            "type": "hnsw",
+            "hnsw_m": index.hnsw.nb_neighbors(1),
+            "ef_search": index.hnsw.efSearch,
+        }
+    if isinstance(index, faiss.IndexIVFPQ):
+        return {
+            "type": "ivf_pq",
+            "nlist": index.nlist,
+            "nprobe": index.nprobe,
+            "pq_m": index.pq.M,
+            "pq_bits": index.pq.nbits,
+        }
+    if isinstance(index, faiss.IndexIVF):
+        return {"type": "ivf_flat", "nlist": index.nlist, "nprobe": index.nprobe}
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return {"type": "sq8"}
+    return {"type": "flat"}
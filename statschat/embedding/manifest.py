@@ -0,0 +1,177 @@
+"""
+Manifest describing how a FAISS vector store was built.
+
+`manifest.json` is written next to `index.faiss` and records the embedding
+model, vector dimension, normalisation, chunker settings and FAISS index
+type. Loaders read it to embed queries with the same model the store was
+built with, and refuse to load a store that does not match the configured
+model instead of returning meaningless search results.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+from langchain_community.vectorstores import FAISS
+from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+from statschat.embedding.index_types import describe_index, set_search_params
+from statschat.embedding.onnx_embeddings import EMBEDDING_BACKENDS, OnnxEmbeddings
+
+MANIFEST_NAME = "manifest.json"
+
+logger = logging.getLogger(__name__)
+
+
+def write_manifest(
+    faiss_db_root: Path,
+    db: FAISS,
+    embedding_model_name: str,
+    normalize_embeddings: bool = False,
+    chunker: dict = None,
+    embedding_backend: str = "pytorch",
+) -> dict:
+    """
+    Writes the manifest of a saved vector store.
+
+    Args:
+        faiss_db_root (Path): Directory the store was saved to.
+        db (FAISS): The store.
+        embedding_model_name (str): Model the chunks were embedded with.
+        normalize_embeddings (bool): Whether vectors were L2-normalised.
+        chunker (dict, optional): Settings of the text splitter.
+        embedding_backend (str): `pytorch`, `onnx` or `onnx-int8`.
+
+    Returns:
+        dict: The manifest.
+    """
+    manifest = {
+        "embedding_model_name": embedding_model_name,
+        "embedding_backend": embedding_backend,
+        "dimension": db.index.d,
+        "normalize_embeddings": normalize_embeddings,
+        "distance_strategy": str(db.distance_strategy.value),
+        "index": describe_index(db.index),
+        "chunker": chunker or {},
+        "n_chunks": db.index.ntotal,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with open(Path(faiss_db_root) / MANIFEST_NAME, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+    return manifest
+
+
+def read_manifest(faiss_db_root: Path) -> dict:
+    """The manifest of a vector store, or None for stores built without one."""
+    path = Path(faiss_db_root) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def check_manifest(
+    manifest: dict, faiss_db_root: Path, embedding_model_name: str = None
+) -> str:
+    """
+    Checks a store's manifest against the configured embedding model.
+
+    Args:
+        manifest (dict): See `read_manifest`; None skips the check.
+        faiss_db_root (Path): Store directory, for error messages.
+        embedding_model_name (str, optional): Configured model. If omitted,
+            the manifest's model is used.
+
+    Returns:
+        str: The embedding model to use with the store.
+
+    Raises:
+        ValueError: If the store was built with a different model.
+    """
+    if manifest is None:
+        if embedding_model_name is None:
+            raise ValueError(
+                f"{faiss_db_root} has no {MANIFEST_NAME}; "
+                "set embedding_model_name or rebuild the store"
+            )
+        logger.warning(
+            f"{faiss_db_root} has no {MANIFEST_NAME}; assuming it was built "
+            f"with {embedding_model_name}"
+        )
+        return embedding_model_name
+
+    built_with = manifest["embedding_model_name"]
+    if embedding_model_name is not None and embedding_model_name != built_with:
+        raise ValueError(
+            f"{faiss_db_root} was built with {built_with}, but "
+            f"embedding_model_name is {embedding_model_name}. Rebuild the store "
+            "(download_mode = SETUP) or configure the matching model."
+        )
+    return built_with
+
+
+def load_vector_store(
+    faiss_db_root: Path,
+    embedding_model_name: str = None,
+    index_params: dict = None,
+    embedding_backend: str = "pytorch",
+    onnx_quantize: bool = False,
+) -> FAISS:
+    """
+    Loads a FAISS store with the embedding model it was built with, failing
+    fast if that does not match the configured model or the vectors.
+
+    Args:
+        faiss_db_root (Path): Store directory.
+        embedding_model_name (str, optional): Configured model, see
+            `check_manifest`.
+        index_params (dict, optional): Search parameters (`nprobe`,
+            `ef_search`) overriding those saved with an approximate index.
+        embedding_backend (str): `pytorch` or `onnx` (ONNX Runtime) to embed
+            queries with, whichever backend built the store.
+        onnx_quantize (bool): Use the int8 ONNX model.
+
+    Returns:
+        FAISS: The store, embedding queries with the matching model.
+
+    Raises:
+        ValueError: If the model or vector dimension does not match.
+    """
+    manifest = read_manifest(faiss_db_root)
+    model_name = check_manifest(manifest, faiss_db_root, embedding_model_name)
+    normalize = bool(manifest and manifest.get("normalize_embeddings"))
+    if embedding_backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding_backend {embedding_backend!r}; "
+            f"choose from {', '.join(EMBEDDING_BACKENDS)}"
+        )
+    if embedding_backend == "onnx":
+        embeddings = OnnxEmbeddings(
+            model_name, quantize=onnx_quantize, normalize_embeddings=normalize
+        )
+    else:
+        embeddings = HuggingFaceEmbeddings(
+            model_name=model_name, encode_kwargs={"normalize_embeddings": normalize}
+        )
+
+    db = FAISS.load_local(
+        faiss_db_root, embeddings, allow_dangerous_deserialization=True
+    )
+    check_dimension(db, len(embeddings.embed_query("dimension check")), faiss_db_root)
+    set_search_params(db.index, index_params)
+
+    return db
+
+
+def check_dimension(db: FAISS, dimension: int, faiss_db_root: Path):
+    """
+    Raises ValueError if the store's vectors are not `dimension` long,
+    i.e. were embedded with a different model.
+    """
+    if db.index.d != dimension:
+        raise ValueError(
+            f"{faiss_db_root} holds {db.index.d}-dimensional vectors, but the "
+            f"embedding model produces {dimension}-dimensional ones"
+        )
@@ -0,0 +1,171 @@
+"""
+Near-duplicate chunk detection with MinHash and locality-sensitive hashing.
+
+Boilerplate repeated across publications (methodology notes, disclaimers,
+"About KNBS" pages) produces chunks whose text is almost identical. They are
+found from the text alone, before any embedding model call, so only one
+canonical copy is embedded.
+"""
+
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_WORDS = 3
+# Modulus of the universal hash family, the Mersenne prime 2**31 - 1. With
+# shingle hashes and coefficients below it, a * x + b stays below 2**63, so
+# the uint64 arithmetic cannot overflow
+MERSENNE_PRIME = np.uint64(2**31 - 1)
+
+
+def lsh_bands(threshold: float, num_perm: int = NUM_PERM) -> tuple[int, int]:
+    """
+    Splits `num_perm` MinHash values into (bands, rows) so that two texts
+    become LSH candidates at roughly the Jaccard similarity `threshold`,
+    which is about (1 / bands) ** (1 / rows).
+    """
+    splits = [
+        (bands, num_perm // bands)
+        for bands in range(1, num_perm + 1)
+        if num_perm % bands == 0
+    ]
+    return min(
+        splits, key=lambda split: abs((1 / split[0]) ** (1 / split[1]) - threshold)
+    )
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """
+    Hashes of the word `size`-grams of lower-cased text, reduced modulo
+    `MERSENNE_PRIME`.
+    """
+    words = text.lower().split()
+    grams = [
+        " ".join(words[i : i + size]) for i in range(max(len(words) - size, 0) + 1)
+    ]
+    hashes = np.array([zlib.crc32(gram.encode()) for gram in grams], dtype=np.uint64)
+    return mod_mersenne(hashes)
+
+
+def mod_mersenne(values: np.ndarray) -> np.ndarray:
+    """`values` modulo `MERSENNE_PRIME`, for uint64 values below 2**63."""
+    values = (values & MERSENNE_PRIME) + (values >> np.uint64(31))
+    values = (values & MERSENNE_PRIME) + (values >> np.uint64(31))
+    return np.where(values >= MERSENNE_PRIME, values - MERSENNE_PRIME, values)
+
+
+class NearDuplicateFilter:
+    """
+    Keeps the first of any chunks whose estimated Jaccard similarity of
+    word shingles is at least `threshold`, in the order they are passed to
+    `keep`.
+
+    Each text gets a MinHash signature, whose bands are looked up in LSH
+    buckets of the texts kept so far. Candidates are confirmed by comparing
+    signatures. The buckets hold state across calls, so a streamed corpus
+    can be filtered one batch at a time, and can be seeded with `add` from
+    the chunks of a vector store that an update extends.
+
+    Memory grows with the chunks kept: each holds its signature (4 bytes per
+    permutation, 512 bytes by default) in one array, plus one integer bucket
+    key per band, about 1.4 KB per chunk in all.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = NUM_PERM, seed: int = 1):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        # {hash of (band, band values): kept text, or list of kept texts}
+        self._buckets = {}
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self.n_kept = 0
+        self.n_seen = 0
+        self.n_dropped = 0
+        self.chars_dropped = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text's shingles."""
+        hashes = shingles(text)[:, None]
+        return mod_mersenne(hashes * self._a + self._b).min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> list[int]:
+        """Bucket key of each band of a signature."""
+        return [
+            hash((band, values.tobytes()))
+            for band, values in enumerate(signature.reshape(self.bands, self.rows))
+        ]
+
+    def _duplicate_of(self, signature: np.ndarray, band_keys: list[int]) -> int:
+        """Index of a kept text similar to `signature`, or None."""
+        candidates = set()
+        for key in band_keys:
+            kept = self._buckets.get(key)
+            if isinstance(kept, list):
+                candidates.update(kept)
+            elif kept is not None:
+                candidates.add(kept)
+        for kept in sorted(candidates):
+            if (self._signatures[kept] == signature).mean() >= self.threshold:
+                return kept
+        return None
+
+    def _add(self, signature: np.ndarray, band_keys: list[int]):
+        """Records a kept text's signature and buckets."""
+        if self.n_kept == len(self._signatures):
+            grown = np.empty(
+                (max(2 * self.n_kept, 1024), self._signatures.shape[1]),
+                dtype=np.uint32,
+            )
+            grown[: self.n_kept] = self._signatures
+            self._signatures = grown
+        self._signatures[self.n_kept] = signature
+
+        for key in band_keys:
+            kept = self._buckets.setdefault(key, self.n_kept)
+            if isinstance(kept, list):
+                kept.append(self.n_kept)
+            elif kept != self.n_kept:
+                self._buckets[key] = [kept, self.n_kept]
+        self.n_kept += 1
+
+    def add(self, texts: list[str]):
+        """
+        Records texts as kept without filtering them, e.g. the chunks already
+        in a vector store.
+
+        Args:
+            texts (list[str]): Chunk texts.
+        """
+        for text in texts:
+            signature = self.signature(text)
+            self._add(signature, self.band_keys(signature))
+
+    def keep(self, texts: list[str]) -> list[bool]:
+        """
+        Flags which of the next chunk texts to keep.
+
+        Args:
+            texts (list[str]): Text of the next chunks.
+
+        Returns:
+            list[bool]: True for texts that are not near-duplicates of an
+            earlier text.
+        """
+        keep = []
+        for text in texts:
+            self.n_seen += 1
+            signature = self.signature(text)
+            band_keys = self.band_keys(signature)
+            if self._duplicate_of(signature, band_keys) is not None:
+                keep.append(False)
+                self.n_dropped += 1
+                self.chars_dropped += len(text)
+                continue
+
+            self._add(signature, band_keys)
+            keep.append(True)
+
+        return keep
@@ -0,0 +1,456 @@
+"""
+Sentence-transformers models exported to ONNX and run with ONNX Runtime.
+
+On CPU, ONNX Runtime encodes faster than PyTorch, and dynamic int8
+quantisation of the weights speeds it up again and makes the model about four
+times smaller, at the cost of a small drift in the vectors. Every export is
+checked against the PyTorch model, and rejected if any vector's cosine
+similarity to the PyTorch vector is more than `MAX_FP32_DRIFT` below 1 for
+the full-precision model, or `MAX_INT8_DRIFT` for the quantised one.
+
+Run this module to export the configured model and measure its drift and
+speed on chunks from the vector store:
+
+    python statschat/embedding/onnx_embeddings.py [--quantize] [--force]
+        [--max-drift 1e-4] [--max-int8-drift 0.05] [--n-texts 500]
+        [--parity-texts TEXTS_TXT]
+"""
+
+import argparse
+import json
+import pickle
+import re
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("pytorch", "onnx")
+ONNX_DIR = "onnx_models"
+CONFIG_NAME = "onnx_config.json"
+POOLING_MODES = ("mean", "cls", "max")
+# Largest allowed 1 - cosine similarity between ONNX and PyTorch vectors, for
+# the full-precision export (which should only differ by rounding) and the
+# int8-quantised one
+MAX_FP32_DRIFT = 1e-4
+MAX_INT8_DRIFT = 0.05
+# Texts every export is checked on, unless others are given
+PARITY_TEXTS = [
+    "Consumer prices rose by 3.4% in the 12 months to May.",
+    "Employment rate for people aged 15 to 64 years, seasonally adjusted.",
+    "Gross domestic product is estimated to have grown by 0.7% in the quarter.",
+    "What was the rate of inflation last month?",
+    "Population estimates by region and age group.",
+    "Table 4: Average weekly earnings, including bonuses.",
+    "These figures are provisional and may be revised.",
+    "How many households own the home they live in?",
+]
+
+
+def require_onnxruntime():
+    """
+    Checks that ONNX Runtime is installed.
+
+    Raises:
+        ImportError: If it is not, naming the extra to install.
+    """
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "embedding_backend 'onnx' needs onnxruntime: pip install -e \".[onnx]\""
+        ) from e
+
+
+def model_dir(onnx_root: Path, model_name: str) -> Path:
+    """Directory an embedding model is exported to."""
+    return Path(onnx_root) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+
+
+def model_file(quantize: bool) -> str:
+    """File name of the full-precision or int8 ONNX model."""
+    return "model_int8.onnx" if quantize else "model.onnx"
+
+
+def pool(hidden: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    """
+    Pools token embeddings into one vector per text, like the
+    sentence-transformers `Pooling` module.
+
+    Args:
+        hidden (np.ndarray): (batch, tokens, dim) token embeddings.
+        attention_mask (np.ndarray): (batch, tokens), 0 for padding.
+        mode (str): One of `POOLING_MODES`.
+
+    Returns:
+        np.ndarray: (batch, dim) text embeddings.
+    """
+    if mode == "cls":
+        return hidden[:, 0]
+    mask = attention_mask[:, :, None].astype(hidden.dtype)
+    if mode == "max":
+        return np.where(mask > 0, hidden, -1e9).max(axis=1)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def cosine_drift(reference, vectors) -> np.ndarray:
+    """1 - cosine similarity between matching rows of two sets of vectors."""
+    reference = np.asarray(reference, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    similarity = (reference * vectors).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1)
+    )
+    return 1 - similarity
+
+
+def remove_export(directory: Path):
+    """Deletes the ONNX models and config of an export, e.g. one that failed."""
+    for name in (model_file(False), model_file(True), CONFIG_NAME):
+        (Path(directory) / name).unlink(missing_ok=True)
+
+
+def write_onnx_model(model, directory: Path) -> list[str]:
+    """
+    Writes the tokenizer and full-precision transformer of a
+    sentence-transformers model to `directory`.
+
+    Args:
+        model (SentenceTransformer): Model to export.
+        directory (Path): Export directory.
+
+    Returns:
+        list[str]: Names of the model's inputs, in order.
+    """
+    import torch
+
+    model.tokenizer.save_pretrained(directory)
+    transformer = list(model)[0].auto_model.eval()
+    example = model.tokenizer(["export"], return_tensors="pt")
+    input_names = list(example.keys())
+
+    class HiddenStates(torch.nn.Module):
+        def forward(self, *inputs):
+            return transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(),
+            tuple(example[name] for name in input_names),
+            str(directory / model_file(False)),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+
+    return input_names
+
+
+def check_drift(
+    model_name: str,
+    onnx_root: Path,
+    quantized: bool,
+    reference: np.ndarray,
+    texts: List[str],
+    max_drift: float,
+) -> float:
+    """
+    Largest cosine drift of an exported model from the PyTorch vectors.
+
+    Raises:
+        ValueError: If it is more than `max_drift`.
+    """
+    onnx_model = OnnxEmbeddings(model_name, onnx_root, quantize=quantized)
+    drift = cosine_drift(reference, onnx_model.embed_documents(texts)).max()
+    if drift > max_drift:
+        raise ValueError(
+            f"{model_file(quantized)} of {model_name} drifts up to "
+            f"{drift:.2g} from PyTorch (max_drift is {max_drift})"
+        )
+    return float(drift)
+
+
+def export_onnx(
+    model_name: str,
+    onnx_root: Path = Path("data") / ONNX_DIR,
+    quantize: bool = False,
+    max_drift: float = MAX_FP32_DRIFT,
+    parity_texts: List[str] = None,
+    max_int8_drift: float = MAX_INT8_DRIFT,
+) -> Path:
+    """
+    Exports a sentence-transformers model to ONNX and checks its vectors
+    against the PyTorch model. With `quantize`, the int8 model is only
+    written once the full-precision model has passed, and checked in turn.
+    If anything fails, every model file and the config are removed, so no
+    unchecked model is ever loaded.
+
+    Args:
+        model_name (str): HuggingFace model id.
+        onnx_root (Path): Directory holding exported models.
+        quantize (bool): Also write a dynamically int8-quantised model.
+        max_drift (float): Largest allowed cosine drift of the full-precision
+            model on the parity texts.
+        parity_texts (list[str], optional): Texts the export is checked on.
+            Defaults to `PARITY_TEXTS`.
+        max_int8_drift (float): Largest allowed cosine drift of the
+            quantised model.
+
+    Returns:
+        Path: The exported model's directory.
+
+    Raises:
+        ValueError: If the model has modules that cannot be exported, or
+            either model drifts further than its bound from PyTorch.
+    """
+    from sentence_transformers import SentenceTransformer, models
+
+    require_onnxruntime()
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = list(model)
+    if not (
+        isinstance(modules[0], models.Transformer)
+        and isinstance(modules[1], models.Pooling)
+        and all(isinstance(module, models.Normalize) for module in modules[2:])
+        and modules[1].get_pooling_mode_str() in POOLING_MODES
+    ):
+        raise ValueError(f"{model_name} has modules that cannot be exported to ONNX")
+
+    texts = parity_texts or PARITY_TEXTS
+    directory = model_dir(onnx_root, model_name)
+    directory.mkdir(parents=True, exist_ok=True)
+    remove_export(directory)
+    try:
+        config = {
+            "model_name": model_name,
+            "input_names": write_onnx_model(model, directory),
+            "pooling": modules[1].get_pooling_mode_str(),
+            "normalize": len(modules) > 2,
+            "max_seq_length": model.max_seq_length,
+            "dimension": model.get_sentence_embedding_dimension(),
+        }
+        with open(directory / CONFIG_NAME, "w") as config_file:
+            json.dump(config, config_file, indent=4)
+
+        reference = model.encode(texts)
+        config["max_drift"] = {
+            model_file(False): check_drift(
+                model_name, onnx_root, False, reference, texts, max_drift
+            )
+        }
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(
+                directory / model_file(False),
+                directory / model_file(True),
+                weight_type=QuantType.QInt8,
+            )
+            config["max_drift"][model_file(True)] = check_drift(
+                model_name, onnx_root, True, reference, texts, max_int8_drift
+            )
+    except BaseException:
+        remove_export(directory)
+        raise
+
+    with open(directory / CONFIG_NAME, "w") as config_file:
+        json.dump(config, config_file, indent=4)
+
+    return directory
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings from a sentence-transformers model run with ONNX Runtime on
+    CPU, exported with `export_onnx` on first use. Offers the `tokenizer`,
+    `max_seq_length` and `dimension` of `PooledHuggingFaceEmbeddings`.
+
+    Texts are encoded longest first in batches of `batch_size`, so each batch
+    is padded as little as possible. `threads` sets ONNX Runtime's intra-op
+    threads (0 uses every core).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        onnx_root: Path = Path("data") / ONNX_DIR,
+        quantize: bool = False,
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        threads: int = 0,
+    ):
+        require_onnxruntime()
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        directory = model_dir(onnx_root, model_name)
+        if not (directory / model_file(quantize)).exists():
+            export_onnx(model_name, onnx_root, quantize)
+        with open(directory / CONFIG_NAME) as config_file:
+            self.config = json.load(config_file)
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(directory / model_file(quantize)),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.normalize_embeddings = normalize_embeddings or self.config["normalize"]
+
+    @property
+    def tokenizer(self):
+        """The model's (fast) tokenizer."""
+        return self._tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        """Tokens the model reads per text, including special tokens."""
+        return self.config["max_seq_length"]
+
+    @property
+    def dimension(self) -> int:
+        """Length of the model's embedding vectors."""
+        return self.config["dimension"]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embeds texts in batches, longest first."""
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            encoded = self._tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            inputs = {
+                name: encoded[name].astype(np.int64)
+                for name in self.config["input_names"]
+            }
+            hidden = self.session.run(None, inputs)[0]
+            vectors[batch] = pool(
+                hidden, encoded["attention_mask"], self.config["pooling"]
+            )
+
+        if self.normalize_embeddings:
+            vectors /= np.clip(
+                np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None
+            )
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Compute doc embeddings with ONNX Runtime.
+
+        Args:
+            texts: The list of texts to embed.
+
+        Returns:
+            List of embeddings, one for each text.
+        """
+        return self._encode([text.replace("\n", " ") for text in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        """Nothing to stop; matches `PooledHuggingFaceEmbeddings.close`."""
+        return None
+
+
+def store_texts(faiss_db_root: Path, n_texts: int) -> list[str]:
+    """Up to `n_texts` chunk texts from a saved vector store."""
+    index_path = Path(faiss_db_root) / "index.pkl"
+    if not index_path.exists():
+        return []
+    with open(index_path, "rb") as index_file:
+        docstore, _ = pickle.load(index_file)
+    documents = list(docstore._dict.values())
+    step = max(1, len(documents) // n_texts)
+    return [document.page_content for document in documents[::step][:n_texts]]
+
+
+def main():
+    from sentence_transformers import SentenceTransformer
+
+    from statschat import load_config
+
+    config = load_config(name="main")
+    parser = argparse.ArgumentParser(
+        description="Export the embedding model to ONNX and check its drift."
+    )
+    parser.add_argument(
+        "--quantize",
+        action=argparse.BooleanOptionalAction,
+        default=config["db"].get("onnx_quantize", False),
+    )
+    parser.add_argument("--force", action="store_true", help="Export again")
+    parser.add_argument("--max-drift", type=float, default=MAX_FP32_DRIFT)
+    parser.add_argument("--max-int8-drift", type=float, default=MAX_INT8_DRIFT)
+    parser.add_argument("--n-texts", type=int, default=500)
+    parser.add_argument(
+        "--parity-texts",
+        type=Path,
+        default=None,
+        help="File of texts, one per line, to check the export on",
+    )
+    args = parser.parse_args()
+
+    parity_texts = None
+    if args.parity_texts:
+        with open(args.parity_texts) as texts_file:
+            parity_texts = [line.strip() for line in texts_file if line.strip()]
+
+    data_dir = config["preprocess"]["data_dir"]
+    model_name = config["db"]["embedding_model_name"]
+    onnx_root = Path(data_dir) / ONNX_DIR
+    if (
+        args.force
+        or not (model_dir(onnx_root, model_name) / model_file(args.quantize)).exists()
+    ):
+        export_onnx(
+            model_name,
+            onnx_root,
+            args.quantize,
+            args.max_drift,
+            parity_texts,
+            args.max_int8_drift,
+        )
+
+    texts = store_texts(data_dir + config["db"]["faiss_db_root"], args.n_texts)
+    texts = texts or parity_texts or PARITY_TEXTS
+    torch_model = SentenceTransformer(model_name, device="cpu")
+    onnx_model = OnnxEmbeddings(model_name, onnx_root, quantize=args.quantize)
+    start = time.perf_counter()
+    reference = torch_model.encode(texts)
+    torch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    vectors = onnx_model.embed_documents(texts)
+    onnx_seconds = time.perf_counter() - start
+
+    drift = cosine_drift(reference, vectors)
+    print(f"{model_file(args.quantize)} of {model_name} on {len(texts)} texts")
+    print(f"cosine drift: mean {drift.mean():.5f}, max {drift.max():.5f}")
+    print(
+        f"chunks/s: PyTorch {len(texts) / torch_seconds:.1f}, "
+        f"ONNX Runtime {len(texts) / onnx_seconds:.1f}"
+    )
+    max_drift = args.max_int8_drift if args.quantize else args.max_drift
+    if drift.max() > max_drift:
+        raise SystemExit(f"Drift exceeds the allowed {max_drift}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Sentence-transformers embeddings encoded across a persistent process pool."""
+
+import os
+from typing import List
+
+from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+
+class PooledHuggingFaceEmbeddings(HuggingFaceEmbeddings):
+    """
+    `HuggingFaceEmbeddings` that spreads `embed_documents` over `workers`
+    processes. Unlike `multi_process=True`, which starts and stops a pool on
+    every call, the pool is started on first use and kept until `close()`, so
+    it can serve every batch of a streaming run.
+
+    On a GPU machine the pool uses every visible GPU; otherwise it starts
+    `workers` CPU processes (0 means one per CPU core). `workers=1` encodes
+    in the current process, exactly like `HuggingFaceEmbeddings`.
+    """
+
+    workers: int = 1
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pool = None
+
+    @property
+    def tokenizer(self):
+        """The model's (fast) tokenizer."""
+        return self._client.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        """Tokens the model reads per text, including special tokens."""
+        return self._client.max_seq_length
+
+    @property
+    def dimension(self) -> int:
+        """Length of the model's embedding vectors."""
+        return self._client.get_sentence_embedding_dimension()
+
+    def _start_pool(self):
+        """Starts the encoding pool."""
+        if self._client.device.type == "cuda":
+            target_devices = None  # one process per GPU
+        else:
+            target_devices = ["cpu"] * (self.workers or os.cpu_count())
+        self._pool = self._client.start_multi_process_pool(target_devices)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Compute doc embeddings, across the process pool when `workers` != 1.
+
+        Args:
+            texts: The list of texts to embed.
+
+        Returns:
+            List of embeddings, one for each text.
+        """
+        if self.workers == 1:
+            return super().embed_documents(texts)
+
+        if self._pool is None:
+            self._start_pool()
+
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = self._client.encode_multi_process(
+            texts, self._pool, **self.encode_kwargs
+        )
+        return embeddings.tolist()
+
+    def close(self):
+        """Stops the encoding pool, if one was started."""
+        if self._pool is not None:
+            self._client.stop_multi_process_pool(self._pool)
+            self._pool = None
@@ -1,16 +1,101 @@
-import glob
-import json
 import logging
 import toml
+from itertools import islice
 import os
-import shutil
+import time
 from pathlib import Path
 from datetime import datetime
 from langchain_community.document_loaders import DirectoryLoader, JSONLoader
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_transformers import EmbeddingsRedundantFilter
+from langchain_core.documents import Document
+from statschat.embedding.embedding_cache import (
+    CACHE_DIR,
+    CachedEmbeddings,
+    EmbeddingCache,
+)
+from statschat.embedding.faiss_ids import (
+    ensure_id_mapped,
+    compact_index,
+    labelled_vectors,
+    new_vector_store,
+    rebuild_index,
+    remove_chunks,
+    upsert_chunks,
+)
+from statschat.embedding.index_types import (
+    INDEX_TYPES,
+    build_index,
+    describe_index,
+    merge_index_params,
+    set_search_params,
+)
+from statschat.embedding.manifest import (
+    check_dimension,
+    check_manifest,
+    read_manifest,
+    write_manifest,
+)
+from statschat.embedding.near_duplicates import NearDuplicateFilter
+from statschat.embedding.onnx_embeddings import (
+    EMBEDDING_BACKENDS,
+    ONNX_DIR,
+    OnnxEmbeddings,
+)
+from statschat.embedding.pooled_embeddings import PooledHuggingFaceEmbeddings
+from statschat.embedding.redundancy import RedundancyFilter
+from statschat.embedding.token_splitter import TOKENIZE_BATCH, ModelTokenSplitter
+from statschat.pdf_processing.jsonl_batches import (
+    BatchWriter,
+    iter_records,
+    list_batches,
+    migrate_legacy_json,
+)
+
+
+def chunk_id(metadata: dict) -> str:
+    """
+    Stable ID for a chunk: its publication ID, page number and character
+    offset within the page, e.g. `3f2a9c0d4b1e8f7a-12-1800`.
+
+    Args:
+        metadata (dict): Chunk metadata, with the publication ID under
+            `source` and the offset under `start_index`.
+
+    Returns:
+        str: The chunk ID.
+    """
+    return f"{metadata['source']}-{metadata['page_number']}-{metadata['start_index']}"
+
+
+def publication_documents(publication: dict):
+    """
+    Turns a publication record into one document per section, with
+    everything that isn't the section text as metadata.
+
+    Args:
+        publication (dict): Publication record from a JSONL batch.
+
+    Yields:
+        Document: One per section.
+    """
+    publication_meta = {i: publication[i] for i in publication if i != "content"}
+    for section in publication["content"]:
+        # Copy everything
+        metadata = {**section, **publication_meta}
+
+        # Reformat the date
+        metadata["date"] = datetime.strptime(
+            metadata.pop("release_date"), "%Y-%m-%d"
+        ).__format__("%d %B %Y")
+
+        # Rename a few things
+        metadata["source"] = metadata.pop("id")
+
+        # Remove the text from metadata
+        metadata.pop("page_text")
+
+        yield Document(page_content=section["page_text"], metadata=metadata)
 
 
 class PrepareVectorStore(DirectoryLoader, JSONLoader):
@@ -28,14 +113,33 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
         download_dir: Path = "pdf_store",
         split_length: int = 1000,
         split_overlap: int = 200,
+        chunk_tokens: int = 256,
+        chunk_overlap_tokens: int = 32,
         embedding_model_name: str = "sentence-transformers/all-mpnet-base-v2",
+        embedding_backend: str = "pytorch",
+        onnx_quantize: bool = False,
         redundant_similarity_threshold: float = 0.99,
         faiss_db_root: str = "db_langchain",
+        index_type: str = "flat",
+        index_params: dict = None,
         db=None,  # vector store
         logger: logging.Logger = None,
         latest_only: bool = False,
         download_mode: str = "SETUP",
         download_site: str = "",
+        convert_workers: int = 0,
+        page_split_threshold: int = 500,
+        page_range_size: int = 100,
+        pdf_backend: str = "pypdf2",
+        strip_boilerplate: bool = True,
+        streaming: bool = False,
+        stream_batch_size: int = 512,
+        embed_batch_size: int = 32,
+        embed_workers: int = 1,
+        embedding_cache: bool = True,
+        drop_redundant: bool = True,
+        drop_near_duplicates: bool = True,
+        near_duplicate_threshold: float = 0.9,
     ):
         self.directory = (
             data_dir + ("latest_" if download_mode == "UPDATE" else "") + directory
@@ -48,17 +152,46 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
         self.download_dir = data_dir + download_dir
         self.split_length = split_length
         self.split_overlap = split_overlap
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
         self.embedding_model_name = embedding_model_name
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(
+                f"Unknown embedding_backend {embedding_backend!r}; "
+                f"choose from {', '.join(EMBEDDING_BACKENDS)}"
+            )
+        self.embedding_backend = embedding_backend
+        self.onnx_quantize = onnx_quantize
+        self.onnx_root = Path(data_dir + ONNX_DIR)
         self.redundant_similarity_threshold = redundant_similarity_threshold
-        self.faiss_db_root = (
-            data_dir + faiss_db_root + ("_latest" if download_mode == "UPDATE" else "")
+        self.near_duplicate_filter = (
+            NearDuplicateFilter(near_duplicate_threshold)
+            if drop_near_duplicates
+            else None
         )
-        # Remove '_latest' from faiss_db_root if present
-        self.original_faiss_db_root = (data_dir + faiss_db_root).replace("_latest", "")
+        self.redundancy_filter = (
+            RedundancyFilter(redundant_similarity_threshold) if drop_redundant else None
+        )
+        # UPDATE mode edits the permanent vector store in place
+        self.faiss_db_root = data_dir + faiss_db_root
+        if index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index_type {index_type!r}; "
+                f"choose from {', '.join(INDEX_TYPES)}"
+            )
+        self.index_type = index_type
+        self.index_params = merge_index_params(index_params)
         self.db = db
         self.latest_only = latest_only
         self.download_mode = download_mode
         self.download_site = download_site
+        self.streaming = streaming
+        self.stream_batch_size = stream_batch_size
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers
+        self.embedding_cache_dir = (
+            Path(data_dir + CACHE_DIR) if embedding_cache else None
+        )
 
         # Initialise logger
         if logger is None:
@@ -71,21 +204,35 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
         if not os.path.exists(self.faiss_db_root):
             os.makedirs(self.faiss_db_root)
 
-        self.logger.info("Split full article JSONs into sections")
-        self._json_splitter()
-        self.logger.info("Load section JSONs to memory")
-        self._load_json_to_memory()
-        self.logger.info("Chunk documents")
-        self._split_documents()
-        self.logger.info("Instantiate embeddings")
-        self._instantiate_embeddings()
-        self.logger.info("Filtering out duplicate docs")
-        # self._drop_redundant_documents()
-        self.logger.info("Vectorise docs and commit to physical vector store")
-        self._embed_documents()
-        if download_mode == "UPDATE":
-            self.logger.info("Merging vector store with existing data")
-            self._merge_faiss_db()
+        if streaming:
+            self.logger.info("Instantiate embeddings")
+            self._instantiate_embeddings()
+            if download_mode == "UPDATE":
+                self.logger.info("Load existing vector store")
+                self._load_faiss_db()
+            self.logger.info("Stream sections through chunking and embedding")
+            self._stream_to_vector_store()
+        else:
+            self.logger.info("Split full article JSONs into sections")
+            self._json_splitter()
+            self.logger.info("Load section JSONs to memory")
+            self._load_json_to_memory()
+            self.logger.info("Instantiate embeddings")
+            self._instantiate_embeddings()
+            if download_mode == "UPDATE":
+                self.logger.info("Load existing vector store")
+                self._load_faiss_db()
+            self.logger.info("Chunk documents")
+            self._split_documents()
+            self.logger.info("Drop near-duplicate chunks before embedding")
+            self.chunks = self._drop_near_duplicate_chunks(self.chunks)
+            self.logger.info("Vectorise docs, filter duplicates and commit to store")
+            self._embed_documents()
+        self._apply_index_type()
+        self._save_faiss_db()
+
+        # Stop the embedding worker processes, if any
+        self.embeddings.close()
 
         # except Exception as e:
         #     print(e)
@@ -95,91 +242,73 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
 
     def _json_splitter(self):
         """
-        Splits scraped json to multiple json,
-        one for each publication section
+        Filters the converted publications down to the sections worth
+        embedding and writes them to JSONL batches, one line per
+        publication with its metadata stored once
         """
         print("Splitting json conversions. Please wait...")
 
-        # create storage folder for split publications
-        isExist = os.path.exists(self.split_directory)
-        if not isExist:
-            os.makedirs(self.split_directory)
-        found_publications = glob.glob(f"{self.directory}/*.json")
-        self.logger.info(f"Found {len(found_publications)} publications for splitting")
+        # create storage folder for split publications, which is
+        # rebuilt from the conversions on every run
+        os.makedirs(self.split_directory, exist_ok=True)
+        for batch_path in list_batches(self.split_directory):
+            os.remove(batch_path)
+
+        with BatchWriter(self.split_directory, prefix="split") as batches:
+            for publication in self._iter_publications():
+                batches.write(publication)
+
+        return None
 
-        # extract metadata from each publication section
-        # and store as separate JSON
-        for filename in found_publications:
+    def _iter_publications(self):
+        """
+        Yields the converted publications to embed, keeping only the
+        sections that have text, once per unique PDF byte stream
+        """
+        seen_hashes = set()
+        found_publications = 0
+        migrate_legacy_json(self.directory)
+        for json_file in iter_records(self.directory):
+            found_publications += 1
             try:
-                with open(filename) as file:
-                    json_file = json.load(file)
-                    if (not (self.latest_only)) or json_file["latest"]:
-                        id = json_file["id"]
-
-                        publication_meta = {
-                            i: json_file[i] for i in json_file if i != "content"
-                        }
-                        for num, section in enumerate(json_file["content"]):
-                            section_json = {**section, **publication_meta}
-
-                            # Check that there's text extracted for this section
-                            if len(section["page_text"]) > 5:
-                                with open(
-                                    f"{self.split_directory}/{id}_{num}.json", "w"
-                                ) as new_file:
-                                    json.dump(section_json, new_file, indent=4)
+                sha256 = json_file.get("sha256")
+                if sha256 and sha256 in seen_hashes:
+                    self.logger.info(
+                        f"Skipping duplicate content: {json_file.get('file_name')}"
+                    )
+                    continue
+                seen_hashes.add(sha256)
+                if (not (self.latest_only)) or json_file["latest"]:
+                    # Check that there's text extracted for each section
+                    sections = [
+                        section
+                        for section in json_file["content"]
+                        if len(section["page_text"]) > 5
+                    ]
+                    yield {**json_file, "content": sections}
 
             except KeyError as e:
-                self.logger.warning(f"Could not parse {filename}: {e}")
+                self.logger.warning(
+                    f"Could not parse {json_file.get('file_name')}: {e}"
+                )
 
-        return None
+        self.logger.info(f"Found {found_publications} publications")
 
     def _load_json_to_memory(self):
         """
-        Loads publication section JSONs to memory
+        Loads publication sections to memory
         """
 
         print("Loading to memory. Please wait...")
 
-        def metadata_func(record: dict, metadata: dict) -> dict:
-            """
-            Helper, instructs on how to fetch metadata.  Here I take
-            everything that isn't the actual text body.
-            """
-            # Copy everything
-            metadata.update(record)
-
-            # Reformat the date
-            metadata["date"] = datetime.strptime(
-                metadata.pop("release_date"), "%Y-%m-%d"
-            ).__format__("%d %B %Y")
-
-            # Rename a few things
-            metadata["source"] = metadata.pop("id")
-
-            # Remove the text from metadata
-            metadata.pop("page_text")
-
-            return metadata
-
-        # required argument from JSONLoader class
-        # text element required
-        json_loader_kwargs = {
-            "jq_schema": ".",
-            "content_key": "page_text",
-            "metadata_func": metadata_func,
-        }
+        # one document per section, read in bulk from the JSONL batches
         self.logger.info(f"Loading data from {self.split_directory}")
-        self.loader = DirectoryLoader(
-            self.split_directory,
-            glob="*.json",
-            use_multithreading=True,
-            show_progress=False,
-            loader_cls=JSONLoader,
-            loader_kwargs=json_loader_kwargs,
-        )
+        self.docs = [
+            document
+            for publication in iter_records(self.split_directory)
+            for document in publication_documents(publication)
+        ]
 
-        self.docs = self.loader.load()
         self.logger.info(f"{len(self.docs)} publication sections loaded to memory")
         return None
 
@@ -190,29 +319,111 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
 
         print("Instantiating embeddings. Please wait...")
 
+        # Vertex AI models cannot be loaded locally
         if self.embedding_model_name == "textembedding-gecko@001":
-            model = "sentence-transformers/all-mpnet-base-v2"
-            self.embeddings = HuggingFaceEmbeddings(model_name=model)
+            self.logger.warning(
+                "textembedding-gecko@001 is not available locally; "
+                "using sentence-transformers/all-mpnet-base-v2"
+            )
+            self.embedding_model_name = "sentence-transformers/all-mpnet-base-v2"
+        model = self.embedding_model_name
+
+        if self.embedding_backend == "onnx":
+            # ONNX Runtime spreads each batch over the CPU cores itself
+            self.embeddings = OnnxEmbeddings(
+                model,
+                self.onnx_root,
+                quantize=self.onnx_quantize,
+                batch_size=self.embed_batch_size,
+            )
         else:
-            model = "sentence-transformers/all-mpnet-base-v2"
-            self.embeddings = HuggingFaceEmbeddings(model_name=model)
+            self.embeddings = PooledHuggingFaceEmbeddings(
+                model_name=model,
+                encode_kwargs={"batch_size": self.embed_batch_size},
+                workers=self.embed_workers,
+            )
+        self.tokenizer = self.embeddings.tokenizer
+        self.max_seq_length = self.embeddings.max_seq_length
+        self.embedding_dimension = self.embeddings.dimension
+
+        # Only chunks not embedded by an earlier run reach the model. ONNX
+        # vectors differ slightly from PyTorch ones, so are cached apart
+        if self.embedding_cache_dir is not None:
+            if self._backend_name() != "pytorch":
+                model = f"{model}@{self._backend_name()}"
+            cache = EmbeddingCache(self.embedding_cache_dir)
+            # A full build records the corpus from scratch, see `compact`
+            if self.download_mode == "SETUP":
+                cache.clear_corpus()
+            self.embeddings = CachedEmbeddings(self.embeddings, cache, model)
 
         return None
 
-    def _drop_redundant_documents(self):
+    def _backend_name(self) -> str:
         """
-        Drops document chunks (except one!) above cosine
-        similarity threshold
+        Embedding backend the vectors come from: `pytorch`, `onnx` or
+        `onnx-int8`
         """
-        redundant_filter = EmbeddingsRedundantFilter(
-            embeddings=self.embeddings,
-            similarity_threshold=self.redundant_similarity_threshold,
+        if self.embedding_backend == "onnx" and self.onnx_quantize:
+            return "onnx-int8"
+        return self.embedding_backend
+
+    def _drop_near_duplicate_chunks(self, chunks: list[Document]) -> list[Document]:
+        """
+        Drops chunks whose text is a near-duplicate of an earlier chunk
+        (e.g. boilerplate repeated across publications), before they reach
+        the embedding model, and reports the embedding work saved so far
+
+        Args:
+            chunks (list[Document]): Chunks to filter
+
+        Returns:
+            list[Document]: The chunks kept
+        """
+        if self.near_duplicate_filter is None:
+            return chunks
+
+        keep = self.near_duplicate_filter.keep([chunk.page_content for chunk in chunks])
+        kept_chunks = [chunk for chunk, kept in zip(chunks, keep) if kept]
+
+        near_duplicates = self.near_duplicate_filter
+        share = near_duplicates.n_dropped / max(near_duplicates.n_seen, 1)
+        message = (
+            f"{near_duplicates.n_dropped} of {near_duplicates.n_seen} chunks "
+            f"({100 * share:.1f}%, "
+            f"{near_duplicates.chars_dropped} characters) are near-duplicates "
+            "and were not embedded"
         )
-        self.docs = redundant_filter.transform_documents(self.docs)
-        self.logger.info(f"{len(self.docs)} publication sections remain in memory")
-        self.logger.info([x.metadata["page_url"] for x in self.docs])
+        self.logger.info(message)
+        if not self.streaming:
+            print(message)
 
-        return None
+        return kept_chunks
+
+    def _drop_redundant_chunks(self, chunks: list[Document], vectors):
+        """
+        Drops chunks (except the first!) whose embeddings are above the
+        cosine similarity threshold, keeping the filter's state across
+        calls so streamed batches are compared with each other
+
+        Args:
+            chunks (list[Document]): Embedded chunks
+            vectors: One embedding per chunk
+
+        Returns:
+            tuple[list[Document], list]: The chunks and embeddings kept
+        """
+        if self.redundancy_filter is None:
+            return chunks, vectors
+
+        keep = self.redundancy_filter.keep(vectors)
+        kept_chunks = [chunk for chunk, kept in zip(chunks, keep) if kept]
+        kept_vectors = [vector for vector, kept in zip(vectors, keep) if kept]
+        self.logger.info(
+            f"{self.redundancy_filter.n_dropped} redundant chunks dropped so far"
+        )
+
+        return kept_chunks, kept_vectors
 
     def _split_documents(self):
         """
@@ -221,21 +432,174 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
 
         print("Splitting documents into chunks. Please wait...")
 
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self._instantiate_text_splitter()
+        self.chunks = list(self._iter_chunks(self.docs))
+
+        self.logger.info(f"{len(self.chunks)} chunks loaded to memory")
+        self._log_truncation()
+        return None
+
+    def _instantiate_text_splitter(self):
+        """
+        Creates the splitter that cuts sections into chunks, recording each
+        chunk's offset so it can be given a stable ID. With `chunk_tokens`,
+        chunks are measured in the embedding model's tokens and the
+        character splitter is only kept to report how many of its chunks
+        the model would have truncated
+        """
+        character_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.split_length,
             chunk_overlap=self.split_overlap,
             length_function=len,
+            add_start_index=True,
+        )
+        if not self.chunk_tokens:
+            self.text_splitter = character_splitter
+            return None
+
+        # The model adds special tokens (e.g. [CLS], [SEP]) to every chunk
+        n_special = len(self.tokenizer("")["input_ids"])
+        max_tokens = self.max_seq_length - n_special
+        if self.chunk_tokens > max_tokens:
+            self.logger.warning(
+                f"chunk_tokens={self.chunk_tokens} exceeds the model's limit; "
+                f"using {max_tokens}"
+            )
+        self.text_splitter = ModelTokenSplitter(
+            self.tokenizer,
+            chunk_tokens=min(self.chunk_tokens, max_tokens),
+            chunk_overlap=self.chunk_overlap_tokens,
+            max_tokens=max_tokens,
+            reference_splitter=character_splitter,
         )
 
-        self.chunks = self.text_splitter.split_documents(self.docs)
+        return None
+
+    def _chunker_settings(self) -> dict:
+        """
+        Settings of the text splitter, recorded in the store's manifest
+        """
+        if self.chunk_tokens:
+            return {
+                "unit": "tokens",
+                "chunk_size": self.text_splitter.chunk_tokens,
+                "chunk_overlap": self.chunk_overlap_tokens,
+            }
+        return {
+            "unit": "characters",
+            "chunk_size": self.split_length,
+            "chunk_overlap": self.split_overlap,
+        }
+
+    def _log_truncation(self):
+        """
+        Logs how many chunks of the character splitter (`split_length`)
+        would have exceeded the embedding model's token limit
+        """
+        if not isinstance(self.text_splitter, ModelTokenSplitter):
+            return None
+
+        splitter = self.text_splitter
+        share = splitter.n_reference_truncated / max(splitter.n_reference_chunks, 1)
+        message = (
+            f"Chunks of up to {splitter.chunk_tokens} tokens. With "
+            f"split_length={self.split_length} characters, "
+            f"{splitter.n_reference_truncated} of {splitter.n_reference_chunks} "
+            f"chunks ({100 * share:.1f}%) would have exceeded the model's "
+            f"{splitter.max_tokens}-token limit, truncating "
+            f"{splitter.n_reference_tokens_lost} tokens"
+        )
+        self.logger.info(message)
+        print(message)
+
+        return None
+
+    def _iter_chunks(self, documents):
+        """
+        Splits documents into chunks lazily, a batch of documents at a time
+
+        Args:
+            documents (Iterable[Document]): Sections to split
+
+        Yields:
+            Document: Chunks, with their ID under `chunk_id` in the metadata
+        """
+        documents = iter(documents)
+        while batch := list(islice(documents, TOKENIZE_BATCH)):
+            for chunk in self.text_splitter.split_documents(batch):
+                chunk.metadata["chunk_id"] = chunk_id(chunk.metadata)
+                yield chunk
+
+    def _stream_to_vector_store(self):
+        """
+        Streams publications from the JSON conversions through splitting,
+        chunking, embedding and indexing in batches of `stream_batch_size`
+        chunks, without writing split files.
+
+        Only the split, chunk and embedding stages use bounded memory. The
+        vector store (FAISS index and in-memory docstore) and the state of
+        the near-duplicate and redundancy filters still grow with the
+        corpus, and loading, compacting or converting an existing index
+        reads all of its vectors at once.
+        """
+
+        print("Streaming documents into vector store. Please wait...")
+
+        self._instantiate_text_splitter()
+        documents = (
+            document
+            for publication in self._iter_publications()
+            for document in publication_documents(publication)
+        )
+        chunks = self._iter_chunks(documents)
+
+        n_chunks = 0
+        embed_seconds = 0.0
+        while batch := list(islice(chunks, self.stream_batch_size)):
+            batch = self._drop_near_duplicate_chunks(batch)
+            if not batch:
+                continue
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(
+                [chunk.page_content for chunk in batch]
+            )
+            embed_seconds += time.perf_counter() - start
+            self._add_to_vector_store(*self._drop_redundant_chunks(batch, vectors))
+
+            n_chunks += len(batch)
+            self._log_embedding_rate(n_chunks, embed_seconds)
+
+        self._log_truncation()
+        if not n_chunks:
+            self.logger.error("No document chunks to embed. Exiting.")
+            print("No document chunks to embed. Exiting.")
+            exit()
+
+        return None
+
+    def _log_embedding_rate(self, n_chunks: int, seconds: float):
+        """
+        Logs embedding throughput
+
+        Args:
+            n_chunks (int): Chunks embedded so far
+            seconds (float): Time spent embedding them
+        """
+        rate = n_chunks / seconds if seconds else 0.0
+        message = f"{n_chunks} chunks embedded in {seconds:.1f}s ({rate:.1f} chunks/s)"
+        if isinstance(self.embeddings, CachedEmbeddings):
+            message += (
+                f"; {self.embeddings.hits} from the embedding cache, "
+                f"{self.embeddings.misses} encoded"
+            )
+        self.logger.info(message)
+        print(message)
 
-        self.logger.info(f"{len(self.chunks)} chunks loaded to memory")
         return None
 
     def _embed_documents(self):
         """
-        Tokenise all document chunks and commit to vector store,
-        persisting in local memory for efficiency of reproducibility
+        Embeds all document chunks and adds them to the vector store
         """
 
         if not self.chunks:
@@ -248,52 +612,167 @@ class PrepareVectorStore(DirectoryLoader, JSONLoader):
         self.logger.info("Starting embedding of document chunks")
         print("Starting embedding of document chunks, please wait...")
 
-        # Save to FAISS vector store
-        self.db = FAISS.from_documents(self.chunks, self.embeddings)
-        print("Exporting to FAISS vector store...")
-        self.db.save_local(self.faiss_db_root)
-        self.logger.info(f"Vector store saved to {self.faiss_db_root}")
-        print(f"Vector store saved to {self.faiss_db_root}")
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(
+            [chunk.page_content for chunk in self.chunks]
+        )
+        self._log_embedding_rate(len(self.chunks), time.perf_counter() - start)
+        self._add_to_vector_store(*self._drop_redundant_chunks(self.chunks, vectors))
+
+        return None
+
+    def _add_to_vector_store(self, chunks: list[Document], vectors):
+        """
+        Adds embedded chunks to the vector store, keyed by chunk ID,
+        creating the store on first use. Without streaming, the index is
+        built and trained on all the vectors here; a streamed store starts
+        flat and is converted once every batch is in
+
+        Args:
+            chunks (list[Document]): Chunks to add
+            vectors: One embedding per chunk
+        """
+        if not chunks:
+            return None
+        if self.db is None:
+            index = (
+                None
+                if self.streaming
+                else build_index(self.index_type, vectors, self.index_params)
+            )
+            self.db = new_vector_store(self.embeddings, len(vectors[0]), index)
+        upsert_chunks(self.db, chunks, vectors)
 
         return None
 
-    def _merge_faiss_db(self):
+    def _load_faiss_db(self):
         """
-        Merge latest vector store for new articles into
-        existing permanent vector store. Removes latest vector store files
-        after merging.
+        Loads the permanent vector store so an update can add and remove
+        chunks in place, instead of building and merging a second store
         """
 
-        print("Merging vector store. Please wait...")
+        if not os.path.exists(os.path.join(self.faiss_db_root, "index.faiss")):
+            self.logger.warning(
+                f"No vector store at {self.faiss_db_root}; building a new one"
+            )
+            return None
 
-        # Load both vector stores as FAISS objects
-        db = FAISS.load_local(
-            self.original_faiss_db_root,
-            self.embeddings,
-            allow_dangerous_deserialization=True,
+        # Fail before embedding anything if the store used another model
+        check_manifest(
+            read_manifest(self.faiss_db_root),
+            self.faiss_db_root,
+            self.embedding_model_name,
         )
 
-        db.merge_from(self.db)  # Pass the FAISS object, not the path
-        db.save_local(self.original_faiss_db_root)
+        print("Loading existing vector store. Please wait...")
+        self.db = ensure_id_mapped(
+            FAISS.load_local(
+                self.faiss_db_root,
+                self.embeddings,
+                allow_dangerous_deserialization=True,
+            )
+        )
+        check_dimension(self.db, self.embedding_dimension, self.faiss_db_root)
         self.logger.info(
-            f"Number of chunks in vector store POST-edit: {len(db.docstore._dict)}"
+            f"Number of chunks in vector store PRE-edit: {len(self.db.docstore._dict)}"
         )
+        self.logger.info("Removing chunks of superseded publications")
+        self._remove_superseded_chunks()
+        self._seed_filters()
 
-        # Remove all files in the _latest FAISS directory, but keep the directory itself
-        if os.path.exists(self.faiss_db_root):
-            for filename in os.listdir(self.faiss_db_root):
-                file_path = os.path.join(self.faiss_db_root, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        # Remove subdirectories and their contents
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f"Failed to delete {file_path}: {e}")
-            self.logger.info(
-                f"Cleared files from FAISS _latest directory: {self.faiss_db_root}"
+        return None
+
+    def _seed_filters(self):
+        """
+        Seeds the near-duplicate and redundancy filters with the chunks
+        already in the vector store, so an update only embeds and adds
+        chunks that are new to the whole store. Runs after the chunks of the
+        publications in this update are removed, as they are being replaced
+        """
+        if self.near_duplicate_filter is None and self.redundancy_filter is None:
+            return None
+
+        labels, vectors = labelled_vectors(self.db)
+        if self.near_duplicate_filter is not None:
+            documents = self.db.docstore._dict
+            self.near_duplicate_filter.add(
+                [
+                    documents[self.db.index_to_docstore_id[label]].page_content
+                    for label in labels.tolist()
+                ]
             )
+        if self.redundancy_filter is not None:
+            self.redundancy_filter.add(vectors)
+        self.logger.info(f"Seeded the chunk filters with {len(labels)} chunks")
+
+        return None
+
+    def _remove_superseded_chunks(self):
+        """
+        Removes the chunks of earlier versions of the publications in this
+        update, i.e. those with the same file name, before the new versions
+        are added. Chunks that did not change are added back under the same
+        chunk ID
+        """
+
+        migrate_legacy_json(self.directory)
+        updating = {record.get("file_name") for record in iter_records(self.directory)}
+        superseded = [
+            chunk_id
+            for chunk_id, document in self.db.docstore._dict.items()
+            if document.metadata.get("file_name") in updating
+        ]
+        removed = remove_chunks(self.db, superseded)
+        self.logger.info(f"Removed {removed} chunks of superseded publications")
+
+        return None
+
+    def _apply_index_type(self):
+        """
+        Rebuilds the vector store with the configured `index_type` if it has
+        another, i.e. after streaming or when an update changes the type,
+        training the new index on the stored vectors. Otherwise the vectors
+        of removed chunks are compacted away, if the index could not remove
+        them in place, and the search parameters updated
+        """
+
+        built_as = describe_index(self.db.index)["type"]
+        if built_as == self.index_type:
+            compact_index(self.db)
+            set_search_params(self.db.index, self.index_params)
+            return None
+
+        self.logger.info(f"Building {self.index_type} index (was {built_as})")
+        print(f"Building {self.index_type} index. Please wait...")
+        start = time.perf_counter()
+        _, vectors = labelled_vectors(self.db)
+        rebuild_index(self.db, build_index(self.index_type, vectors, self.index_params))
+        self.logger.info(
+            f"{self.index_type} index built in {time.perf_counter() - start:.1f}s"
+        )
+
+        return None
+
+    def _save_faiss_db(self):
+        """
+        Persists the vector store to disk
+        """
+
+        print("Exporting to FAISS vector store...")
+        self.db.save_local(self.faiss_db_root)
+        write_manifest(
+            self.faiss_db_root,
+            self.db,
+            self.embedding_model_name,
+            normalize_embeddings=False,
+            chunker=self._chunker_settings(),
+            embedding_backend=self._backend_name(),
+        )
+        self.logger.info(
+            f"Number of chunks in vector store POST-edit: {len(self.db.docstore._dict)}"
+        )
+        self.logger.info(f"Vector store saved to {self.faiss_db_root}")
+        print(f"Vector store saved to {self.faiss_db_root}")
 
         return None
 
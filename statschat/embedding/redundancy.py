@@ -0,0 +1,96 @@
+"""
+Redundant chunk detection with FAISS range search.
+
+Replaces LangChain's `EmbeddingsRedundantFilter`, which compares every pair of
+chunks through a full N x N similarity matrix, with a search of each batch of
+chunks against the chunks already kept.
+"""
+
+import faiss
+import numpy as np
+
+
+class RedundancyFilter:
+    """
+    Keeps the first of any chunks whose embeddings have a cosine similarity
+    above `threshold`, in the order they are passed to `keep`.
+
+    Kept vectors are L2-normalised into an inner-product index, so each call
+    is one range search of the batch against everything kept so far, plus a
+    batch x batch comparison within the batch. The filter holds state across
+    calls, so a streamed corpus can be filtered one batch at a time, and can
+    be seeded with `add` from a vector store that an update extends.
+
+    The index is a second copy of the kept vectors, alongside the vector
+    store. It holds them as 16-bit floats, i.e. 2 bytes per dimension
+    (1.5 KB per chunk for a 768-dimensional model), half the size of the
+    store's flat index, with similarities accurate to about 1e-3.
+    """
+
+    def __init__(self, threshold: float = 0.99, batch_size: int = 1024):
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.index = None
+        self.n_dropped = 0
+
+    def _new_index(self, dim: int):
+        """Creates the index of kept vectors on first use."""
+        if self.index is None:
+            self.index = faiss.IndexScalarQuantizer(
+                dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+            )
+
+    def add(self, vectors):
+        """
+        Records embeddings as kept without filtering them, e.g. those of the
+        chunks already in a vector store.
+
+        Args:
+            vectors: (n, dim) embeddings.
+        """
+        vectors = np.array(vectors, dtype=np.float32)
+        if not len(vectors):
+            return
+        self._new_index(vectors.shape[1])
+        for start in range(0, len(vectors), self.batch_size):
+            batch = vectors[start : start + self.batch_size]
+            faiss.normalize_L2(batch)
+            self.index.add(batch)
+
+    def keep(self, vectors) -> list[bool]:
+        """
+        Flags which of the next chunks' embeddings to keep.
+
+        Args:
+            vectors: (n, dim) embeddings of the next n chunks.
+
+        Returns:
+            list[bool]: True for chunks that are not redundant with an
+            earlier chunk.
+        """
+        vectors = np.array(vectors, dtype=np.float32)
+        keep = []
+        for start in range(0, len(vectors), self.batch_size):
+            keep.extend(self._keep_batch(vectors[start : start + self.batch_size]))
+        return keep
+
+    def _keep_batch(self, vectors: np.ndarray) -> list[bool]:
+        """Filters one batch of at most `batch_size` vectors."""
+        faiss.normalize_L2(vectors)
+        self._new_index(vectors.shape[1])
+
+        # Chunks similar to one kept in an earlier batch
+        keep = np.ones(len(vectors), dtype=bool)
+        if self.index.ntotal:
+            lims, _, _ = self.index.range_search(vectors, self.threshold)
+            keep &= np.diff(lims) == 0
+
+        # Chunks similar to an earlier chunk kept from this batch
+        similarities = vectors @ vectors.T
+        for i in np.flatnonzero(keep)[1:]:
+            if (similarities[i, :i][keep[:i]] > self.threshold).any():
+                keep[i] = False
+
+        self.index.add(vectors[keep])
+        self.n_dropped += int((~keep).sum())
+        return keep.tolist()
@@ -0,0 +1,121 @@
+"""
+Splitting of sections into chunks measured in embedding-model tokens.
+
+A character limit either wastes encoder compute (chunks longer than the
+model's sequence limit are tokenised and then truncated) or leaves capacity
+unused. Here each batch of sections is tokenised once with the model's fast
+tokenizer, and chunks are cut as windows of token offsets, so every chunk fits
+the model exactly.
+"""
+
+from bisect import bisect_left
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# Sections tokenised per tokenizer call
+TOKENIZE_BATCH = 64
+# Tokens a chunk boundary may move back to avoid splitting a word
+MAX_WORD_BACKOFF = 16
+
+
+class ModelTokenSplitter:
+    """
+    Cuts documents into chunks of at most `chunk_tokens` tokens of
+    `tokenizer`, overlapping by `chunk_overlap` tokens and ending on word
+    boundaries where possible. Each chunk records its character offset in
+    the section under `start_index`, like `add_start_index=True`.
+
+    When `reference_splitter` is given, its chunks of the same sections are
+    counted against `max_tokens`, to report how many it would have sent to
+    the model over the truncation limit.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        chunk_tokens: int,
+        chunk_overlap: int,
+        max_tokens: int = None,
+        reference_splitter: RecursiveCharacterTextSplitter = None,
+    ):
+        if not 0 <= chunk_overlap < chunk_tokens:
+            raise ValueError("chunk_overlap must be smaller than chunk_tokens")
+        self.tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.max_tokens = max_tokens
+        self.reference_splitter = reference_splitter
+        self.n_reference_chunks = 0
+        self.n_reference_truncated = 0
+        self.n_reference_tokens_lost = 0
+
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        Splits documents into chunks, tokenising `TOKENIZE_BATCH` at a time.
+
+        Args:
+            documents (list[Document]): Sections to split.
+
+        Returns:
+            list[Document]: Chunks, in document order.
+        """
+        chunks = []
+        for start in range(0, len(documents), TOKENIZE_BATCH):
+            batch = documents[start : start + TOKENIZE_BATCH]
+            encoded = self.tokenizer(
+                [document.page_content for document in batch],
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False,
+            )
+            for document, offsets in zip(batch, encoded["offset_mapping"]):
+                chunks.extend(self._split_document(document, offsets))
+                if self.reference_splitter is not None:
+                    self._count_reference_truncation(document, offsets)
+        return chunks
+
+    def _split_document(self, document: Document, offsets: list[tuple]):
+        """Yields the chunks of one document from its token offsets."""
+        text = document.page_content
+        start = 0
+        while start < len(offsets):
+            stop = min(start + self.chunk_tokens, len(offsets))
+            if stop < len(offsets):
+                stop = self._word_boundary(offsets, start, stop)
+
+            start_index = offsets[start][0]
+            yield Document(
+                page_content=text[start_index : offsets[stop - 1][1]],
+                metadata={**document.metadata, "start_index": start_index},
+            )
+            if stop == len(offsets):
+                break
+            start = self._word_boundary(offsets, start + 1, stop - self.chunk_overlap)
+
+    @staticmethod
+    def _word_boundary(offsets: list[tuple], lowest: int, index: int) -> int:
+        """
+        Moves a token index back to the start of its word, i.e. past tokens
+        that continue the previous token without a gap, but not below
+        `lowest` or by more than `MAX_WORD_BACKOFF` tokens.
+        """
+        index = max(index, lowest)
+        for candidate in range(index, max(index - MAX_WORD_BACKOFF, lowest), -1):
+            if offsets[candidate][0] != offsets[candidate - 1][1]:
+                return candidate
+        return index
+
+    def _count_reference_truncation(self, document: Document, offsets: list[tuple]):
+        """Counts the reference splitter's chunks of `document` over the limit."""
+        token_starts = [token_start for token_start, _ in offsets]
+        for chunk in self.reference_splitter.split_documents([document]):
+            chunk_start = chunk.metadata["start_index"]
+            chunk_stop = chunk_start + len(chunk.page_content)
+            n_tokens = bisect_left(token_starts, chunk_stop) - bisect_left(
+                token_starts, chunk_start
+            )
+            self.n_reference_chunks += 1
+            if self.max_tokens and n_tokens > self.max_tokens:
+                self.n_reference_truncated += 1
+                self.n_reference_tokens_lost += n_tokens - self.max_tokens
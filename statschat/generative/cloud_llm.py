@@ -4,8 +4,6 @@ import json
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_huggingface import HuggingFaceEndpoint
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from langchain.docstore.document import Document
 from langchain.chains.qa_with_sources import load_qa_with_sources_chain
 from langchain.output_parsers import PydanticOutputParser
@@ -17,6 +15,7 @@ from statschat.generative.prompts_cloud import (
 from functools import lru_cache
 from statschat.generative.utils import deduplicator, highlighter
 from statschat.embedding.latest_flag_helpers import time_decay
+from statschat.embedding.manifest import load_vector_store
 
 
 class Inquirer:
@@ -31,7 +30,11 @@ class Inquirer:
         faiss_db_root: str = "data/db_langchain",
         # change faiss_db_root_latest to "data/db_langchain_latest" after "UPDATE"
         faiss_db_root_latest: str = "data/db_langchain",
-        embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        embedding_model_name: str = None,
+        embedding_backend: str = "pytorch",
+        onnx_quantize: bool = False,
+        index_type: str = "flat",
+        index_params: dict = None,
         k_docs: int = 10,
         k_contexts: int = 3,
         similarity_threshold: float = 2.0,  # higher threshold for smaller corpus
@@ -47,7 +50,16 @@ class Inquirer:
             generative_model_name (str, optional): HuggingFace model id.
                 Defaults to "mistralai/Mistral-7B-Instruct-v0.3".
             embedding_model_name (str, optional): HuggingFace embedding model id.
-                Defaults to "sentence-transformers/all-MiniLM-L6-v2".
+                Must match the model recorded in the vector store's manifest.
+                Defaults to the manifest's model.
+            embedding_backend (str, optional): "pytorch" (sentence-transformers)
+                or "onnx" (ONNX Runtime) to embed queries with.
+            onnx_quantize (bool, optional): Use the int8 ONNX model.
+            index_type (str, optional): Index type used when building the
+                vector store; searches use whatever type the store was built
+                with.
+            index_params (dict, optional): `nprobe` and `ef_search` override
+                the search settings saved with IVF and HNSW indexes.
         """
 
         # Initialise logger
@@ -93,18 +105,26 @@ class Inquirer:
             token=sec_key,
         )
 
-        # Embeddings
-        embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
-
-        # Load FAISS databases
-        self.db = FAISS.load_local(
-            faiss_db_root, embeddings, allow_dangerous_deserialization=True
+        # Load FAISS databases with the embedding model they were built with
+        self.db = load_vector_store(
+            faiss_db_root,
+            embedding_model_name,
+            index_params,
+            embedding_backend,
+            onnx_quantize,
         )
         if faiss_db_root_latest is None:
             faiss_db_root_latest = faiss_db_root + "_latest"
-        self.db_latest = FAISS.load_local(
-            faiss_db_root_latest, embeddings, allow_dangerous_deserialization=True
-        )
+        if faiss_db_root_latest == faiss_db_root:
+            self.db_latest = self.db
+        else:
+            self.db_latest = load_vector_store(
+                faiss_db_root_latest,
+                embedding_model_name,
+                index_params,
+                embedding_backend,
+                onnx_quantize,
+            )
 
         return None
 
@@ -5,11 +5,10 @@
 
 import torch
 import logging
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from transformers import AutoModelForCausalLM, AutoTokenizer
 from pathlib import Path
 import json
+from statschat.embedding.manifest import load_vector_store
 from statschat.generative.prompts_local import (
     _extractive_prompt,
     _core_prompt,
@@ -27,7 +26,12 @@ def flatten_meta(d):
 
 
 def similarity_search(
-    query: str, latest_filter: bool = True, return_dicts: bool = True
+    query: str,
+    latest_filter: bool = True,
+    return_dicts: bool = True,
+    embedding_model_name: str = None,
+    embedding_backend: str = "pytorch",
+    onnx_quantize: bool = False,
 ) -> list[dict]:
     """
     Returns k document chunks with the highest relevance to the
@@ -37,6 +41,10 @@ def similarity_search(
         query (str): Question for which most relevant publications will
         be returned
         return_dicts: if True, data returned as dictionary, key = rank
+        embedding_model_name: model the vector store must have been built
+            with; defaults to the model in the store's manifest
+        embedding_backend: "pytorch" or "onnx" to embed the query with
+        onnx_quantize: with the "onnx" backend, use the int8 model
 
     Returns:
         List[dict]: List of top k article chunks by relevance
@@ -59,17 +67,22 @@ def similarity_search(
 
     k_docs = 3
     similarity_threshold = 2.0
-    embedding_model_name = "sentence-transformers/all-mpnet-base-v2"
-    embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
 
+    # The embedding model is read from the vector store's manifest
     if latest_filter:
-        db_latest = FAISS.load_local(
-            faiss_db_root_latest, embeddings, allow_dangerous_deserialization=True
+        db_latest = load_vector_store(
+            faiss_db_root_latest,
+            embedding_model_name,
+            embedding_backend=embedding_backend,
+            onnx_quantize=onnx_quantize,
         )
         top_matches = db_latest.similarity_search_with_score(query=query, k=k_docs)
     else:
-        db = FAISS.load_local(
-            faiss_db_root, embeddings, allow_dangerous_deserialization=True
+        db = load_vector_store(
+            faiss_db_root,
+            embedding_model_name,
+            embedding_backend=embedding_backend,
+            onnx_quantize=onnx_quantize,
         )
         top_matches = db.similarity_search_with_score(query=query, k=k_docs)
 
@@ -202,8 +215,17 @@ if __name__ == "__main__":
     # For a question, retreive the most relevant text chunks
     question = "What was inflation in the UK recently?"
 
-    # Get the most relevant text chunks
-    relevant_texts = similarity_search(question, latest_filter=True)
+    # Get the most relevant text chunks, embedding the question as configured
+    from statschat import load_config
+
+    db_config = load_config(name="main")["db"]
+    relevant_texts = similarity_search(
+        question,
+        latest_filter=True,
+        embedding_model_name=db_config["embedding_model_name"],
+        embedding_backend=db_config.get("embedding_backend", "pytorch"),
+        onnx_quantize=db_config.get("onnx_quantize", False),
+    )
 
     if verbose:
         print("Relevant text chunks retrieved:")
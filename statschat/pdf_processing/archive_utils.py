@@ -0,0 +1,215 @@
+"""Read PDFs directly from zip/tar archives without extracting them to disk."""
+
+import io
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from statschat.pdf_processing.crawl_utils import CHUNK_SIZE, file_sha256, stream_sha256
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Compressed members up to this size are decompressed into memory; larger
+# ones spill to a temporary file that is deleted once the member is closed
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+
+def is_archive(path: Path) -> bool:
+    """True if `path` has one of the supported archive extensions."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_compressed_tar(path: Path) -> bool:
+    """
+    True if `path` is a compressed tar archive, whose members can only be
+    reached by decompressing everything stored before them.
+    """
+    return is_archive(path) and not str(path).lower().endswith((".zip", ".tar"))
+
+
+def member_key(archive_path: Path, member: str) -> str:
+    """
+    Name an archive member is recorded under in url_dict.json and the JSON
+    conversions: the archive's filename and the member's full path, e.g.
+    `drop.zip/2023/report.pdf`. Unlike the member's own filename, this cannot
+    clash with another member or with a loose PDF.
+    """
+    return f"{Path(archive_path).name}/{member[: -len('.pdf')]}.pdf"
+
+
+class ArchiveMember:
+    """
+    A PDF stored inside a zip or tar archive. Mirrors the parts of the
+    `Path` interface used by the conversion step (`name`, `stem` and
+    `open`), so it can be passed wherever a PDF path is expected. Its `name`
+    is its `member_key`.
+    """
+
+    def __init__(self, archive: Path, member: str, spooled: Path = None):
+        self.archive = Path(archive)
+        self.member = member
+        # Copy of the member already written to disk, e.g. in the content store
+        self.spooled = Path(spooled) if spooled else None
+
+    def __repr__(self):
+        return f"ArchiveMember({str(self.archive)!r}, {self.member!r})"
+
+    @property
+    def name(self) -> str:
+        return member_key(self.archive, self.member)
+
+    @property
+    def stem(self) -> str:
+        return self.name[: -len(".pdf")]
+
+    @contextmanager
+    def open(self, mode: str = "rb", seekable: bool = True):
+        """
+        Opens the member as a binary stream. Uncompressed members are
+        streamed straight from the archive. When `seekable` is True,
+        compressed members are decompressed first, because PDF readers seek
+        backwards constantly and that is very slow on a decompressing
+        stream: into memory up to `SPOOL_MAX_BYTES`, and into a temporary
+        file beyond that, so one large member cannot exhaust memory.
+
+        A member with a `spooled` copy is read from that file instead, as
+        reaching a compressed tar member means decompressing the archive up
+        to it.
+
+        Args:
+            mode (str): Must be "rb".
+            seekable (bool): Whether the caller needs cheap random access.
+
+        Yields:
+            Binary file object for the member.
+        """
+        if mode != "rb":
+            raise ValueError("Archive members can only be opened with mode 'rb'")
+
+        if self.spooled is not None:
+            with open(self.spooled, "rb") as stream:
+                yield stream
+        elif zipfile.is_zipfile(self.archive):
+            with zipfile.ZipFile(self.archive) as archive:
+                info = archive.getinfo(self.member)
+                compressed = info.compress_type != zipfile.ZIP_STORED
+                with archive.open(info) as stream:
+                    with _seekable(stream, compressed and seekable) as member:
+                        yield member
+        else:
+            with tarfile.open(self.archive) as archive:
+                compressed = not str(self.archive).lower().endswith(".tar")
+                stream = archive.extractfile(self.member)
+                with _seekable(stream, compressed and seekable) as member:
+                    yield member
+
+    def sha256(self) -> str:
+        """SHA-256 of the member, computed in one sequential pass."""
+        with self.open("rb", seekable=False) as stream:
+            return stream_sha256(stream)
+
+
+@contextmanager
+def _seekable(stream, copy: bool):
+    """
+    `stream` itself, or if `copy` is set a seekable copy of it, held in
+    memory up to `SPOOL_MAX_BYTES` and in a temporary file beyond that.
+    """
+    if not copy:
+        yield stream
+        return
+
+    head = stream.read(SPOOL_MAX_BYTES + 1)
+    if len(head) <= SPOOL_MAX_BYTES:
+        yield io.BytesIO(head)
+        return
+    with tempfile.TemporaryFile() as spool:
+        spool.write(head)
+        del head
+        shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+        spool.seek(0)
+        yield spool
+
+
+def source_sha256(source) -> str:
+    """
+    SHA-256 of a PDF source.
+
+    Args:
+        source (Path | ArchiveMember): PDF file or archive member.
+
+    Returns:
+        str: Hex digest of the PDF bytes.
+    """
+    if isinstance(source, ArchiveMember):
+        return source.sha256()
+    return file_sha256(source)
+
+
+def iter_archive_pdfs(archive_path: Path) -> Iterator[ArchiveMember]:
+    """
+    Lists the PDF members of a zip or tar archive.
+
+    Args:
+        archive_path (Path): Path to the archive.
+
+    Yields:
+        ArchiveMember: One entry per PDF file in the archive.
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            names = [
+                info.filename
+                for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(".pdf")
+            ]
+    else:
+        with tarfile.open(archive_path) as archive:
+            names = [
+                member.name
+                for member in archive.getmembers()
+                if member.isfile() and member.name.lower().endswith(".pdf")
+            ]
+
+    for name in names:
+        yield ArchiveMember(archive_path, name)
+
+
+def archive_pdf_hashes(archive_path: Path, store=None) -> dict[str, str]:
+    """
+    Hashes every PDF member of a zip or tar archive in a single pass over it.
+    When `store` is given, members of compressed tar archives are also
+    spooled into it while being hashed, so later stages can read that copy
+    instead of decompressing the archive again for each member.
+
+    Args:
+        archive_path (Path): Path to the archive.
+        store (ContentStore, optional): Content store to spool members into.
+
+    Returns:
+        dict: {member name: SHA-256 of the member}.
+    """
+    if zipfile.is_zipfile(archive_path):
+        hashes = {}
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                    with archive.open(info) as stream:
+                        hashes[info.filename] = stream_sha256(stream)
+        return hashes
+
+    spool = store is not None and is_compressed_tar(archive_path)
+    hashes = {}
+    # Stream mode reads the archive once, front to back
+    with tarfile.open(archive_path, mode="r|*") as archive:
+        for member in archive:
+            if not (member.isfile() and member.name.lower().endswith(".pdf")):
+                continue
+            stream = archive.extractfile(member)
+            hashes[member.name] = (
+                store.add_stream(stream) if spool else stream_sha256(stream)
+            )
+    return hashes
@@ -0,0 +1,146 @@
+"""
+Benchmark the PDF extraction backends on a corpus of PDFs.
+
+Reports pages/sec for each backend, and how far each backend's text is from
+the reference backend (the first one listed), measured as the character-level
+edit distance over all pages. PDFs are extracted and compared one at a time,
+so only one PDF's text is held in memory.
+
+Usage:
+    python statschat/pdf_processing/benchmark_backends.py [PDF_DIR]
+        [--backends pypdf2 pdfium pdfminer] [--max-files N]
+
+PDF_DIR defaults to data/pdf_store.
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from rapidfuzz.distance import Levenshtein
+
+from statschat.pdf_processing.pdf_backends import BACKENDS, get_backend
+
+
+def extract_pages(backend_name: str, pdf_path: Path) -> tuple[list, float]:
+    """
+    Extracts every page of one PDF with one backend.
+
+    Args:
+        backend_name (str): Backend to run.
+        pdf_path (Path): PDF to extract.
+
+    Returns:
+        tuple[list, float]: The text of each page, or None if the backend
+        could not read the PDF, and the extraction time in seconds.
+    """
+    backend = get_backend(backend_name)
+    start = time.perf_counter()
+    try:
+        with backend.open(pdf_path) as document:
+            pages = list(backend.iter_page_text(document))
+    except Exception as e:
+        print(f"{backend_name}: failed to read {pdf_path.name}: {e}")
+        pages = None
+
+    return pages, time.perf_counter() - start
+
+
+def compare_pages(reference: list[str], pages: list[str]) -> tuple[int, int]:
+    """
+    Character-level difference between two extractions of the same PDF.
+
+    Args:
+        reference (list[str]): Page texts from the reference backend.
+        pages (list[str]): Page texts from the compared backend.
+
+    Returns:
+        tuple[int, int]: Total edit distance, and total reference characters,
+        over the pages both backends read.
+    """
+    distance = 0
+    n_chars = 0
+    for ref_page, page in zip(reference, pages):
+        # Line breaks differ between libraries and are removed downstream
+        ref_page = re.sub(r"[\r\n]+", "", ref_page)
+        page = re.sub(r"[\r\n]+", "", page)
+        distance += Levenshtein.distance(ref_page, page)
+        n_chars += len(ref_page)
+
+    return distance, n_chars
+
+
+def available_backends(names: list[str]) -> list[str]:
+    """The named backends whose libraries are installed, in the given order."""
+    available = []
+    for name in names:
+        try:
+            get_backend(name).require()
+            available.append(name)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+    return available
+
+
+def benchmark_pdf(pdf_path: Path, backends: list[str], totals: dict):
+    """
+    Extracts one PDF with every backend and adds the page count, time and
+    difference from the reference backend (the first) to `totals`.
+
+    Args:
+        pdf_path (Path): PDF to extract.
+        backends (list[str]): Backends to run, reference first.
+        totals (dict): {backend: [pages, seconds, edit distance, reference
+            characters]}, updated in place.
+    """
+    reference = None
+    for name in backends:
+        pages, seconds = extract_pages(name, pdf_path)
+        totals[name][1] += seconds
+        if pages is None:
+            continue
+        totals[name][0] += len(pages)
+        if name == backends[0]:
+            reference = pages
+        elif reference is not None:
+            distance, n_chars = compare_pages(reference, pages)
+            totals[name][2] += distance
+            totals[name][3] += n_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdf_dir", nargs="?", default="data/pdf_store", type=Path)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--max-files", type=int, default=None)
+    args = parser.parse_args()
+
+    pdf_paths = sorted(args.pdf_dir.glob("*.pdf"))[: args.max_files]
+    if not pdf_paths:
+        print(f"No PDFs found in {args.pdf_dir}.")
+        return
+
+    available = available_backends(args.backends)
+    if not available:
+        raise SystemExit(
+            f"None of the backends {', '.join(args.backends)} is installed; "
+            'install them with pip install -e ".[pdf]"'
+        )
+
+    totals = {name: [0, 0.0, 0, 0] for name in available}
+    for pdf_path in pdf_paths:
+        benchmark_pdf(pdf_path, available, totals)
+
+    print(f"\n{len(pdf_paths)} PDF(s); differences relative to {available[0]}")
+    print(f"{'backend':<10} {'version':<24} {'pages':>7} {'pages/s':>9} {'diff %':>7}")
+    for name, (n_pages, elapsed, distance, n_chars) in totals.items():
+        print(
+            f"{name:<10} {get_backend(name).version:<24} {n_pages:>7} "
+            f"{n_pages / elapsed if elapsed else 0:>9.1f} "
+            f"{100 * distance / n_chars if n_chars else 0:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
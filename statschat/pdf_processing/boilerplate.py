@@ -0,0 +1,237 @@
+"""
+Detection of running headers, footers and banners in extracted PDF text.
+
+A line counts as boilerplate when, after normalising digits (so "Page 3" and
+"Page 4" match), it appears near the top or bottom of most pages of the same
+document. Lines made only of numbers, such as table rows, never count, apart
+from a lone page number.
+
+Some extractors (e.g. PyPDF2) glue the header onto the first line of body
+text ("Page 4 of 25The Consumer..."). A prefix of the first line that repeats
+across most pages is removed as well, but only up to where those pages
+diverge, and only at a point where the header can end: a number glued to a
+word, a change to a capital letter, a space or the end of the line. The same
+applies to a footer glued onto the last line.
+
+No page ever loses more than `MAX_STRIPPED_SHARE` of its text.
+"""
+
+import re
+from collections import Counter
+from typing import Iterable
+
+# Lines from each end of a page that are checked for repetition
+EDGE_LINES = 3
+# Share of a document's pages a line must appear on to be removed
+MIN_PAGE_SHARE = 0.5
+# Documents shorter than this are left untouched
+MIN_PAGES = 4
+# Shortest and longest header/footer fused onto a line of body text
+MIN_FUSED_CHARS = 6
+MAX_FUSED_CHARS = 80
+# Letters a repeated line needs, unless it is a lone page number
+MIN_LETTERS = 3
+# Pages that would lose more of their characters than this are left as they are
+MAX_STRIPPED_SHARE = 0.5
+
+
+def line_key(line: str, lower: bool = True) -> str:
+    """Normalised form of a line, with digits and whitespace collapsed."""
+    key = " ".join(re.sub(r"\d+", "#", line).split())
+    return key.lower() if lower else key
+
+
+def non_blank_lines(text: str) -> list[str]:
+    """Lines of a page that have any text."""
+    return [line for line in (text or "").splitlines() if line.strip()]
+
+
+def is_candidate(key: str) -> bool:
+    """
+    Whether a line key may be boilerplate: text with a few letters, or a
+    lone page number, but not a row of numbers.
+    """
+    n_letters = sum(char.isalpha() for char in key)
+    return n_letters >= MIN_LETTERS or (n_letters == 0 and key.count("#") == 1)
+
+
+def edge_keys(text: str, edge_lines: int = EDGE_LINES) -> set[str]:
+    """Keys of the first and last `edge_lines` non-blank lines of a page."""
+    keys = [line_key(line) for line in non_blank_lines(text)]
+    return set(keys[:edge_lines] + keys[-edge_lines:])
+
+
+def key_pattern(key: str) -> str:
+    """Regex matching the raw text a `line_key` came from."""
+    parts = {"#": r"\d+", " ": r"\s+"}
+    return "".join(parts.get(char, re.escape(char)) for char in key)
+
+
+def is_glue(before: str, after: str) -> bool:
+    """
+    Whether two adjacent characters of a case-preserving key look like two
+    texts run together: a number and a word, or a lower-case letter or
+    punctuation followed by a capital.
+    """
+    if " " in (before, after):
+        return False
+    if "#" in (before, after):
+        return (before + after).replace("#", "").isalpha()
+    return after.isupper() and not before.isupper()
+
+
+def fused_prefix(keys: list[str], min_count: float, reverse: bool = False) -> str:
+    """
+    Header fused onto the start of at least `min_count` of the keys, or None.
+
+    The candidate is the longest prefix shared by every key that starts with
+    the most common `MIN_FUSED_CHARS` characters, i.e. it stops where those
+    pages diverge. It is then cut back to the last place the header can end,
+    preferring a glued join (e.g. "Page # of #" in "Page # of #The economy")
+    over a space, so a first word shared by the pages' body text stays.
+
+    Args:
+        keys (list[str]): Case-preserving keys of the first line of each page,
+            or reversed keys of the last line when `reverse` is set.
+        min_count (float): Pages the header must appear on.
+        reverse (bool): Whether the keys are reversed (for footers).
+
+    Returns:
+        str: The prefix, or None.
+    """
+    counts = Counter()
+    for key in keys:
+        key = key[:MAX_FUSED_CHARS]
+        counts.update(key[:n] for n in range(MIN_FUSED_CHARS, len(key) + 1))
+    top = max(counts.values(), default=0)
+    if top < min_count:
+        return None
+    shared = max((prefix for prefix, count in counts.items() if count == top), key=len)
+
+    def glued(index: int, text: str) -> bool:
+        pair = (text[index - 1], text[index])
+        return is_glue(*(pair[::-1] if reverse else pair))
+
+    following = [key[: len(shared) + 1] for key in keys if key.startswith(shared)]
+    ends_glued = all(
+        len(key) > len(shared) and glued(len(shared), key) for key in following
+    )
+    ends_on_word = all(len(key) == len(shared) or " " in key[-2:] for key in following)
+    inner_glue = [i for i in range(1, len(shared)) if glued(i, shared)]
+
+    if ends_glued:
+        cut = len(shared)
+    elif inner_glue:
+        cut = inner_glue[-1]
+    elif ends_on_word:
+        cut = len(shared)
+    else:
+        cut = shared.rfind(" ")
+    prefix = shared[: max(cut, 0)].strip()
+    if len(prefix) < MIN_FUSED_CHARS or not is_candidate(prefix):
+        return None
+    return prefix
+
+
+class Boilerplate:
+    """
+    The repeated lines of one document, plus any header fused onto the
+    start of the first line or footer fused onto the end of the last.
+    """
+
+    def __init__(self, lines: set[str] = None, prefix: str = None, suffix: str = None):
+        self.lines = lines or set()
+        self.prefix = None
+        self.suffix = None
+        if prefix:
+            # Stop at the end of a word or number, not inside one
+            end = r"(?!\d)" if prefix[-1] == "#" else ""
+            end = r"(?![a-z])" if prefix[-1].islower() else end
+            self.prefix = re.compile(r"^\s*(?i:" + key_pattern(prefix) + ")" + end)
+        if suffix:
+            start = r"(?<!\d)" if suffix[0] == "#" else ""
+            start = r"(?<![A-Za-z])" if suffix[0].islower() else start
+            self.suffix = re.compile(start + "(?i:" + key_pattern(suffix) + r")\s*$")
+
+    def __bool__(self):
+        return bool(self.lines or self.prefix or self.suffix)
+
+    def strip(self, text: str) -> str:
+        """
+        Removes the boilerplate from the edges of a page, unless that would
+        remove more than `MAX_STRIPPED_SHARE` of it.
+
+        Args:
+            text (str): Raw page text.
+
+        Returns:
+            str: The page text, unchanged if it has no boilerplate.
+        """
+        if not text or not self:
+            return text
+
+        lines = text.splitlines(keepends=True)
+        non_blank = [i for i, line in enumerate(lines) if line.strip()]
+        edges = set(non_blank[:EDGE_LINES] + non_blank[-EDGE_LINES:])
+        drop = {i for i in edges if line_key(lines[i]) in self.lines}
+        kept = [line for i, line in enumerate(lines) if i not in drop]
+
+        body = [i for i, line in enumerate(kept) if line.strip()]
+        if body and self.prefix:
+            kept[body[0]] = self.prefix.sub("", kept[body[0]], count=1)
+        if body and self.suffix:
+            last = kept[body[-1]]
+            ending = last[len(last.rstrip("\r\n")) :]
+            kept[body[-1]] = self.suffix.sub("", last.rstrip("\r\n")) + ending
+
+        stripped = "".join(kept)
+        n_chars = len("".join(text.split()))
+        if n_chars - len("".join(stripped.split())) > MAX_STRIPPED_SHARE * n_chars:
+            return text
+        return stripped
+
+
+def find_boilerplate(
+    page_texts: Iterable[str],
+    min_share: float = MIN_PAGE_SHARE,
+    min_pages: int = MIN_PAGES,
+) -> Boilerplate:
+    """
+    Finds the lines, header prefix and footer suffix repeated at the edges
+    of most pages of a document.
+
+    Args:
+        page_texts (Iterable[str]): Raw text of every page of one document.
+        min_share (float): Share of pages the boilerplate must appear on.
+        min_pages (int): Minimum page count for anything to be removed.
+
+    Returns:
+        Boilerplate: What to strip from each page.
+    """
+    counts = Counter()
+    first_keys = []
+    last_keys = []
+    for text in page_texts:
+        counts.update(key for key in edge_keys(text) if is_candidate(key))
+        lines = non_blank_lines(text)
+        if lines:
+            first_keys.append(line_key(lines[0], lower=False))
+            last_keys.append(line_key(lines[-1], lower=False)[::-1])
+
+    n_pages = len(first_keys)
+    if n_pages < min_pages:
+        return Boilerplate()
+
+    min_count = min_share * n_pages
+    lines = {key for key, count in counts.items() if count >= min_count}
+
+    # Only look for fused text on lines that are not boilerplate themselves
+    prefix = fused_prefix(
+        [key for key in first_keys if key.lower() not in lines], min_count
+    )
+    suffix = fused_prefix(
+        [key for key in last_keys if key[::-1].lower() not in lines],
+        min_count,
+        reverse=True,
+    )
+    return Boilerplate(lines, prefix, suffix[::-1] if suffix else None)
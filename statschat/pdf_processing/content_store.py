@@ -0,0 +1,247 @@
+"""Content-addressed storage for PDFs, keyed by SHA-256."""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from statschat.pdf_processing.archive_utils import ArchiveMember, source_sha256
+from statschat.pdf_processing.crawl_utils import CHUNK_SIZE, file_sha256
+
+# ioctl request number for FICLONE (copy-on-write clone) on Linux
+FICLONE = 0x40049409
+# File in the store's root recording the hash of every named PDF
+INDEX_NAME = "index.json"
+
+
+class ContentStore:
+    """
+    Single record of which PDFs share the same bytes, keyed by SHA-256.
+
+    Named PDFs (in `pdf_store`, `latest_pdf_store` or `local_pdfs`) are the
+    only physical copy of their bytes: the store just records each file's
+    hash, size and mtime in `<root>/index.json`, so a PDF republished under
+    several filenames is processed only once and unchanged files are never
+    re-hashed. Where the filesystem supports copy-on-write clones, a new
+    alias of a known PDF is turned into a clone of it so they share blocks;
+    nothing is ever copied.
+
+    Only PDFs that have no file of their own, i.e. members of compressed tar
+    archives, are written as objects under `<root>/<hash[:2]>/<hash>.pdf`.
+
+    Call `save` to persist the index.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        index_path = self.root / INDEX_NAME
+        self.files = {}
+        if index_path.exists():
+            with open(index_path) as index_file:
+                self.files = json.load(index_file)
+        # {sha256: names of the files recorded with it}
+        self._by_hash = {}
+        for name, entry in self.files.items():
+            self._by_hash.setdefault(entry["sha256"], set()).add(name)
+
+    def object_path(self, sha256: str) -> Path:
+        """Location of the object for a content hash."""
+        return self.root / sha256[:2] / f"{sha256}.pdf"
+
+    def known_sha256(self, path: Path) -> str:
+        """Recorded hash of `path`, or None if unknown or changed since."""
+        entry = self.files.get(str(Path(path).resolve()))
+        if not entry:
+            return None
+        try:
+            stat = Path(path).stat()
+        except FileNotFoundError:
+            return None
+        if (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return entry["sha256"]
+
+    def aliases(self, sha256: str) -> list[Path]:
+        """Named PDFs recorded with the given hash that still exist."""
+        names = sorted(self._by_hash.get(sha256, ()))
+        return [Path(name) for name in names if Path(name).exists()]
+
+    def add(self, path: Path, sha256: str = None) -> str:
+        """
+        Records a named PDF in the store without copying it. If a different
+        file with the same bytes is already recorded, `path` is turned into a
+        copy-on-write clone of it where the filesystem supports that.
+
+        Args:
+            path (Path): PDF to register.
+            sha256 (str, optional): Known hash of `path`, computed if omitted.
+
+        Returns:
+            str: Hex SHA-256 of the PDF.
+        """
+        path = Path(path)
+        sha256 = sha256 or self.known_sha256(path) or file_sha256(path)
+
+        with self._lock:
+            for alias in self.aliases(sha256):
+                if os.path.samefile(alias, path):
+                    continue
+                # Same bytes under another name: share the alias's blocks
+                tmp_path = path.with_name(f"{path.name}.alias")
+                if _reflink(alias, tmp_path):
+                    os.replace(tmp_path, path)
+                break
+
+            name = str(path.resolve())
+            previous = self.files.get(name)
+            if previous:
+                self._by_hash[previous["sha256"]].discard(name)
+            stat = path.stat()
+            self.files[name] = {
+                "sha256": sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+            self._by_hash.setdefault(sha256, set()).add(name)
+
+        return sha256
+
+    def sha256(self, source) -> str:
+        """
+        Hash of a PDF source, from the index where it is known, recording
+        named files that are not.
+
+        Args:
+            source (Path | ArchiveMember): PDF file or archive member.
+
+        Returns:
+            str: Hex digest of the PDF bytes.
+        """
+        if isinstance(source, ArchiveMember):
+            return source_sha256(source)
+        return self.add(source)
+
+    def group(self, pdf_sources: dict, url_dict: dict) -> dict[str, list[str]]:
+        """
+        Groups PDF filenames (without extensions) by content hash, using the
+        hash recorded in url_dict.json, then the store's index, and only
+        hashing sources found in neither.
+
+        Args:
+            pdf_sources (dict): {filename (without extension): PDF path or
+                archive member}.
+            url_dict (dict): URL dictionary for the PDFs.
+
+        Returns:
+            dict: {sha256: [filenames]}. Filenames are sorted, so the canonical
+                (first) filename of each group is stable between runs.
+        """
+        groups = {}
+        for pdf in sorted(pdf_sources):
+            sha256 = url_dict.get(f"{pdf}.pdf", {}).get("sha256") or self.sha256(
+                pdf_sources[pdf]
+            )
+            groups.setdefault(sha256, []).append(pdf)
+
+        return groups
+
+    def add_stream(self, stream, chunk_size: int = CHUNK_SIZE) -> str:
+        """
+        Writes a PDF from a binary stream into the store as an object, hashing
+        it on the way, e.g. a member of a compressed archive that is read only
+        once.
+
+        Args:
+            stream: Readable binary file object.
+            chunk_size (int): Bytes read per step.
+
+        Returns:
+            str: Hex SHA-256 of the PDF. Its object is at `object_path`.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(
+            dir=self.root, suffix=".part", delete=False
+        ) as tmp_file:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                hasher.update(chunk)
+                tmp_file.write(chunk)
+
+        sha256 = hasher.hexdigest()
+        obj = self.object_path(sha256)
+        if obj.exists():
+            os.unlink(tmp_file.name)
+        else:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_file.name, obj)
+
+        return sha256
+
+    def save(self):
+        """Writes the index atomically, dropping files that no longer exist."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for name in [name for name in self.files if not Path(name).exists()]:
+                self._by_hash[self.files.pop(name)["sha256"]].discard(name)
+            tmp_path = self.root / f"{INDEX_NAME}.tmp"
+            with open(tmp_path, "w") as index_file:
+                json.dump(self.files, index_file, indent=4)
+            os.replace(tmp_path, self.root / INDEX_NAME)
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    """Clones `src` to `dest` copy-on-write. Returns False if unsupported."""
+    try:
+        import fcntl
+    except ImportError:  # not available on Windows
+        return False
+
+    try:
+        with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+    return True
+
+
+def link_or_copy(src: Path, dest: Path) -> str:
+    """
+    Places `src` at `dest` without reading it into memory. Tries a
+    copy-on-write reflink first, then a hard link, and falls back to a
+    streamed copy. An existing `dest` is replaced atomically. A hard link
+    makes `dest` the same file as `src`, so neither may be modified in place
+    afterwards; downloads and ingests always replace files, never rewrite
+    them.
+
+    Args:
+        src (Path): File to ingest.
+        dest (Path): Destination path.
+
+    Returns:
+        str: The method used: "reflink", "hardlink" or "copy".
+    """
+    src, dest = Path(src), Path(dest)
+    if dest.exists() and os.path.samefile(src, dest):
+        return "hardlink"
+
+    tmp_path = dest.with_name(f"{dest.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    if _reflink(src, tmp_path):
+        method = "reflink"
+    else:
+        try:
+            os.link(src, tmp_path)
+            method = "hardlink"
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+            method = "copy"
+
+    os.replace(tmp_path, dest)
+    return method
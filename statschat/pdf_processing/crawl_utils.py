@@ -0,0 +1,494 @@
+"""Shared HTTP helpers for crawling report pages and downloading PDFs."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# Bytes read and written per step when streaming files
+CHUNK_SIZE = 1024 * 1024
+
+
+def stream_sha256(stream, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Computes the SHA-256 of a binary stream, reading it in fixed-size chunks.
+
+    Args:
+        stream: Readable binary file object.
+        chunk_size (int): Bytes read per step.
+
+    Returns:
+        str: Hex digest of the stream contents.
+    """
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def file_sha256(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Computes the SHA-256 of a file without loading it into memory.
+
+    Args:
+        path (Path): File to hash.
+        chunk_size (int): Bytes read per step.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    with open(path, "rb") as file:
+        return stream_sha256(file, chunk_size)
+
+
+def content_range(
+    response: requests.Response,
+) -> tuple[Optional[int], Optional[int]]:
+    """
+    First byte and total size from a response's Content-Range header, e.g.
+    "bytes 100-199/500" or "bytes */500". Either is None when not given.
+    """
+    match = re.match(
+        r"bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)",
+        response.headers.get("Content-Range", ""),
+    )
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (
+        int(start) if start is not None else None,
+        int(total) if total != "*" else None,
+    )
+
+
+def build_session(pool_size: int = 10) -> requests.Session:
+    """
+    Create a requests session backed by a keep-alive connection pool.
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host.
+
+    Returns:
+        requests.Session: Session that reuses TCP/TLS connections between calls.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+class HostLimiter:
+    """
+    Caps the number of in-flight requests sent to any single host.
+    """
+
+    def __init__(self, per_host: int = 4):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._semaphores = defaultdict(
+            lambda: threading.BoundedSemaphore(self.per_host)
+        )
+
+    @contextmanager
+    def __call__(self, url: str):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores[host]
+        with semaphore:
+            yield
+
+
+class FetchCache:
+    """
+    Persistent on-disk HTTP cache keyed by URL. Stores the ETag and
+    Last-Modified validators of each response (and optionally its body) so
+    that later requests can be made conditional and answered locally on a 304.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, url: str):
+        """
+        Returns the cached entry for `url`, or None if there is no usable one.
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r") as meta_file:
+                entry = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("has_body") and not body_path.exists():
+            return None
+
+        return entry
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        """Conditional request headers built from a cached entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(
+        self,
+        url: str,
+        response: requests.Response,
+        store_body: bool = True,
+        **extra,
+    ):
+        """
+        Records a 200 response for `url`.
+
+        Args:
+            url (str): Requested URL (the cache key).
+            response (requests.Response): Response to record.
+            store_body (bool): Also keep the body so it can be served locally.
+            **extra: Additional fields to keep with the entry (e.g. sha256).
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if store_body:
+            self._write_atomic(body_path, response.content)
+
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "fetched_at": time.time(),
+            "has_body": store_body,
+            **extra,
+        }
+        self._write_atomic(meta_path, json.dumps(entry).encode("utf-8"))
+
+    def touch(self, url: str, entry: dict) -> None:
+        """Marks a cached entry as freshly revalidated."""
+        meta_path, _ = self._paths(url)
+        entry = {**entry, "fetched_at": time.time()}
+        self._write_atomic(meta_path, json.dumps(entry).encode("utf-8"))
+
+    def response(self, url: str, entry: dict) -> requests.Response:
+        """Rebuilds a 200 response for `url` from the cached body."""
+        _, body_path = self._paths(url)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body_path.read_bytes()
+        response.headers = CaseInsensitiveDict(
+            {"Content-Type": entry.get("content_type") or ""}
+        )
+        response.from_cache = True
+
+        return response
+
+
+class CrawlStats:
+    """
+    Thread-safe counters for pages fetched and bytes transferred.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.bytes = 0
+        self.cached = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, n_bytes: int, cached: bool = False) -> None:
+        """Count one completed request of `n_bytes` bytes."""
+        with self._lock:
+            self.pages += 1
+            self.bytes += n_bytes
+            self.cached += cached
+
+    def summary(self) -> str:
+        """Human readable throughput line (pages/s and MB/s)."""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        megabytes = self.bytes / 1_000_000
+        return (
+            f"Fetched {self.pages} pages ({megabytes:.1f} MB) in {elapsed:.1f}s: "
+            f"{self.pages / elapsed:.2f} pages/s, {megabytes / elapsed:.2f} MB/s "
+            f"({self.cached} served from cache)"
+        )
+
+
+class Fetcher:
+    """
+    Wraps a pooled session, per-host limit, timeout, optional HTTP cache and
+    throughput stats so that crawler threads can share a single set of
+    connections.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        per_host: int = 4,
+        timeout: float = 30.0,
+        cache: FetchCache = None,
+        max_age: float = 0,
+    ):
+        self.session = build_session(pool_size=max(workers, per_host))
+        self.limiter = HostLimiter(per_host)
+        self.timeout = timeout
+        self.cache = cache
+        self.max_age = max_age
+        self.stats = CrawlStats()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET `url` through the shared session, respecting the per-host limit.
+        When a cache is attached the request is made conditional, and a 304
+        is answered from the cached body. Entries younger than `max_age`
+        seconds are served without contacting the server at all.
+
+        Args:
+            url (str): URL to fetch.
+            **kwargs: Passed through to `requests.Session.get`.
+
+        Returns:
+            requests.Response: The (fully read) response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        entry = self.cache.lookup(url) if self.cache is not None else None
+        if entry and not entry["has_body"]:
+            entry = None
+
+        if entry and time.time() - entry["fetched_at"] < self.max_age:
+            self.stats.record(0, cached=True)
+            return self.cache.response(url, entry)
+
+        if entry:
+            headers = dict(kwargs.pop("headers", None) or {})
+            headers.update(FetchCache.validators(entry))
+            kwargs["headers"] = headers
+
+        with self.limiter(url):
+            response = self.session.get(url, **kwargs)
+            self.stats.record(len(response.content), cached=response.status_code == 304)
+
+        if entry and response.status_code == 304:
+            self.cache.touch(url, entry)
+            return self.cache.response(url, entry)
+        if self.cache is not None and response.status_code == 200:
+            self.cache.store(url, response)
+
+        return response
+
+    def _download_headers(self, dest: Path, part: Path, entry: dict) -> dict:
+        """Range/conditional headers for resuming or revalidating a download."""
+        headers = {}
+        if part.exists() and part.stat().st_size > 0:
+            headers["Range"] = f"bytes={part.stat().st_size}-"
+            # Only accept the remaining bytes if the file has not changed
+            if entry and (entry.get("etag") or entry.get("last_modified")):
+                headers["If-Range"] = entry.get("etag") or entry["last_modified"]
+        elif dest.exists() and entry:
+            headers.update(FetchCache.validators(entry))
+
+        return headers
+
+    def _resumable(self, response: requests.Response, part: Path, entry) -> bool:
+        """
+        Whether `part` can be kept: a 206 must continue it exactly where it
+        ends, and a 416 only means it is complete if its size matches the
+        total reported by the server (or recorded when it was started).
+        """
+        start, total = content_range(response)
+        size = part.stat().st_size if part.exists() else 0
+        if response.status_code == 206:
+            return start == size
+        if total is None and entry:
+            total = entry.get("size")
+        return size > 0 and total == size
+
+    def download(self, url: str, dest: Path, chunk_size: int = CHUNK_SIZE):
+        """
+        Streams `url` to `dest` in fixed-size chunks, computing its SHA-256
+        while writing. Bytes are first written to `<dest>.part`, so an
+        interrupted download is resumed with an HTTP Range request on the
+        next call. An unchanged file (304) is kept as it is. A `.part` file
+        that turns out to be complete (416) is finalised, and one the server
+        cannot continue exactly is discarded and the download restarted.
+
+        Args:
+            url (str): URL of the file.
+            dest (Path): Final location of the file.
+            chunk_size (int): Bytes read from the socket per write.
+
+        Returns:
+            str | None: Hex SHA-256 of the file, or None if the server refused.
+        """
+        dest = Path(dest)
+        part = dest.with_name(f"{dest.name}.part")
+        entry = self.cache.lookup(url) if self.cache is not None else None
+
+        # A second attempt starts from zero if the partial file is unusable
+        for _ in range(2):
+            headers = self._download_headers(dest, part, entry)
+            with self.limiter(url):
+                response = self.session.get(
+                    url, headers=headers, stream=True, timeout=self.timeout
+                )
+                with response:
+                    status = response.status_code
+                    if status == 304 and entry:
+                        self.stats.record(0, cached=True)
+                        self.cache.touch(url, entry)
+                        return entry.get("sha256") or file_sha256(dest, chunk_size)
+
+                    if status not in (200, 206, 416):
+                        self.stats.record(0)
+                        return None
+
+                    if status != 200 and not self._resumable(response, part, entry):
+                        self.stats.record(0)
+                        part.unlink(missing_ok=True)
+                        continue
+
+                    if status == 416:  # every byte is already in `part`
+                        self.stats.record(0)
+                        digest = file_sha256(part, chunk_size)
+                    else:
+                        digest = self._stream_to_part(url, response, part, chunk_size)
+
+            os.replace(part, dest)
+            if self.cache is not None:
+                self.cache.store(
+                    url,
+                    response,
+                    store_body=False,
+                    sha256=digest,
+                    size=dest.stat().st_size,
+                )
+
+            return digest
+
+        return None
+
+    def _stream_to_part(
+        self, url: str, response: requests.Response, part: Path, chunk_size: int
+    ) -> str:
+        """Writes a streamed response to `part`, appending if it is a 206."""
+        hasher = hashlib.sha256()
+        if response.status_code == 206:
+            mode = "ab"
+            with open(part, "rb") as existing:
+                for chunk in iter(lambda: existing.read(chunk_size), b""):
+                    hasher.update(chunk)
+        else:
+            mode = "wb"
+            if self.cache is not None:
+                # Keep the validators and size so an interrupted download can
+                # resume, and a finished one be recognised
+                size = response.headers.get("Content-Length")
+                self.cache.store(
+                    url,
+                    response,
+                    store_body=False,
+                    size=int(size) if size and size.isdigit() else None,
+                )
+
+        n_bytes = 0
+        with open(part, mode) as file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                file.write(chunk)
+                hasher.update(chunk)
+                n_bytes += len(chunk)
+
+        self.stats.record(n_bytes)
+        return hasher.hexdigest()
+
+
+class CrawlState:
+    """
+    Persisted crawl frontier: the report pages already visited (scraped,
+    with their PDF downloaded), those that failed, the newest report seen and
+    a fingerprint of the reports listed on each listing page. Lets an
+    incremental crawl stop at the first listing page with nothing new.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.visited_reports = set()
+        self.failed_reports = set()
+        self.newest_report = None
+        self.listing_fingerprints = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "CrawlState":
+        """Loads the state from `path`, or returns an empty state."""
+        state = cls(path)
+        if state.path.exists():
+            with open(state.path, "r") as json_file:
+                saved = json.load(json_file)
+            state.visited_reports = set(saved.get("visited_reports", []))
+            state.failed_reports = set(saved.get("failed_reports", []))
+            state.newest_report = saved.get("newest_report")
+            state.listing_fingerprints = saved.get("listing_fingerprints", {})
+
+        return state
+
+    def save(self) -> None:
+        """Writes the state to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "newest_report": self.newest_report,
+            "listing_fingerprints": self.listing_fingerprints,
+            "visited_reports": sorted(self.visited_reports),
+            "failed_reports": sorted(self.failed_reports),
+        }
+        with open(self.path, "w") as json_file:
+            json.dump(state, json_file, indent=4)
+
+    @staticmethod
+    def fingerprint(report_links: list) -> str:
+        """Hash of the ordered report links found on a listing page."""
+        return hashlib.sha256("\n".join(report_links).encode("utf-8")).hexdigest()
+
+    def is_known_page(self, page: int, report_links: list) -> bool:
+        """
+        True if a listing page is unchanged since the last crawl, or lists
+        only reports that have already been visited. A page listing a report
+        that failed last time is never known, so the report is retried.
+        """
+        if any(link in self.failed_reports for link in report_links):
+            return False
+        if self.listing_fingerprints.get(str(page)) == self.fingerprint(report_links):
+            return True
+        return all(link in self.visited_reports for link in report_links)
+
+    def record_page(self, page: int, report_links: list) -> None:
+        """Stores the fingerprint of a listing page (and the newest report)."""
+        self.listing_fingerprints[str(page)] = self.fingerprint(report_links)
+        if page == 1 and report_links:
+            self.newest_report = report_links[0]
@@ -0,0 +1,246 @@
+"""
+Line-delimited JSON (JSONL) batch files for publication records.
+
+Each line of a batch is one publication: its metadata once, followed by the
+list of its pages. A batch holds up to a few hundred publications, so a corpus
+is a handful of files rather than one file per publication or per page.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from types import GeneratorType
+from typing import Iterator
+
+BATCH_SUFFIX = ".jsonl"
+RECORDS_PER_BATCH = 500
+
+
+def dump_record(record: dict, file):
+    """
+    Writes `record` to `file` as one compact JSON line. Generator values are
+    streamed as lists one item at a time, so a document's pages never need to
+    be held in memory together.
+
+    Args:
+        record (dict): The JSON object to write.
+        file: Text file opened for writing.
+    """
+    file.write("{")
+    for key_index, (key, value) in enumerate(record.items()):
+        file.write(("," if key_index else "") + json.dumps(key) + ":")
+        if not isinstance(value, GeneratorType):
+            file.write(json.dumps(value, separators=(",", ":")))
+            continue
+
+        file.write("[")
+        for item_index, item in enumerate(value):
+            file.write(
+                ("," if item_index else "") + json.dumps(item, separators=(",", ":"))
+            )
+        file.write("]")
+    file.write("}\n")
+
+
+class BatchWriter:
+    """
+    Appends publication records to JSONL batch files in `directory`, starting
+    a new batch every `records_per_batch` records. A batch is written under a
+    `.tmp` name and only renamed to `.jsonl` once it is complete, so readers
+    never see a partially written batch.
+
+    Batches are named `<prefix>-<timestamp>-<pid>-<number>.jsonl`. The
+    timestamp is when the writer was created, unless `created` gives the
+    time the records date from.
+
+    Use as a context manager so the last batch is closed.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str = "batch",
+        records_per_batch: int = RECORDS_PER_BATCH,
+        created: datetime = None,
+    ):
+        self.directory = Path(directory)
+        created = created or datetime.now()
+        self.prefix = f"{prefix}-{created:%Y%m%d%H%M%S}-{os.getpid()}"
+        self.records_per_batch = records_per_batch
+        self.paths = []
+        self._file = None
+        self._tmp_path = None
+        self._n_records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _batch_file(self):
+        """The open batch file, starting a new one if the current one is full."""
+        if self._file is not None and self._n_records >= self.records_per_batch:
+            self.close()
+        if self._file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{self.prefix}-{len(self.paths):04d}{BATCH_SUFFIX}"
+            self._tmp_path = path.with_name(f"{path.name}.tmp")
+            self._file = open(self._tmp_path, "w")
+            self.paths.append(path)
+            self._n_records = 0
+        return self._file
+
+    def write(self, record: dict):
+        """Appends one record."""
+        dump_record(record, self._batch_file())
+        self._n_records += 1
+
+    def write_file(self, path: Path):
+        """
+        Appends the records of a JSONL file written elsewhere (e.g. by a
+        worker process), copying it in chunks, then deletes it.
+        """
+        batch_file = self._batch_file()
+        with open(path) as records:
+            shutil.copyfileobj(records, batch_file)
+            self._n_records += 1
+        os.remove(path)
+
+    def close(self):
+        """Closes the current batch and moves it into place."""
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._tmp_path, self.paths[-1])
+        self._file = None
+
+
+def list_batches(directory: Path) -> list[Path]:
+    """
+    Batch files in `directory`, oldest first, by the timestamp in their
+    names (see `BatchWriter`) rather than by their prefix.
+    """
+    return sorted(Path(directory).glob(f"*{BATCH_SUFFIX}"), key=_batch_order)
+
+
+def _batch_order(path: Path) -> tuple:
+    """Sort key of a batch: its timestamp, process ID and number."""
+    parts = path.name[: -len(BATCH_SUFFIX)].rsplit("-", 3)
+    if len(parts) == 4 and all(part.isdigit() for part in parts[1:]):
+        _, timestamp, pid, number = parts
+        return timestamp, int(pid), int(number), path.name
+    # Names from elsewhere sort first, by modification time
+    return "", 0, path.stat().st_mtime_ns, path.name
+
+
+def iter_records(directory: Path) -> Iterator[dict]:
+    """
+    Reads every record of every batch in `directory`, one line at a time.
+
+    Args:
+        directory (Path): Directory of JSONL batches.
+
+    Yields:
+        dict: Publication records, oldest batch first.
+    """
+    for path in list_batches(directory):
+        with open(path) as batch:
+            for line in batch:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def migrate_legacy_json(directory: Path, key: str = "file_name") -> int:
+    """
+    Moves publication records left as one `.json` file each by older
+    versions of the conversion into a JSONL batch, then deletes the files, so
+    they are read with the rest of the corpus. Records already present in a
+    batch are newer conversions, so their legacy files are only deleted.
+    Files that cannot be parsed are left in place with a warning.
+
+    Args:
+        directory (Path): Directory of JSONL batches.
+        key (str): Record field identifying a publication.
+
+    Returns:
+        int: Number of records moved into the batch.
+    """
+    legacy_paths = sorted(Path(directory).glob("*.json"))
+    if not legacy_paths:
+        return 0
+
+    batched = {record.get(key) for record in iter_records(directory)}
+    migrated = []
+    # Dated by the oldest file, so the batch sorts before newer conversions
+    oldest = datetime.fromtimestamp(min(path.stat().st_mtime for path in legacy_paths))
+    with BatchWriter(directory, prefix="legacy", created=oldest) as batches:
+        for path in legacy_paths:
+            try:
+                with open(path) as legacy_file:
+                    record = json.load(legacy_file)
+            except (OSError, ValueError) as e:
+                print(f"Could not migrate {path}, leaving it in place: {e}")
+                continue
+            if not isinstance(record, dict):
+                print(f"Could not migrate {path}, leaving it in place: not a record")
+                continue
+            if record.get(key) not in batched:
+                batches.write(record)
+                migrated.append(path)
+            else:
+                path.unlink()
+
+    # Only delete the files once their batch is in place
+    for path in migrated:
+        path.unlink()
+    if migrated:
+        print(f"Migrated {len(migrated)} per-file JSON record(s) in {directory}")
+
+    return len(migrated)
+
+
+def drop_superseded(batches: list[Path], keys: set, key: str = "file_name") -> int:
+    """
+    Removes records whose `key` is in `keys` from the given batches, e.g.
+    publications replaced by newly converted versions. Only batches
+    containing such records are rewritten.
+
+    Args:
+        batches (list[Path]): JSONL batch files, see `list_batches`.
+        keys (set): Values of `key` to remove.
+        key (str): Record field identifying a publication.
+
+    Returns:
+        int: Number of records removed.
+    """
+    removed = 0
+    for path in batches:
+        with open(path) as batch:
+            dropped = sum(1 for line in batch if _record_key(line, key) in keys)
+        if not dropped:
+            continue
+
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        kept = 0
+        with open(path) as batch, open(tmp_path, "w") as output:
+            for line in batch:
+                if line.strip() and _record_key(line, key) not in keys:
+                    output.write(line)
+                    kept += 1
+
+        if kept:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+            os.remove(path)
+        removed += dropped
+
+    return removed
+
+
+def _record_key(line: str, key: str):
+    """Value of `key` in a JSON line, or None for blank lines."""
+    return json.loads(line).get(key) if line.strip() else None
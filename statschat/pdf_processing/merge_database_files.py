@@ -2,6 +2,12 @@
 # import packages
 from pathlib import Path
 import json
+from statschat.pdf_processing.jsonl_batches import (
+    drop_superseded,
+    iter_records,
+    list_batches,
+    migrate_legacy_json,
+)
 
 # %%
 # Database directories
@@ -15,8 +21,22 @@ LATEST_JSON_DIR = Path.cwd().joinpath("data/latest_json_conversions")
 LATEST_DATA_DIR = Path.cwd().joinpath("data/latest_pdf_store")
 
 # %%
-# Moves latest json conversions files 'json_conversions' folder
-for json_file in LATEST_JSON_DIR.glob("*.json"):
+# Conversions from before JSONL batches, one .json file per publication,
+# would otherwise be ignored
+for batch_dir in (JSON_DIR, LATEST_JSON_DIR):
+    migrate_legacy_json(batch_dir)
+
+# %%
+# Publications re-converted in this update replace their earlier records
+updated_files = {record["file_name"] for record in iter_records(LATEST_JSON_DIR)}
+for batch_dir in (JSON_DIR, JSON_SPLIT_DIR):
+    removed = drop_superseded(list_batches(batch_dir), updated_files)
+    print(f"Removed {removed} superseded record(s) from {batch_dir}")
+
+# %%
+# Moves latest json conversions batches to 'json_conversions' folder
+JSON_DIR.mkdir(parents=True, exist_ok=True)
+for json_file in list_batches(LATEST_JSON_DIR):
     source_file = json_file
 
     destination_file = JSON_DIR.joinpath(json_file.name)
@@ -26,9 +46,9 @@ for json_file in LATEST_JSON_DIR.glob("*.json"):
     print(f"{json_file.name} has been moved to {JSON_DIR}")
 
 # %%
-# Moves latest json split files to all 'json_split' folder
-
-for json_split_file in LATEST_JSON_SPLIT_DIR.glob("*.json"):
+# Moves latest json split batches to all 'json_split' folder
+JSON_SPLIT_DIR.mkdir(parents=True, exist_ok=True)
+for json_split_file in list_batches(LATEST_JSON_SPLIT_DIR):
     source_file = json_split_file
 
     destination_file = JSON_SPLIT_DIR.joinpath(json_split_file.name)
@@ -61,9 +81,12 @@ with open(ORIGINAL_URL_DICT_PATH, "r") as file:
 with open(LATEST_URL_DICT_PATH, "r") as file:
     latest_url_dict = json.load(file)
 
-# Merge: Add only new entries
+# Merge: Add new entries, and replace entries whose PDF content has changed
 new_entries = {
-    key: value for key, value in latest_url_dict.items() if key not in original_url_dict
+    key: value
+    for key, value in latest_url_dict.items()
+    if key not in original_url_dict
+    or original_url_dict[key].get("sha256") != value.get("sha256")
 }
 original_url_dict.update(new_entries)
 
@@ -0,0 +1,171 @@
+"""
+Persistent cache of extracted PDF page text.
+
+Run this module to prune the cache, dropping the PDFs least recently
+converted until it fits in `--max-mb`, and those not converted for
+`--max-age-days`:
+
+    python statschat/pdf_processing/page_cache.py [--max-mb N] [--max-age-days N]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+# Pages are committed in batches, so a crash loses at most this many pages
+COMMIT_EVERY = 50
+
+
+class PageCache:
+    """
+    SQLite cache of page text keyed by (PDF content hash, extractor version,
+    page index). Re-running the conversion only parses pages that are not in
+    the cache, and switching backend or upgrading the PDF library starts a
+    fresh set of entries instead of reusing stale text.
+
+    The database is opened lazily in each process, so one instance can be
+    shared with the workers of a process pool. It uses SQLite's default
+    rollback journal rather than WAL, which needs shared memory and so does
+    not work when `data/` sits on a network filesystem.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            # Also switches back caches created in WAL mode
+            self._connection.execute("PRAGMA journal_mode=DELETE")
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    sha256 TEXT, extractor TEXT, page INTEGER, text TEXT,
+                    PRIMARY KEY (sha256, extractor, page)
+                );
+                CREATE TABLE IF NOT EXISTS documents (
+                    sha256 TEXT, extractor TEXT, n_pages INTEGER, last_used REAL,
+                    PRIMARY KEY (sha256, extractor)
+                );
+                """
+            )
+            columns = [
+                column
+                for _, column, *_ in self._connection.execute(
+                    "PRAGMA table_info(documents)"
+                )
+            ]
+            if "last_used" not in columns:
+                with self._connection:
+                    self._connection.execute(
+                        "ALTER TABLE documents ADD COLUMN last_used REAL DEFAULT 0"
+                    )
+            self._pid = os.getpid()
+        return self._connection
+
+    def page_count(self, sha256: str, extractor: str) -> int:
+        """Recorded page count of a PDF, or None if it has not been opened."""
+        row = self.connection.execute(
+            "SELECT n_pages FROM documents WHERE sha256 = ? AND extractor = ?",
+            (sha256, extractor),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, sha256: str, extractor: str, n_pages: int):
+        """Records the page count of a PDF, marking it as used now."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                (sha256, extractor, n_pages, time.time()),
+            )
+
+    def get_pages(
+        self, sha256: str, extractor: str, start: int = 0, stop: int = None
+    ) -> dict[int, str]:
+        """
+        Cached text for pages `start` to `stop` (0-based, exclusive).
+
+        Returns:
+            dict: {page index: text} for the pages found.
+        """
+        rows = self.connection.execute(
+            "SELECT page, text FROM pages WHERE sha256 = ? AND extractor = ? "
+            "AND page >= ? AND page < ?",
+            (sha256, extractor, start, stop if stop is not None else 2**62),
+        )
+        return dict(rows)
+
+    def put_pages(self, sha256: str, extractor: str, pages: list[tuple[int, str]]):
+        """Stores [(page index, text)] for a PDF."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                [(sha256, extractor, page, text) for page, text in pages],
+            )
+
+    def prune(self, max_mb: float = None, max_age_days: float = None) -> int:
+        """
+        Removes the pages of PDFs not converted for `max_age_days`, then of
+        the least recently converted PDFs until the cache holds at most
+        `max_mb` megabytes of text, and shrinks the file.
+
+        Args:
+            max_mb (float, optional): Largest size of the cached text.
+            max_age_days (float, optional): Maximum age since last use.
+
+        Returns:
+            int: Number of PDFs removed.
+        """
+        documents = self.connection.execute(
+            "SELECT d.sha256, d.extractor, d.last_used, "
+            "COALESCE(SUM(LENGTH(CAST(p.text AS BLOB))), 0) "
+            "FROM documents d LEFT JOIN pages p "
+            "ON p.sha256 = d.sha256 AND p.extractor = d.extractor "
+            "GROUP BY d.sha256, d.extractor ORDER BY d.last_used DESC"
+        ).fetchall()
+
+        min_used = time.time() - max_age_days * 86400 if max_age_days else 0
+        max_bytes = max_mb * 1_000_000 if max_mb else float("inf")
+        removed = []
+        total = 0
+        for sha256, extractor, last_used, n_bytes in documents:
+            total += n_bytes
+            # Once over the size limit, every less recently used PDF goes too
+            if (last_used or 0) < min_used or total > max_bytes:
+                removed.append((sha256, extractor))
+
+        with self.connection:
+            for table in ("pages", "documents"):
+                self.connection.executemany(
+                    f"DELETE FROM {table} WHERE sha256 = ? AND extractor = ?",
+                    removed,
+                )
+        self.connection.execute("VACUUM")
+        return len(removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Prune the cache of extracted PDF page text."
+    )
+    parser.add_argument("--path", type=Path, default=Path("data/page_cache.sqlite"))
+    parser.add_argument("--max-mb", type=float, default=None)
+    parser.add_argument("--max-age-days", type=float, default=None)
+    args = parser.parse_args()
+
+    if not args.path.exists():
+        print(f"No page cache at {args.path}")
+        return
+    cache = PageCache(args.path)
+    removed = cache.prune(args.max_mb, args.max_age_days)
+    print(f"Removed {removed} PDF(s) from {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@ import requests
 from bs4 import BeautifulSoup
 from pathlib import Path
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 from tqdm import tqdm
 from statschat import load_config
+from statschat.pdf_processing.content_store import ContentStore
+from statschat.pdf_processing.crawl_utils import CrawlState, Fetcher, FetchCache
 import re
 
 # %% Configuration
@@ -14,6 +17,11 @@ import re
 config = load_config(name="main")
 PDF_FILES = config["preprocess"]["download_mode"].upper()
 base_url = config["preprocess"]["download_site"].upper()
+crawl_config = config.get("crawl", {})
+CRAWL_WORKERS = crawl_config.get("workers", 8)
+CRAWL_PER_HOST = crawl_config.get("per_host_limit", 4)
+CRAWL_TIMEOUT = crawl_config.get("timeout", 30)
+CRAWL_MAX_PAGES = crawl_config.get("max_pages", 100)
 
 # Set directories
 BASE_DIR = Path.cwd().joinpath("data")
@@ -24,6 +32,9 @@ OUTPUT_URL_DIR = BASE_DIR.joinpath(
     "pdf_store" if PDF_FILES == "SETUP" else "latest_pdf_store"
 )
 ORIGINAL_URL_DICT_PATH = BASE_DIR.joinpath("pdf_store/url_dict.json")
+HTTP_CACHE_DIR = BASE_DIR.joinpath("http_cache")
+CRAWL_STATE_PATH = BASE_DIR.joinpath("crawl_state.json")
+PDF_OBJECTS_DIR = BASE_DIR.joinpath("pdf_objects")
 
 # Ensure directories exist
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -50,32 +61,62 @@ elif PDF_FILES == "UPDATE":
     url_dict = {}  # This will store only new entries
 
 
-page = 38  # Higher the number the older the publications
-# Set max pages for UPDATE mode
-max_pages = 100 if PDF_FILES == "SETUP" else 37  # Limit to 5 for updates
+# Safety limit on listing pages; UPDATE mode normally stops much earlier,
+# at the first listing page that only contains known reports
+max_pages = CRAWL_MAX_PAGES
+
+# Crawl frontier persisted between runs. SETUP rebuilds it from scratch, while
+# UPDATE seeds it with the report pages already recorded in url_dict.json
+if PDF_FILES == "SETUP":
+    crawl_state = CrawlState(CRAWL_STATE_PATH)
+else:
+    crawl_state = CrawlState.load(CRAWL_STATE_PATH)
+    crawl_state.visited_reports.update(
+        entry["report_page"]
+        for entry in original_url_dict.values()
+        if isinstance(entry, dict) and "report_page" in entry
+    )
+incremental = PDF_FILES == "UPDATE" and bool(crawl_state.visited_reports)
+
+# Shared keep-alive connection pool for every request made by the crawler.
+# Pages are revalidated against the on-disk cache, so unchanged pages come
+# back as 304s and are served locally.
+fetcher = Fetcher(
+    workers=CRAWL_WORKERS,
+    per_host=CRAWL_PER_HOST,
+    timeout=CRAWL_TIMEOUT,
+    cache=FetchCache(HTTP_CACHE_DIR),
+)
+
+# Records the hash of every downloaded PDF, so duplicates are found without
+# re-hashing them
+content_store = ContentStore(PDF_OBJECTS_DIR)
 
 # %% Scrape intermediate report pages and extract PDF links
 all_pdf_entries = {}  # {"pdf_url": "report_page", ...}
-visited_report_pages = set()
+# Report pages are only marked visited once scraped and their PDF downloaded
+visited_report_pages = crawl_state.visited_reports - crawl_state.failed_reports
+failed_reports = set()
 
-# %% Scrape PDF links from website
-all_pdf_links = []  # List to store all PDF URLs
-page = 1
 
-print("IN PROGRESS.")
-while True:
-    # Trigger page limit for UPDATE mode
-    if max_pages and page > max_pages:
-        print(f"Reached page limit ({max_pages}) for UPDATE mode. Stopping search.")
-        break
+def scrape_listing_page(page_num: int):
+    """
+    Collects the report page links listed on one page of the site.
+
+    Args:
+        page_num (int): Listing page number.
 
-    # Visit each page and extract report links
-    url = f"{base_url}{page}/"
-    response = requests.get(url)
+    Returns:
+        list | None: Unique report page URLs, or None if the page is unavailable.
+    """
+    url = f"{base_url}{page_num}/"
+    try:
+        response = fetcher.get(url)
+    except requests.RequestException:
+        response = None
 
-    if response.status_code != 200:
-        print(f"Failed to access {url}. Stopping search.")
-        break
+    if response is None or response.status_code != 200:
+        return None
 
     soup = BeautifulSoup(response.content, "html.parser")
 
@@ -87,40 +128,121 @@ while True:
         and not a["href"].startswith("https://www.knbs.or.ke/reports/kenya-census")
     ]
 
-    report_links = list(dict.fromkeys(report_links))
     # remove duplicate reports
-    if not report_links:
-        print(f"Reached page limit ({page}). Stopping search.")
-        break
+    return list(dict.fromkeys(report_links))
+
+
+def scrape_report_page(report_url: str):
+    """
+    Finds the first PDF link on a report page.
+
+    Args:
+        report_url (str): URL of the report page.
+
+    Returns:
+        str | None: URL of the PDF, "" if the page has no PDF, or None if the
+        page could not be read.
+    """
+    try:
+        report_response = fetcher.get(report_url)
+    except requests.RequestException:
+        report_response = None
+
+    if report_response is None or report_response.status_code != 200:
+        print(f"Failed to access report page: {report_url}")
+        return None
+
+    report_soup = BeautifulSoup(report_response.content, "html.parser")
+
+    pdf_links = report_soup.find("a", href=lambda href: href and href.endswith(".pdf"))
+    # if pdf link found - retain first one
+    return pdf_links["href"] if pdf_links else ""
+
+
+def collect_report_pdfs(executor: ThreadPoolExecutor, report_links: list) -> None:
+    """
+    Visits unseen report pages concurrently and stores their PDF links,
+    preserving the order in which the reports were listed. A report page
+    without a PDF is visited once scraped; one that could not be read is
+    recorded as failed.
+
+    Args:
+        executor (ThreadPoolExecutor): Pool used for the report page requests.
+        report_links (list): Report page URLs found on a listing page.
+    """
+    new_reports = [url for url in report_links if url not in visited_report_pages]
+
+    for report_url, pdf_link in zip(
+        new_reports, executor.map(scrape_report_page, new_reports)
+    ):
+        if pdf_link is None:
+            failed_reports.add(report_url)
+        elif pdf_link:
+            # Store the PDF URL and report page URL
+            all_pdf_entries[pdf_link] = report_url
+        else:
+            visited_report_pages.add(report_url)
+
+
+def crawl_site(executor: ThreadPoolExecutor) -> None:
+    """
+    Walks the listing pages and their report pages. Listing pages are fetched
+    a window at a time but read in order, so the crawl still stops at the
+    first missing or empty page. An incremental crawl reads one listing page
+    at a time and stops at the first one that holds no new reports.
+
+    Args:
+        executor (ThreadPoolExecutor): Pool shared by all crawler requests.
+    """
+    window_size = 1 if incremental else CRAWL_WORKERS
+    page = 1
+    while True:
+        window = [
+            p
+            for p in range(page, page + window_size)
+            if not max_pages or p <= max_pages
+        ]
+        if not window:
+            print(f"Reached page limit ({max_pages}). Stopping search.")
+            return
+
+        for page, report_links in zip(
+            window, executor.map(scrape_listing_page, window)
+        ):
+            if report_links is None:
+                print(f"Failed to access {base_url}{page}/. Stopping search.")
+                return
+            if not report_links:
+                print(f"Reached page limit ({page}). Stopping search.")
+                return
+            if incremental and crawl_state.is_known_page(page, report_links):
+                print(f"Page {page} only lists known reports. Stopping search.")
+                return
+
+            print(f"Found {len(report_links)} report pages on page {page}")
+            crawl_state.record_page(page, report_links)
+            collect_report_pdfs(executor, report_links)
+
+        page += 1
+
+
+def save_crawl_state() -> None:
+    """
+    Persists the crawl frontier. Report pages that could not be scraped, or
+    whose PDF failed to download, are recorded as failed rather than visited,
+    so that the next run visits them again.
+    """
+    # Failures from earlier runs stay failed until a later crawl reaches them
+    retried = visited_report_pages | failed_reports
+    crawl_state.failed_reports = failed_reports | (crawl_state.failed_reports - retried)
+    crawl_state.visited_reports = visited_report_pages - crawl_state.failed_reports
+    crawl_state.save()
+    print(f"Saved crawl state to {CRAWL_STATE_PATH}")
 
-    # print(report_links)
-    print(f"Found {len(report_links)} report pages on page {page}")
 
-    # Step 2: Visit each report page and extract PDF links
-    for report_url in report_links:
-        if report_url in visited_report_pages:
-            continue  # Skip already visited report pages
-
-        visited_report_pages.add(report_url)
-        report_response = requests.get(report_url)
-
-        if report_response.status_code != 200:
-            print(f"Failed to access report page: {report_url}")
-            continue
-
-        report_soup = BeautifulSoup(report_response.content, "html.parser")
-
-        pdf_links = report_soup.find(
-            "a", href=lambda href: href and href.endswith(".pdf")
-        )
-        # if pdf link found - retain first one
-        if pdf_links:
-            pdf_links = pdf_links["href"]
-            all_pdf_entries[
-                pdf_links
-            ] = report_url  # Store the PDF URL and report page URL
-
-    page += 1
+print("IN PROGRESS.")
+crawl_executor = ThreadPoolExecutor(max_workers=CRAWL_WORKERS)
+crawl_site(crawl_executor)
 
 print(f"Total PDFs found: {len(all_pdf_entries)}")
 
@@ -138,42 +260,81 @@ if PDF_FILES == "UPDATE":
         for pdf_url, report_page in all_pdf_entries.items()
         if pdf_url not in existing_urls
     }
+    # Reports whose PDF is already downloaded need nothing more
+    visited_report_pages.update(
+        report_page
+        for pdf_url, report_page in all_pdf_entries.items()
+        if pdf_url in existing_urls
+    )
 
     if not new_entries:
         print("No new PDFs found. Exiting update process.")
+        print(fetcher.stats.summary())
+        save_crawl_state()
         exit()
 
     print(f"Found {len(new_entries)} new PDFs to download.")
     all_pdf_entries = new_entries  # Replace with filtered dictionary
 
 # %% Download PDFs and Update URL Dictionary
-format = "[{elapsed}<{remaining}]{n_fmt}/{total_fmt}|{l_bar}{bar} {rate_fmt}{postfix}"
-for pdf, report_page in tqdm(
-    all_pdf_entries.items(),
-    desc="DOWNLOADING PDF FILES:",
-    bar_format=format,
-    colour="yellow",
-    total=len(all_pdf_entries),
-    dynamic_ncols=True,
-):
-    pdf_url = pdf
-    report_url = report_page
+
+
+def download_pdf(entry: tuple):
+    """
+    Downloads one PDF into DATA_DIR.
+
+    Args:
+        entry (tuple): (pdf_url, report_page) pair.
+
+    Returns:
+        tuple | None: (pdf_name, url_dict entry), or None if the download failed.
+    """
+    pdf_url, report_url = entry
     parsed_url = urlparse(pdf_url)
     pdf_name = Path(parsed_url.path).name
 
     file_path = DATA_DIR / pdf_name
 
-    # Download PDF
-    response = requests.get(pdf_url)
-
-    if response.status_code == 200:
-        with open(file_path, "wb") as file:
-            file.write(response.content)
+    # Stream the PDF to disk, resuming a partial download and keeping an
+    # unchanged local copy if the server answers 304
+    try:
+        sha256 = fetcher.download(pdf_url, file_path)
+    except requests.RequestException:
+        sha256 = None
 
-        # Store both pdf_url and report page
-        url_dict[pdf_name] = {"pdf_url": pdf_url, "report_page": report_url}
-    else:
+    if sha256 is None:
         print(f"Failed to download: {pdf_url}")
+        return None
+
+    content_store.add(file_path, sha256)
+
+    # Store pdf_url, report page and content hash
+    return pdf_name, {"pdf_url": pdf_url, "report_page": report_url, "sha256": sha256}
+
+
+format = "[{elapsed}<{remaining}]{n_fmt}/{total_fmt}|{l_bar}{bar} {rate_fmt}{postfix}"
+for (pdf_url, report_url), result in zip(
+    all_pdf_entries.items(),
+    tqdm(
+        crawl_executor.map(download_pdf, all_pdf_entries.items()),
+        desc="DOWNLOADING PDF FILES:",
+        bar_format=format,
+        colour="yellow",
+        total=len(all_pdf_entries),
+        dynamic_ncols=True,
+    ),
+):
+    if result is None:
+        failed_reports.add(report_url)
+        continue
+    visited_report_pages.add(report_url)
+    pdf_name, entry = result
+    url_dict[pdf_name] = entry
+
+crawl_executor.shutdown()
+print(fetcher.stats.summary())
+save_crawl_state()
+content_store.save()
 
 # %% Save New URL Dictionary to JSON (Only new entries)
 with open(url_dict_path, "w") as json_file:
@@ -3,6 +3,14 @@ from glob import glob
 from pathlib import Path
 from tqdm import tqdm
 from statschat import load_config
+from statschat.pdf_processing.archive_utils import (
+    archive_pdf_hashes,
+    is_archive,
+    is_compressed_tar,
+    member_key,
+)
+from statschat.pdf_processing.content_store import ContentStore, link_or_copy
+from statschat.pdf_processing.crawl_utils import file_sha256
 
 config = load_config(name="main")
 PDF_FILES = config["preprocess"]["download_mode"].upper()
@@ -13,11 +21,23 @@ DATA_DIR = BASE_DIR.joinpath(
     "pdf_store" if PDF_FILES == "SETUP" else "latest_pdf_store"
 )
 DATA_DIR.mkdir(parents=True, exist_ok=True)
+content_store = ContentStore(BASE_DIR.joinpath("pdf_objects"))
 url_dict = {}
 
+# Size, mtime and hash of every local PDF seen so far, so unchanged files
+# are neither re-copied nor re-hashed on the next run
+MANIFEST_PATH = BASE_DIR.joinpath("local_pdfs_manifest.json")
+if MANIFEST_PATH.exists():
+    with open(MANIFEST_PATH, "r") as json_file:
+        manifest = json.load(json_file)
+else:
+    manifest = {}
+
 pdf_files = glob(str(BASE_DIR / "local_pdfs" / "*.pdf"))
 print(f"Found {len(pdf_files)} PDFs in data/local_pdfs.")
 
+ingested = {"reflink": 0, "hardlink": 0, "copy": 0, "unchanged": 0}
+format = "[{elapsed}<{remaining}]{n_fmt}/{total_fmt}|{l_bar}{bar} {rate_fmt}{postfix}"
 for pdf in tqdm(
     pdf_files,
     desc="HANDLING LOCAL PDF FILES:",
@@ -30,11 +50,87 @@ for pdf in tqdm(
     pdf_name = pdf_path.name
     dest_path = DATA_DIR / pdf_name
 
-    # Copy the PDF file to DATA_DIR
-    if not dest_path.exists():
-        dest_path.write_bytes(pdf_path.read_bytes())
+    # A file with the same name is only skipped if its size and mtime match
+    stat = pdf_path.stat()
+    known = manifest.get(pdf_name, {})
+    unchanged = (
+        known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns
+    )
+    if unchanged:
+        sha256 = known["sha256"]
+    else:
+        sha256 = file_sha256(pdf_path)
+        manifest[pdf_name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+        }
+
+    # Link the PDF file into DATA_DIR (copying only as a last resort)
+    if unchanged and dest_path.exists():
+        ingested["unchanged"] += 1
+    else:
+        ingested[link_or_copy(pdf_path, dest_path)] += 1
+
+    content_store.add(dest_path, sha256)
+
+    url_dict[pdf_name] = {
+        "pdf_url": pdf_name,
+        "report_page": str(dest_path),
+        "sha256": sha256,
+    }
+
+print(", ".join(f"{count} {method}" for method, count in ingested.items()))
+
+# PDFs inside zip and plain tar archives are read in place by pdf_to_json.py,
+# so only their member names and hashes are recorded here. Members of
+# compressed tar archives are spooled into the content store in the same
+# single pass that hashes them, and read from there.
+archive_files = [
+    path for path in glob(str(BASE_DIR / "local_pdfs" / "*")) if is_archive(path)
+]
+print(f"Found {len(archive_files)} archives in data/local_pdfs.")
+
+for archive in archive_files:
+    archive_path = Path(archive)
+    stat = archive_path.stat()
+    spooled = is_compressed_tar(archive_path)
+    known = manifest.get(archive_path.name, {})
+    unchanged = (
+        known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns
+    )
+    if unchanged and spooled:
+        unchanged = all(
+            content_store.object_path(sha256).exists()
+            for sha256 in known["members"].values()
+        )
+    if unchanged:
+        member_hashes = known["members"]
+    else:
+        member_hashes = archive_pdf_hashes(archive_path, content_store)
+        manifest[archive_path.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "members": member_hashes,
+        }
+
+    for member_name, sha256 in member_hashes.items():
+        # Keyed by archive and full member path, so that members with the same
+        # filename in different folders or archives never overwrite each other
+        pdf_name = member_key(archive_path, member_name)
+        url_dict[pdf_name] = {
+            "pdf_url": pdf_name,
+            "report_page": str(archive_path),
+            "sha256": sha256,
+            "archive": str(archive_path),
+            "member": member_name,
+        }
+        if spooled:
+            url_dict[pdf_name]["object"] = str(content_store.object_path(sha256))
 
-    url_dict[pdf_name] = {"pdf_url": pdf_name, "report_page": str(dest_path)}
+with open(MANIFEST_PATH, "w") as json_file:
+    json.dump(manifest, json_file, indent=4)
+content_store.save()
 
 OUTPUT_URL_DIR = BASE_DIR.joinpath(
     "pdf_store" if PDF_FILES == "SETUP" else "latest_pdf_store"
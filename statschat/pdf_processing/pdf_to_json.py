@@ -1,16 +1,31 @@
 # %%
 # import modules
+import hashlib
 import os
-import PyPDF2
+import tempfile
+import traceback
 import json
 import re
+from contextlib import nullcontext
 from pathlib import Path
-import numpy as np
-from typing import List
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List
 from tqdm import tqdm
 from bs4 import BeautifulSoup
-from urllib.request import Request, urlopen
 from datetime import datetime
+from statschat.pdf_processing.archive_utils import ArchiveMember, source_sha256
+from statschat.pdf_processing.boilerplate import Boilerplate, find_boilerplate
+from statschat.pdf_processing.content_store import ContentStore
+from statschat.pdf_processing.crawl_utils import Fetcher, FetchCache
+from statschat.pdf_processing.jsonl_batches import (
+    BatchWriter,
+    drop_superseded,
+    dump_record,
+    list_batches,
+    migrate_legacy_json,
+)
+from statschat.pdf_processing.page_cache import COMMIT_EVERY, PageCache
+from statschat.pdf_processing.pdf_backends import DEFAULT_BACKEND, get_backend
 
 # %%
 # set relative paths
@@ -21,6 +36,18 @@ DATA_DIR = Path.cwd().joinpath("data/pdf_store")
 LATEST_DATA_DIR = Path.cwd().joinpath("data/latest_pdf_store")
 JSON_DIR = Path.cwd().joinpath("data/json_conversions")
 LATEST_JSON_DIR = Path.cwd().joinpath("data/latest_json_conversions")
+HTTP_CACHE_DIR = Path.cwd().joinpath("data/http_cache")
+PAGE_CACHE_PATH = Path.cwd().joinpath("data/page_cache.sqlite")
+
+# Report pages fetched by pdf_downloader.py within this many seconds are read
+# straight from the shared HTTP cache instead of being requested again
+REPORT_PAGE_MAX_AGE = 24 * 60 * 60
+report_fetcher = Fetcher(
+    workers=1, per_host=1, cache=FetchCache(HTTP_CACHE_DIR), max_age=REPORT_PAGE_MAX_AGE
+)
+
+# Extracted page text, keyed by (PDF hash, extractor version, page)
+page_cache = PageCache(PAGE_CACHE_PATH)
 
 
 def load_config(config_path: Path) -> dict:
@@ -51,6 +78,48 @@ def get_pdf_list(directory: Path) -> List[str]:
     return [pdf_file.stem for pdf_file in directory.glob("*.pdf")]
 
 
+def get_archived_pdf_list(url_dict: dict) -> List[str]:
+    """
+    Get the PDF filenames (without extensions) that are read directly from
+    zip/tar archive members rather than from files in the PDF store.
+
+    Args:
+        url_dict (dict): URL dictionary.
+
+    Returns:
+        list: List of PDF filenames (without extensions).
+    """
+    # Names include the member's folders, so only the extension is removed
+    return [
+        name[: -len(".pdf")]
+        for name, entry in url_dict.items()
+        if isinstance(entry, dict) and "archive" in entry
+    ]
+
+
+def get_pdf_source(pdf: str, pdf_dir: Path, url_dict: dict):
+    """
+    Locate a PDF, either as a file in `pdf_dir` or as an archive member.
+    Members of compressed tar archives are read from the copy spooled into
+    the content store by pdf_local_load.py, when it exists.
+
+    Args:
+        pdf (str): PDF filename (without extension).
+        pdf_dir (Path): Directory holding the PDF files.
+        url_dict (dict): URL dictionary.
+
+    Returns:
+        Path | ArchiveMember: Source that can be opened with `.open("rb")`.
+    """
+    entry = url_dict.get(f"{pdf}.pdf", {})
+    if "archive" in entry:
+        spooled = entry.get("object")
+        if spooled and not Path(spooled).exists():
+            spooled = None
+        return ArchiveMember(Path(entry["archive"]), entry["member"], spooled)
+    return pdf_dir.joinpath(f"{pdf}.pdf")
+
+
 def compare_pdfs(new_pdfs: List[str], old_pdfs: List[str]) -> List[str]:
     """
     Compare new and old PDFs and return a list of new PDFs to process.
@@ -65,6 +134,80 @@ def compare_pdfs(new_pdfs: List[str], old_pdfs: List[str]) -> List[str]:
     return [pdf for pdf in new_pdfs if pdf not in old_pdfs]
 
 
+def find_changed_pdfs(
+    new_pdfs: List[str],
+    old_pdfs: List[str],
+    url_dict: dict,
+    original_url_dict_path: Path,
+) -> List[str]:
+    """
+    Find PDFs that keep the name of a PDF already in the original store but
+    whose content (SHA-256) has changed.
+
+    Args:
+        new_pdfs (list): PDF filenames (without extensions) in the latest store.
+        old_pdfs (list): PDF filenames (without extensions) in the original store.
+        url_dict (dict): URL dictionary for the latest store.
+        original_url_dict_path (Path): url_dict.json of the original store.
+
+    Returns:
+        list: Names present in both stores with differing content hashes.
+    """
+    if not original_url_dict_path.exists():
+        return []
+
+    with open(original_url_dict_path, "r") as json_file:
+        original_url_dict = json.load(json_file)
+
+    changed = []
+    for pdf in new_pdfs:
+        if pdf not in old_pdfs:
+            continue
+        new_hash = url_dict.get(f"{pdf}.pdf", {}).get("sha256")
+        old_hash = original_url_dict.get(f"{pdf}.pdf", {}).get("sha256")
+        if new_hash and old_hash and new_hash != old_hash:
+            changed.append(pdf)
+
+    return changed
+
+
+def drop_byte_identical(
+    pdf_list: List[str], url_dict: dict, original_url_dict_path: Path
+) -> List[str]:
+    """
+    Remove PDFs whose SHA-256 (recorded by the downloader) matches a PDF that
+    is already in the original store.
+
+    Args:
+        pdf_list (list): PDF filenames (without extensions) to process.
+        url_dict (dict): URL dictionary for the PDFs in `pdf_list`.
+        original_url_dict_path (Path): url_dict.json of the original store.
+
+    Returns:
+        list: PDF filenames whose content has not been processed before.
+    """
+    if not original_url_dict_path.exists():
+        return pdf_list
+
+    with open(original_url_dict_path, "r") as json_file:
+        original_url_dict = json.load(json_file)
+
+    known_hashes = {
+        entry.get("sha256")
+        for entry in original_url_dict.values()
+        if isinstance(entry, dict) and entry.get("sha256")
+    }
+    new_pdfs = [
+        pdf
+        for pdf in pdf_list
+        if url_dict.get(f"{pdf}.pdf", {}).get("sha256") not in known_hashes
+    ]
+    if len(new_pdfs) < len(pdf_list):
+        print(f"Skipping {len(pdf_list) - len(new_pdfs)} byte-identical PDF(s).")
+
+    return new_pdfs
+
+
 def generate_latest_dir(original_dir: Path) -> Path:
     """
     Generate a "latest_" version of the given directory.
@@ -78,19 +221,26 @@ def generate_latest_dir(original_dir: Path) -> Path:
     return original_dir.parent / f"latest_{original_dir.name}"
 
 
-def get_name_and_meta(pdf_file_path):
+def get_name_and_meta(pdf_file_path, backend: str = DEFAULT_BACKEND, document=None):
     """Extracts file name and metadata from PDF
 
     Args:
         file_path (path): file path for PDF file
+        backend (str): PDF extraction backend, see `pdf_backends.BACKENDS`
+        document (optional): The PDF already opened with `backend`, so it
+            is not opened a second time.
 
     Returns:
         file_name: file for PDF file
         pdf_metadata: metadata for PDF (dates etc)
     """
     file_name = pdf_file_path.name
-    pdf_metadata = PyPDF2.PdfReader(pdf_file_path)
-    pdf_metadata = pdf_metadata.metadata
+    pdf_backend = get_backend(backend)
+    if document is not None:
+        pdf_metadata = pdf_backend.metadata(document)
+    else:
+        with pdf_backend.open(pdf_file_path) as document:
+            pdf_metadata = pdf_backend.metadata(document)
 
     return (file_name, pdf_metadata)
 
@@ -128,7 +278,7 @@ def extract_pdf_creation_date(metadata, filename: str, counter: int) -> tuple[st
     date from metadata, or the current system date as a final fallback.
 
     Args:
-        metadata: PDF metadata dictionary from PyPDF2.PdfReader (can be None).
+        metadata: PDF metadata dictionary from a PDF backend (can be None).
         filename (str): The filename from which to extract a year if needed.
         counter (int): A running count of files that lack reliable date information.
 
@@ -140,7 +290,7 @@ def extract_pdf_creation_date(metadata, filename: str, counter: int) -> tuple[st
     pdf_creation_date = None  # Initialize variable to store the extracted date.
 
     def preprocess_date(date_str: str) -> str:
-        """Extracts only the YYYYMMDD portion from a PyPDF2 date string."""
+        """Extracts only the YYYYMMDD portion from a PDF date string."""
         if date_str and date_str.startswith("D:"):
             date_str = date_str[2:10]  # Extract only YYYYMMDD
         return (
@@ -185,7 +335,7 @@ def extract_pdf_modification_date(metadata, pdf_creation_date: str) -> str:
     date.
 
     Args:
-        metadata: PDF metadata object from PyPDF2.PdfReader.
+        metadata: PDF metadata dictionary from a PDF backend.
         pdf_creation_date (str): The creation date to use as a fallback if
         modification date is missing or invalid.
 
@@ -199,8 +349,9 @@ def extract_pdf_modification_date(metadata, pdf_creation_date: str) -> str:
         '2019-04-24'  # Fallback to creation date
     """
     try:
-        # Extract modification date from metadata
-        pdf_modification_date = str(metadata.modification_date)[:10]
+        # Extract modification date (D:YYYYMMDD...) from metadata
+        raw_date = str(metadata.get("/ModDate", "")).removeprefix("D:")[:8]
+        pdf_modification_date = f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:8]}"
 
         # Parse the dates into datetime objects
         creation_date_obj = datetime.strptime(pdf_creation_date, "%Y-%m-%d")
@@ -216,13 +367,16 @@ def extract_pdf_modification_date(metadata, pdf_creation_date: str) -> str:
         return pdf_creation_date
 
 
-def extract_pdf_metadata(pdf_file_path: Path) -> tuple:
+def extract_pdf_metadata(
+    pdf_file_path: Path, backend: str = DEFAULT_BACKEND, document=None
+) -> tuple:
     """
     Extracts metadata from a given PDF file.
 
     Args:
         pdf_file_path (Path): The path to the PDF file.
-        counter (int): A running count of files missing reliable date information.
+        backend (str): PDF extraction backend.
+        document (optional): The PDF already opened with `backend`.
 
     Returns:
         tuple: (file_name, pdf_year, pdf_month,
@@ -230,43 +384,223 @@ def extract_pdf_metadata(pdf_file_path: Path) -> tuple:
     """
 
     # Extract filename and metadata
-    file_name, pdf_metadata = get_name_and_meta(pdf_file_path)
+    file_name, pdf_metadata = get_name_and_meta(pdf_file_path, backend, document)
     # Extract creation and modification dates
 
     return file_name, pdf_metadata
 
 
-def extract_pdf_text(pdf_file_path: Path, pdf_url: str) -> list:
+def contiguous_runs(indices: list[int]) -> list[tuple[int, int]]:
+    """
+    Groups sorted integers into (start, stop) runs of consecutive values.
+
+    Example:
+        >>> contiguous_runs([0, 1, 2, 5, 6, 9])
+        [(0, 3), (5, 7), (9, 10)]
+    """
+    runs = []
+    for index in indices:
+        if runs and runs[-1][1] == index:
+            runs[-1] = (runs[-1][0], index + 1)
+        else:
+            runs.append((index, index + 1))
+    return runs
+
+
+def parse_pages(pdf_backend, document, sha256: str, indices: list[int]) -> dict:
+    """
+    Extracts the text of the given pages and stores it in the page cache.
+
+    Args:
+        pdf_backend (PDFBackend): Backend the document was opened with.
+        document: Open document.
+        sha256 (str): Content hash of the PDF.
+        indices (list[int]): Sorted page indices (0-based) to extract.
+
+    Returns:
+        dict: {page index: text}.
+    """
+    texts = {}
+    for run_start, run_stop in contiguous_runs(indices):
+        run_texts = pdf_backend.iter_page_text(document, run_start, run_stop)
+        texts.update(enumerate(run_texts, start=run_start))
+
+    page_cache.put_pages(sha256, pdf_backend.version, list(texts.items()))
+    return texts
+
+
+def iter_page_texts(
+    pdf_backend, document, sha256: str, start: int = 0, stop: int = None
+) -> Iterator[str]:
+    """
+    Lazily yields the raw text of pages `start` to `stop` of an open PDF.
+    Pages are handled `COMMIT_EVERY` at a time: cached pages are read from
+    the page cache, the rest are parsed and committed to it, so at most one
+    batch of page text is held in memory and an interrupted run keeps its
+    work.
+
+    Args:
+        pdf_backend (PDFBackend): Backend the document was opened with.
+        document: Open document.
+        sha256 (str): Content hash of the PDF.
+        start (int): Index of the first page (0-based).
+        stop (int, optional): Index after the last page. Defaults to the end
+            of the document.
+
+    Yields:
+        str: Text of each page, in page order.
+    """
+    extractor = pdf_backend.version
+    n_pages = pdf_backend.page_count(document)
+    page_cache.set_page_count(sha256, extractor, n_pages)
+    stop = n_pages if stop is None else min(stop, n_pages)
+
+    for batch_start in range(start, stop, COMMIT_EVERY):
+        batch_stop = min(batch_start + COMMIT_EVERY, stop)
+        texts = page_cache.get_pages(sha256, extractor, batch_start, batch_stop)
+        missing = [i for i in range(batch_start, batch_stop) if i not in texts]
+        texts.update(parse_pages(pdf_backend, document, sha256, missing))
+
+        for page_index in range(batch_start, batch_stop):
+            yield texts.pop(page_index)
+
+
+def format_page(page_index: int, text: str, pdf_url: str) -> dict:
+    """
+    Builds the JSON record of one page.
+
+    Args:
+        page_index (int): Index of the page (0-based).
+        text (str): Raw page text.
+        pdf_url (str): The base URL where the document is hosted.
+
+    Returns:
+        dict: Page number, URL, and extracted text.
+    """
+    if text:
+        # Backends end lines with "\n" or "\r\n"; both are removed
+        text = re.sub(r"[\r\n]+", "", text)
+
+    page_num = page_index + 1
+    page_link = f"{pdf_url}#page={page_num}"
+    return {
+        "page_number": page_num,
+        "page_url": page_link,
+        "page_text": text or "",
+    }
+
+
+def iter_pdf_pages(
+    pdf_backend,
+    document,
+    pdf_url: str,
+    sha256: str,
+    strip_boilerplate: bool = True,
+) -> Iterator[dict]:
+    """
+    Lazily yields the JSON record of every page of an open PDF.
+
+    With `strip_boilerplate`, a first pass over the pages finds the running
+    headers, footers and page numbers repeated across most of the document,
+    which are removed from each page in the second pass. The first pass
+    fills the page cache, so the second only reads it back.
+
+    Args:
+        pdf_backend (PDFBackend): Backend the document was opened with.
+        document: Open document.
+        pdf_url (str): The base URL where the document is hosted.
+        sha256 (str): Content hash of the PDF.
+        strip_boilerplate (bool): Remove lines repeated across pages.
+
+    Yields:
+        dict: Page number, URL, and extracted text, in page order.
+    """
+    boilerplate = Boilerplate()
+    if strip_boilerplate:
+        boilerplate = find_boilerplate(iter_page_texts(pdf_backend, document, sha256))
+
+    page_texts = iter_page_texts(pdf_backend, document, sha256)
+    for page_index, text in enumerate(page_texts):
+        yield format_page(page_index, boilerplate.strip(text), pdf_url)
+
+
+def cache_page_range(
+    pdf_file_path: Path,
+    start: int,
+    stop: int,
+    backend: str = DEFAULT_BACKEND,
+    sha256: str = None,
+) -> int:
+    """
+    Extracts a range of pages into the page cache. Used to split very large
+    PDFs across several worker processes; `build_json` then reads the pages
+    back from the cache in order.
+
+    Args:
+        pdf_file_path (Path): The path to the PDF file, or an archive member.
+        start (int): Index of the first page to extract (0-based).
+        stop (int): Index after the last page to extract.
+        backend (str): PDF extraction backend.
+        sha256 (str, optional): Content hash of the PDF, computed if omitted.
+
+    Returns:
+        int: Number of pages in the range.
+    """
+    pdf_backend = get_backend(backend)
+    sha256 = sha256 or source_sha256(pdf_file_path)
+    cached = page_cache.get_pages(sha256, pdf_backend.version, start, stop)
+    if len(cached) >= stop - start:
+        return len(cached)
+
+    with pdf_backend.open(pdf_file_path) as document:
+        return sum(
+            1 for _ in iter_page_texts(pdf_backend, document, sha256, start, stop)
+        )
+
+
+def extract_pdf_text(
+    pdf_file_path: Path,
+    pdf_url: str,
+    backend: str = DEFAULT_BACKEND,
+    sha256: str = None,
+    strip_boilerplate: bool = True,
+) -> list:
     """
     Extracts text content from each page of a PDF file.
 
     Args:
-        pdf_file_path (Path): The path to the PDF file.
+        pdf_file_path (Path): The path to the PDF file, or an archive member.
         pdf_url (str): The base URL where the document is hosted.
+        backend (str): PDF extraction backend.
+        sha256 (str, optional): Content hash of the PDF, computed if omitted.
+        strip_boilerplate (bool): Remove headers and footers repeated across
+            pages.
 
     Returns:
         list: A list of dictionaries containing page number, URL, and extracted text.
     """
+    pdf_backend = get_backend(backend)
+    sha256 = sha256 or source_sha256(pdf_file_path)
+    with pdf_backend.open(pdf_file_path) as document:
+        return list(
+            iter_pdf_pages(pdf_backend, document, pdf_url, sha256, strip_boilerplate)
+        )
 
-    pages_text = []
-    with open(pdf_file_path, "rb") as pdf_file:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
 
-        for page_num, page in enumerate(pdf_reader.pages, start=1):
-            text = page.extract_text()
-            if text:
-                text = text.replace("\n", "")
+def publication_id(sha256: str, url: str) -> str:
+    """
+    Stable ID for a publication, derived from the PDF's content hash and its
+    source URL. Re-converting the same PDF always gives the same ID, and the
+    same file published at two URLs gives two IDs.
 
-            page_link = f"{pdf_url}#page={page_num}"
-            pages_text.append(
-                {
-                    "page_number": page_num,
-                    "page_url": page_link,
-                    "page_text": text or "",
-                }
-            )
+    Args:
+        sha256 (str): Content hash of the PDF.
+        url (str): URL of the PDF.
 
-    return pages_text
+    Returns:
+        str: 16 hex characters.
+    """
+    return hashlib.sha256(f"{sha256}\n{url}".encode()).hexdigest()[:16]
 
 
 def get_abstract_metadata(url: str) -> dict:  # noqa: C901
@@ -279,9 +613,10 @@ def get_abstract_metadata(url: str) -> dict:  # noqa: C901
     Returns:
         dict: Dictionary of abstract metadata.
     """
-    # Scrape PDF links from website
-    req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    web_byte = urlopen(req).read()
+    # Scrape PDF links from website (served from the HTTP cache when possible)
+    response = report_fetcher.get(url, headers={"User-Agent": "Mozilla/5.0"})
+    response.raise_for_status()
+    web_byte = response.content
 
     soup = BeautifulSoup(web_byte, features="html.parser")
 
@@ -414,27 +749,102 @@ def convert_to_date(date_str: str) -> str:
 
 
 def build_json(
-    pdf_file_path: Path, pdf_website_url: str, report_page: str, JSON_DIR: Path
-) -> int:
+    pdf_file_path: Path,
+    pdf_website_url: str,
+    report_page: str,
+    record_path: Path = None,
+    sha256: str = None,
+    aliases: list = None,
+    backend: str = DEFAULT_BACKEND,
+    document=None,
+    strip_boilerplate: bool = True,
+) -> Path:
     """
-    Processes a PDF file, extracts metadata and content, then saves it as JSON.
+    Processes a PDF file, extracts metadata and content, then saves it as a
+    JSON line.
 
     Args:
         pdf_file_path (Path): The path to the PDF file.
         pdf_website_url (str): The URL of the PDF document.
         report_page (str): The URL of the report page.
-        counter (int): A running count of files missing reliable date information.
-        JSON_DIR (Path): The path to the chosen json folder - latest or old
+        record_path (Path, optional): JSONL file the record is appended to.
+            A temporary file is created if omitted.
+        sha256 (str, optional): Content hash of the PDF, computed if omitted.
+        aliases (list, optional): Other filenames/URLs with identical content.
+        backend (str): PDF extraction backend, see `pdf_backends.BACKENDS`.
+        document (optional): The PDF already opened with `backend`; opened
+            here if omitted.
+        strip_boilerplate (bool): Remove headers and footers repeated across
+            pages.
 
     Returns:
-        int: Updated counter for files missing an explicit creation date.
+        Path: The JSONL file holding the record.
     """
 
     # Notify which file is being processed
     # print(f"Processing: {pdf_file_path.name}")
 
+    sha256 = sha256 or source_sha256(pdf_file_path)
+    pdf_backend = get_backend(backend)
+    if record_path is None:
+        # Workers spool their record to local disk; the parent process
+        # appends it to the current batch
+        fd, record_path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+
+    # Open the PDF once for both metadata and text
+    opened = (
+        nullcontext(document)
+        if document is not None
+        else pdf_backend.open(pdf_file_path)
+    )
+    with opened as document, open(record_path, "a") as record_file:
+        write_pdf_json(
+            pdf_file_path,
+            pdf_website_url,
+            report_page,
+            record_file,
+            sha256,
+            aliases,
+            pdf_backend,
+            document,
+            strip_boilerplate,
+        )
+
+    return Path(record_path)
+
+
+def write_pdf_json(
+    pdf_file_path: Path,
+    pdf_website_url: str,
+    report_page: str,
+    record_file,
+    sha256: str,
+    aliases: list,
+    pdf_backend,
+    document,
+    strip_boilerplate: bool = True,
+):
+    """
+    Builds the JSON record of an open PDF and writes it as one JSON line,
+    streaming the page text so memory use does not grow with document size.
+
+    Args:
+        pdf_file_path (Path): The path to the PDF file.
+        pdf_website_url (str): The URL of the PDF document.
+        report_page (str): The URL of the report page.
+        record_file: JSONL file opened for appending.
+        sha256 (str): Content hash of the PDF.
+        aliases (list): Other filenames/URLs with identical content.
+        pdf_backend (PDFBackend): Backend the document was opened with.
+        document: Open document.
+        strip_boilerplate (bool): Remove headers and footers repeated across
+            pages.
+    """
     # Extract Metadata & Pre-Process
-    file_name, pdf_metadata = extract_pdf_metadata(pdf_file_path)
+    file_name, pdf_metadata = extract_pdf_metadata(
+        pdf_file_path, pdf_backend.name, document
+    )
 
     try:
         # Construct the document's URL
@@ -458,9 +868,9 @@ def build_json(
 
     # Construct Ordered Metadata Dictionary
     pdf_info = {
-        "id": str(np.random.randint(1000000, 9999999)),  # Unique ID first
+        "id": publication_id(sha256, pdf_url),  # Stable unique ID first
         "title": file_name.replace(".pdf", "").replace("-", " ")
-        or pdf_metadata.title,  # Title next
+        or pdf_metadata.get("/Title"),  # Title next
         "release_date": pdf_creation_date,  # Release date field
         "modification_date": extract_pdf_modification_date(
             pdf_metadata, pdf_creation_date
@@ -469,28 +879,52 @@ def build_json(
         "theme": pdf_theme,  # Publication theme
         "release_type": pdf_release_type,  # Report, Survey, etc.
         "url": pdf_url,  # URL for document access
+        "file_name": pdf_file_path.name,  # Identifies the PDF across updates
+        "sha256": sha256,  # Content hash
+        "aliases": aliases or [],  # Duplicates published under other names
         "latest": True,  # Boolean flag for latest version
         "url_keywords": extract_url_keywords_from_filename(
             file_name
         ),  # Extracted keywords
         "contact_name": " ",  # Contact details
         "contact_link": " ",
-        "content": extract_pdf_text(
-            pdf_file_path, pdf_url
-        ),  # Extracted text at the end
+        "content": iter_pdf_pages(
+            pdf_backend, document, pdf_url, sha256, strip_boilerplate
+        ),  # Extracted text at the end, streamed page by page
     }
     # check if overview is equal to the title
     if pdf_info["overview"] == pdf_info["title"] + " ":
         pdf_info["overview"] = " "  # Set overview to empty string
 
-    # Export JSON
-    JSON_DIR.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
-    json_file_path = JSON_DIR / f"{pdf_file_path.stem}.json"
+    # Export JSON line
+    dump_record(pdf_info, record_file)
 
-    with open(json_file_path, "w") as json_file:
-        json.dump(pdf_info, json_file, indent=4)
 
-    return None
+def select_new_pdfs(new_pdfs: List[str], url_dict: dict, data_dir: Path) -> List[str]:
+    """
+    Select the PDFs of an UPDATE run that still need converting: new names,
+    known names whose content changed, minus byte-identical copies of PDFs
+    already in the original store.
+
+    Args:
+        new_pdfs (list): PDF filenames (without extensions) in the latest store.
+        url_dict (dict): URL dictionary for the latest store.
+        data_dir (Path): The original PDF store.
+
+    Returns:
+        list: PDF filenames (without extensions) to convert.
+    """
+    old_pdfs = get_pdf_list(data_dir)
+    original_url_dict_path = data_dir.joinpath("url_dict.json")
+    if original_url_dict_path.exists():
+        with open(original_url_dict_path, "r") as json_file:
+            old_pdfs += get_archived_pdf_list(json.load(json_file))
+
+    # Compare old and new PDFs
+    pdf_list = compare_pdfs(new_pdfs, old_pdfs)
+    pdf_list += find_changed_pdfs(new_pdfs, old_pdfs, url_dict, original_url_dict_path)
+
+    return drop_byte_identical(pdf_list, url_dict, original_url_dict_path)
 
 
 def normalize_dict_keys(file_dict: dict) -> dict:
@@ -507,13 +941,279 @@ def normalize_dict_keys(file_dict: dict) -> dict:
     return {os.path.normpath(k): v for k, v in file_dict.items()}
 
 
-def process_pdfs(mode: str, config: dict):
+def build_jobs(
+    content_groups: dict,
+    pdf_sources: dict,
+    url_dict: dict,
+    backend: str = DEFAULT_BACKEND,
+    strip_boilerplate: bool = True,
+) -> list[dict]:
+    """
+    Prepare one `build_json` job per unique PDF, recording the other
+    filenames with the same content as aliases.
+
+    Args:
+        content_groups (dict): {sha256: [filenames]} from `ContentStore.group`.
+        pdf_sources (dict): {filename: PDF path or archive member}.
+        url_dict (dict): URL dictionary for the PDFs.
+        backend (str): PDF extraction backend.
+        strip_boilerplate (bool): Remove headers and footers repeated across
+            pages.
+
+    Returns:
+        list[dict]: Keyword arguments for `build_json`.
+    """
+    jobs = []
+    for sha256, pdfs in content_groups.items():
+        pdf, duplicates = pdfs[0], pdfs[1:]
+        entry = url_dict.get(f"{pdf}.pdf", {})
+        jobs.append(
+            {
+                "pdf_file_path": pdf_sources[pdf],
+                "pdf_website_url": entry.get("pdf_url", "Unknown URL"),
+                "report_page": entry.get("report_page", "Unknown Overview URL"),
+                "sha256": sha256,
+                "aliases": [
+                    {
+                        "file_name": f"{duplicate}.pdf",
+                        "url": url_dict.get(f"{duplicate}.pdf", {}).get("pdf_url"),
+                    }
+                    for duplicate in duplicates
+                ],
+                "backend": backend,
+                "strip_boilerplate": strip_boilerplate,
+            }
+        )
+
+    return jobs
+
+
+def convert_pdf(job: dict, split_threshold: int = 0) -> tuple[str, str, int, Path]:
+    """
+    Runs `build_json` for one PDF, catching any error so that a single bad
+    file does not abort the batch. PDFs longer than `split_threshold` pages
+    are not converted here; their page count is returned instead so the
+    caller can spread the text extraction over several workers.
+
+    Args:
+        job (dict): Keyword arguments for `build_json`.
+        split_threshold (int): Page count above which the PDF is handed back
+            for page-range splitting. 0 disables splitting.
+
+    Returns:
+        tuple[str, str, int, Path]: The PDF filename, the formatted traceback
+        if the conversion failed (None otherwise), the page count if the PDF
+        needs splitting (None otherwise), and the JSONL file holding the
+        converted record.
+    """
+    name = job["pdf_file_path"].name
+    pdf_backend = get_backend(job.get("backend", DEFAULT_BACKEND))
+    try:
+        with pdf_backend.open(job["pdf_file_path"]) as document:
+            n_pages = pdf_backend.page_count(document)
+            if split_threshold and n_pages > split_threshold:
+                return name, None, n_pages, None
+            record_path = build_json(**job, document=document)
+    except Exception:
+        return name, traceback.format_exc(), None, None
+
+    return name, None, None, record_path
+
+
+def page_ranges(n_pages: int, range_size: int) -> list[tuple[int, int]]:
+    """
+    Splits `n_pages` into consecutive (start, stop) ranges of at most
+    `range_size` pages.
+    """
+    range_size = max(range_size, 1)
+    return [
+        (start, min(start + range_size, n_pages))
+        for start in range(0, n_pages, range_size)
+    ]
+
+
+def iter_conversions(
+    jobs: list[dict],
+    workers: int = 1,
+    split_threshold: int = 0,
+    range_size: int = 50,
+):
+    """
+    Converts PDFs, across a process pool when `workers` > 1. Each job spools
+    its record to its own temporary JSONL file, and results are yielded with
+    the job's index, so the caller can restore the job order.
+
+    With a pool, PDFs longer than `split_threshold` pages are split into
+    ranges of `range_size` pages that are extracted concurrently on the same
+    pool into the page cache. A final job then writes the JSON, reading the
+    pages back from the cache in order, so one very large PDF no longer
+    leaves the other workers idle at the end of a batch.
+
+    Args:
+        jobs (list[dict]): Keyword arguments for `build_json`, one per PDF.
+        workers (int): Number of worker processes.
+        split_threshold (int): Page count above which a PDF is split. 0
+            disables splitting.
+        range_size (int): Number of pages extracted by each split job.
+
+    Yields:
+        tuple[int, str, str, Path]: (job index, PDF filename, error or None,
+        record file or None) as conversions finish.
+    """
+    if workers <= 1:
+        for index, job in enumerate(jobs):
+            pdf_name, error, _, record_path = convert_pdf(job)
+            yield index, pdf_name, error, record_path
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {
+            executor.submit(convert_pdf, job, split_threshold): (index, job)
+            for index, job in enumerate(jobs)
+        }
+        # {id(job): pages extracted so far} for PDFs being extracted in ranges
+        split_pages = {}
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, job = pending.pop(future)
+                if "range" not in job:
+                    pdf_name, error, n_pages, record_path = future.result()
+                    if not n_pages:
+                        yield index, pdf_name, error, record_path
+                        continue
+
+                    split_pages[id(job)] = 0
+                    for start, stop in page_ranges(n_pages, range_size):
+                        range_future = executor.submit(
+                            cache_page_range,
+                            job["pdf_file_path"],
+                            start,
+                            stop,
+                            job.get("backend", DEFAULT_BACKEND),
+                            job.get("sha256"),
+                        )
+                        pending[range_future] = index, {
+                            "range": (start, stop, n_pages),
+                            "job": job,
+                        }
+                    continue
+
+                yield from collect_page_range(
+                    future, index, job, split_pages, pending, executor
+                )
+
+
+def collect_page_range(future, index, range_job, split_pages, pending, executor):
+    """
+    Records a finished range job of a split PDF. Once every page is in the
+    page cache, submits the final `build_json` job for the PDF.
+
+    Args:
+        future (Future): Completed `cache_page_range` call.
+        index (int): Index of the PDF's job.
+        range_job (dict): {"range": (start, stop, n_pages), "job": job}.
+        split_pages (dict): {id(job): pages extracted so far} for split PDFs.
+        pending (dict): In-flight futures, updated in place.
+        executor (ProcessPoolExecutor): Pool running the conversion.
+
+    Yields:
+        tuple[int, str, str, None]: (job index, PDF filename, error, None) if
+        the extraction failed.
+    """
+    job = range_job["job"]
+    _, _, n_pages = range_job["range"]
+    if id(job) not in split_pages:  # an earlier range of this PDF already failed
+        return
+
+    try:
+        split_pages[id(job)] += future.result()
+    except Exception:
+        del split_pages[id(job)]
+        yield index, job["pdf_file_path"].name, traceback.format_exc(), None
+        return
+
+    if split_pages[id(job)] < n_pages:
+        return
+
+    del split_pages[id(job)]
+    pending[executor.submit(convert_pdf, job)] = index, job
+
+
+def run_conversions(
+    jobs: list[dict],
+    json_dir: Path,
+    workers: int = 1,
+    split_threshold: int = 0,
+    range_size: int = 50,
+) -> tuple[list, dict]:
+    """
+    Converts all jobs under a single progress bar, appending the records to
+    JSONL batches in `json_dir` and collecting per-file errors, which are
+    reported once the batch has finished. Records are written in job order:
+    a record that finishes early waits until every earlier job has finished.
+
+    Args:
+        jobs (list[dict]): Keyword arguments for `build_json`, one per PDF.
+        json_dir (Path): Output directory for the JSONL batches.
+        workers (int): Number of worker processes.
+        split_threshold (int): Page count above which a PDF is extracted in
+            page ranges. 0 disables splitting.
+        range_size (int): Number of pages per range.
+
+    Returns:
+        tuple[list, dict]: Filenames of the PDFs converted, and
+        {filename: traceback} for the PDFs that failed.
+    """
+    converted = []
+    errors = {}
+    # {job index: (PDF filename, record file)} of jobs finished out of order
+    finished = {}
+    next_index = 0
+    conversions = iter_conversions(jobs, workers, split_threshold, range_size)
+    with BatchWriter(json_dir, prefix="conversions") as batches:
+        for index, pdf_name, error, record_path in tqdm(
+            conversions,
+            desc="Converting PDF file(s) to json(s)",
+            total=len(jobs),
+            colour="red",
+            dynamic_ncols=True,
+            bar_format=(
+                "[{elapsed}<{remaining}] {n_fmt}/{total_fmt}| "
+                "{l_bar}{bar} {rate_fmt}{postfix}"
+            ),
+        ):
+            if error:
+                errors[pdf_name] = error
+            finished[index] = pdf_name, None if error else record_path
+
+            # Flush the records of every job up to the first unfinished one
+            while next_index in finished:
+                pdf_name, record_path = finished.pop(next_index)
+                next_index += 1
+                if record_path:
+                    batches.write_file(record_path)
+                    converted.append(pdf_name)
+
+    if errors:
+        print(f"Failed to convert {len(errors)} PDF(s):")
+        for pdf_name, error in sorted(errors.items()):
+            print(f"--- {pdf_name} ---\n{error}")
+
+    return converted, errors
+
+
+def process_pdfs(mode: str, config: dict, workers: int = None):
     """
     Process PDFs based on the mode (SETUP or UPDATE).
 
     Args:
         mode (str): The download mode of operation ('SETUP' or 'UPDATE').
         config (dict): Configuration dictionary loaded from the config file.
+        workers (int, optional): Number of worker processes used for the
+            conversion. Defaults to `convert_workers` in `[preprocess]`;
+            0 uses every CPU core.
 
     Returns:
         None
@@ -526,7 +1226,6 @@ def process_pdfs(mode: str, config: dict):
         print("Running in SETUP mode: Processing all PDFs.")
         pdf_dir = DATA_DIR
         json_dir = JSON_DIR
-        pdf_list = get_pdf_list(pdf_dir)
 
     elif mode == "UPDATE":
         # Dynamically generate "latest" directories
@@ -534,17 +1233,6 @@ def process_pdfs(mode: str, config: dict):
         json_dir = generate_latest_dir(JSON_DIR)
         print("Running in UPDATE mode: Processing only new PDFs.")
 
-        # Compare old and new PDFs
-        new_pdfs = get_pdf_list(pdf_dir)
-        old_pdfs = get_pdf_list(DATA_DIR)
-        pdf_list = compare_pdfs(new_pdfs, old_pdfs)
-
-        if not pdf_list:
-            print("No new PDFs to process. Exiting.")
-            return
-
-        print(f"Found {len(pdf_list)} new PDFs to process.")
-
     # Load URL dictionary
     url_dict_path = pdf_dir.joinpath("url_dict.json")
     if not url_dict_path.exists():
@@ -556,28 +1244,55 @@ def process_pdfs(mode: str, config: dict):
 
     normalize_dict_keys(url_dict)
 
-    # Process PDFs
-    count = 0
-    for pdf in tqdm(
-        pdf_list,
-        desc="Converting PDF file(s) to json(s)",
-        total=len(url_dict),
-        colour="red",
-        dynamic_ncols=True,
-        bar_format=(
-            "[{elapsed}<{remaining}] {n_fmt}/{total_fmt}| "
-            "{l_bar}{bar} {rate_fmt}{postfix}"
-        ),
-    ):
-        pdf_path = pdf_dir.joinpath(f"{pdf}.pdf")
-        pdf_url = url_dict.get(f"{pdf}.pdf", {}).get("pdf_url", "Unknown URL")
-        report_page = url_dict.get(f"{pdf}.pdf", {}).get(
-            "report_page", "Unknown Overview URL"
+    # PDFs read directly from archive members have no file in pdf_dir
+    pdf_list = get_pdf_list(pdf_dir) + get_archived_pdf_list(url_dict)
+
+    if mode == "UPDATE":
+        pdf_list = select_new_pdfs(pdf_list, url_dict, DATA_DIR)
+
+        if not pdf_list:
+            print("No new PDFs to process. Exiting.")
+            return
+
+        print(f"Found {len(pdf_list)} new PDFs to process.")
+
+    # Group byte-identical PDFs so each unique file is processed only once
+    pdf_sources = {pdf: get_pdf_source(pdf, pdf_dir, url_dict) for pdf in pdf_list}
+    content_store = ContentStore(Path.cwd().joinpath("data/pdf_objects"))
+    content_groups = content_store.group(pdf_sources, url_dict)
+    content_store.save()
+    if len(content_groups) < len(pdf_list):
+        print(
+            f"{len(pdf_list) - len(content_groups)} duplicate PDF(s) will be "
+            "recorded as aliases."
         )
-        build_json(pdf_path, pdf_url, report_page, json_dir)
-        count += 1
 
-    print(f"Processed {count} PDFs. JSON files saved to {json_dir}.")
+    # Process PDFs
+    preprocess_config = config.get("preprocess", {})
+    backend = preprocess_config.get("pdf_backend", DEFAULT_BACKEND)
+    get_backend(backend).require()  # fail before starting the worker pool
+    strip_boilerplate = preprocess_config.get("strip_boilerplate", True)
+    jobs = build_jobs(content_groups, pdf_sources, url_dict, backend, strip_boilerplate)
+
+    if workers is None:
+        workers = preprocess_config.get("convert_workers", 1)
+    workers = workers or os.cpu_count()
+
+    # Conversions from before JSONL batches would otherwise be ignored
+    migrate_legacy_json(json_dir)
+    previous_batches = list_batches(json_dir)
+    converted, _ = run_conversions(
+        jobs,
+        json_dir,
+        workers,
+        split_threshold=preprocess_config.get("page_split_threshold", 0),
+        range_size=preprocess_config.get("page_range_size", 50),
+    )
+
+    # Re-converted PDFs replace their records from earlier runs
+    drop_superseded(previous_batches, set(converted))
+
+    print(f"Processed {len(converted)} PDFs. JSONL batches saved to {json_dir}.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+from statschat.pdf_processing.boilerplate import find_boilerplate
+
+BODIES = [
+    "The economy grew by 0.3% in the quarter.\nHouseholds spent more on services.",
+    "In March, prices rose faster than wages.\nRents increased in every region.",
+    "The labour market cooled slightly.\nVacancies fell for the tenth period.",
+    "In total, 2.1 million people were unemployed.\nInactivity was unchanged.",
+    "The trade deficit narrowed.\nExports of services rose to a record high.",
+    "The housing market slowed.\nMortgage approvals fell for a second month.",
+    "In the year to June, output rose by 1.1%.\nConstruction was flat.",
+    "The public sector borrowed less than forecast.\nDebt was 96% of GDP.",
+]
+
+
+def strip_pages(pages):
+    boilerplate = find_boilerplate(pages)
+    return [boilerplate.strip(page) for page in pages]
+
+
+def test_fused_header_stops_before_body_text():
+    # PyPDF2 glues the running header onto the first line of the body
+    pages = [
+        f"Economic Survey 2024 Page {n} of 8{body}"
+        for n, body in enumerate(BODIES, start=1)
+    ]
+
+    for body, page in zip(BODIES, strip_pages(pages)):
+        assert page == body
+
+
+def test_shared_first_word_is_kept():
+    bodies = ["The " + body.split(" ", 1)[1] for body in BODIES]
+    pages = [
+        f"Economic Survey 2024 Page {n} of 8{body}"
+        for n, body in enumerate(bodies, start=1)
+    ]
+
+    for body, page in zip(bodies, strip_pages(pages)):
+        assert page == body
+
+
+def test_fused_footer_is_removed():
+    pages = [f"{body}Page {n} of 8" for n, body in enumerate(BODIES, start=1)]
+
+    for body, page in zip(BODIES, strip_pages(pages)):
+        assert page == body
+
+
+def test_header_lines_and_page_numbers_are_removed():
+    pages = [
+        f"Labour market overview\n{body}\n{n}" for n, body in enumerate(BODIES, start=1)
+    ]
+
+    for body, page in zip(BODIES, strip_pages(pages)):
+        assert page.strip() == body
+
+
+def test_numeric_tables_are_kept():
+    pages = [
+        "\n".join(
+            f"{2010 + row} {row + page}.{row} {3 * row}.{page} {row}.{row + 1}"
+            for row in range(6)
+        )
+        for page in range(8)
+    ]
+
+    assert strip_pages(pages) == pages
+
+
+def test_mostly_boilerplate_page_is_not_emptied():
+    pages = [
+        f"Labour market overview\n{body}\nOffice for Statistics" for body in BODIES
+    ]
+    pages.append("Labour market overview\nAnnex\nOffice for Statistics")
+
+    assert strip_pages(pages)[-1] == pages[-1]
@@ -0,0 +1,74 @@
+import os
+
+from statschat.pdf_processing.content_store import ContentStore
+from statschat.pdf_processing.crawl_utils import file_sha256
+
+
+def write_pdf(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_add_records_the_hash_without_copying(tmp_path):
+    store = ContentStore(tmp_path / "pdf_objects")
+    pdf = write_pdf(tmp_path / "pdf_store" / "a.pdf", b"%PDF-1.4 a")
+
+    sha256 = store.add(pdf)
+    store.save()
+
+    assert sha256 == file_sha256(pdf)
+    assert not store.object_path(sha256).exists()
+    assert ContentStore(tmp_path / "pdf_objects").known_sha256(pdf) == sha256
+
+
+def test_changed_file_is_not_known(tmp_path):
+    store = ContentStore(tmp_path / "pdf_objects")
+    pdf = write_pdf(tmp_path / "a.pdf", b"%PDF-1.4 a")
+    store.add(pdf)
+
+    pdf.write_bytes(b"%PDF-1.4 changed")
+
+    assert store.known_sha256(pdf) is None
+
+
+def test_group_by_content(tmp_path):
+    store = ContentStore(tmp_path / "pdf_objects")
+    sources = {
+        "b": write_pdf(tmp_path / "b.pdf", b"%PDF-1.4 same"),
+        "a": write_pdf(tmp_path / "a.pdf", b"%PDF-1.4 same"),
+        "c": write_pdf(tmp_path / "c.pdf", b"%PDF-1.4 other"),
+    }
+
+    groups = store.group(sources, {"c.pdf": {"sha256": "recorded"}})
+
+    assert groups == {file_sha256(sources["a"]): ["a", "b"], "recorded": ["c"]}
+    assert store.aliases(file_sha256(sources["a"])) == [
+        sources["a"].resolve(),
+        sources["b"].resolve(),
+    ]
+
+
+def test_add_stream_writes_one_object_per_hash(tmp_path):
+    store = ContentStore(tmp_path / "pdf_objects")
+    source = write_pdf(tmp_path / "member.pdf", b"%PDF-1.4 member")
+
+    with open(source, "rb") as stream:
+        sha256 = store.add_stream(stream, chunk_size=4)
+    with open(source, "rb") as stream:
+        assert store.add_stream(stream) == sha256
+
+    assert store.object_path(sha256).read_bytes() == source.read_bytes()
+    assert [path.suffix for path in store.root.rglob("*") if path.is_file()] == [".pdf"]
+
+
+def test_save_drops_deleted_files(tmp_path):
+    store = ContentStore(tmp_path / "pdf_objects")
+    pdf = write_pdf(tmp_path / "a.pdf", b"%PDF-1.4 a")
+    sha256 = store.add(pdf)
+
+    os.remove(pdf)
+    store.save()
+
+    assert store.files == {}
+    assert store.aliases(sha256) == []
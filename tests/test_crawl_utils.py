@@ -0,0 +1,91 @@
+import hashlib
+
+from requests.structures import CaseInsensitiveDict
+
+from statschat.pdf_processing.crawl_utils import FetchCache, Fetcher, content_range
+
+BODY = b"%PDF-1.4 0123456789"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.request_headers = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.request_headers.append(headers or {})
+        return self.responses.pop(0)
+
+
+def fetcher_with(tmp_path, *responses):
+    fetcher = Fetcher(cache=FetchCache(tmp_path / "cache"))
+    fetcher.session = FakeSession(*responses)
+    return fetcher
+
+
+def test_content_range():
+    assert content_range(FakeResponse(206, headers={})) == (None, None)
+    range_headers = {"Content-Range": "bytes 100-199/500"}
+    assert content_range(FakeResponse(206, headers=range_headers)) == (100, 500)
+    unsatisfied = {"Content-Range": "bytes */500"}
+    assert content_range(FakeResponse(416, headers=unsatisfied)) == (None, 500)
+
+
+def test_download_resumes_a_partial_file(tmp_path):
+    dest = tmp_path / "a.pdf"
+    (tmp_path / "a.pdf.part").write_bytes(BODY[:5])
+    headers = {"Content-Range": f"bytes 5-{len(BODY) - 1}/{len(BODY)}"}
+    fetcher = fetcher_with(tmp_path, FakeResponse(206, BODY[5:], headers))
+
+    digest = fetcher.download("https://example.com/a.pdf", dest)
+
+    assert fetcher.session.request_headers[0]["Range"] == "bytes=5-"
+    assert dest.read_bytes() == BODY
+    assert digest == hashlib.sha256(BODY).hexdigest()
+    entry = fetcher.cache.lookup("https://example.com/a.pdf")
+    assert entry["size"] == len(BODY)
+    assert entry["sha256"] == digest
+
+
+def test_download_restarts_when_the_range_does_not_continue_the_file(tmp_path):
+    dest = tmp_path / "a.pdf"
+    (tmp_path / "a.pdf.part").write_bytes(b"stale")
+    wrong_start = {"Content-Range": f"bytes 0-{len(BODY) - 1}/{len(BODY)}"}
+    fetcher = fetcher_with(
+        tmp_path, FakeResponse(206, BODY, wrong_start), FakeResponse(200, BODY)
+    )
+
+    fetcher.download("https://example.com/a.pdf", dest)
+
+    assert "Range" not in fetcher.session.request_headers[1]
+    assert dest.read_bytes() == BODY
+
+
+def test_download_finalises_a_complete_partial_file(tmp_path):
+    dest = tmp_path / "a.pdf"
+    (tmp_path / "a.pdf.part").write_bytes(BODY)
+    complete = {"Content-Range": f"bytes */{len(BODY)}"}
+    fetcher = fetcher_with(tmp_path, FakeResponse(416, headers=complete))
+
+    digest = fetcher.download("https://example.com/a.pdf", dest)
+
+    assert dest.read_bytes() == BODY
+    assert digest == hashlib.sha256(BODY).hexdigest()
+    assert not (tmp_path / "a.pdf.part").exists()
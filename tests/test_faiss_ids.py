@@ -0,0 +1,131 @@
+import faiss
+import numpy as np
+import pytest
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_core.documents import Document
+
+from statschat.embedding.faiss_ids import (
+    compact_index,
+    ensure_id_mapped,
+    faiss_id,
+    labelled_vectors,
+    new_vector_store,
+    remove_chunks,
+    upsert_chunks,
+)
+from statschat.embedding.index_types import (
+    build_index,
+    describe_index,
+    empty_like,
+    supports_removal,
+)
+
+DIM = 8
+VECTORS = np.random.default_rng(0).normal(size=(200, DIM)).astype(np.float32)
+
+
+def documents(*chunk_ids):
+    return [
+        Document(page_content=chunk_id, metadata={"chunk_id": chunk_id})
+        for chunk_id in chunk_ids
+    ]
+
+
+def store_with(index_type, n_chunks=5):
+    index = build_index(index_type, VECTORS, {"nlist": 4})
+    db = new_vector_store(FakeEmbeddings(size=DIM), DIM, index)
+    chunk_ids = [f"chunk-{n}" for n in range(n_chunks)]
+    return upsert_chunks(db, documents(*chunk_ids), VECTORS[:n_chunks])
+
+
+def stored_chunks(db):
+    labels, _ = labelled_vectors(db)
+    return sorted(db.index_to_docstore_id[label] for label in labels.tolist())
+
+
+def test_faiss_id_is_stable_and_non_negative():
+    assert faiss_id("chunk-0") == faiss_id("chunk-0")
+    assert 0 <= faiss_id("chunk-0") < 2**63
+    assert faiss_id("chunk-0") != faiss_id("chunk-1")
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw", "sq8"])
+def test_upsert_replaces_chunks_with_the_same_id(index_type):
+    db = store_with(index_type)
+
+    upsert_chunks(db, documents("chunk-1", "chunk-5"), VECTORS[10:12])
+    compact_index(db)
+
+    assert db.index.ntotal == 6
+    assert stored_chunks(db) == [f"chunk-{n}" for n in range(6)]
+    label = faiss_id("chunk-1")
+    labels, vectors = labelled_vectors(db)
+    stored = vectors[labels.tolist().index(label)]
+    assert np.allclose(stored, VECTORS[10], atol=0.1)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw", "sq8"])
+def test_remove_chunks_and_compact(index_type):
+    db = store_with(index_type)
+
+    assert remove_chunks(db, ["chunk-0", "chunk-3", "unknown"]) == 2
+    compact_index(db)
+
+    assert db.index.ntotal == 3
+    assert stored_chunks(db) == ["chunk-1", "chunk-2", "chunk-4"]
+    assert db.docstore.search("chunk-0") == "ID chunk-0 not found."
+    found = db.similarity_search_by_vector(VECTORS[4].tolist(), k=1)
+    assert found[0].metadata["chunk_id"] == "chunk-4"
+
+
+def test_positional_store_is_converted_to_chunk_ids():
+    db = new_vector_store(FakeEmbeddings(size=DIM), DIM)
+    db.index = faiss.IndexFlatL2(DIM)
+    db.index.add(VECTORS[:2])
+    db.index_to_docstore_id = {0: "chunk-0", 1: "chunk-1"}
+    db.docstore.add(
+        {doc.metadata["chunk_id"]: doc for doc in documents("chunk-0", "chunk-1")}
+    )
+
+    ensure_id_mapped(db)
+
+    assert sorted(db.index_to_docstore_id) == sorted(
+        [faiss_id("chunk-0"), faiss_id("chunk-1")]
+    )
+    assert remove_chunks(db, ["chunk-0"]) == 1
+    assert db.index.ntotal == 1
+
+
+@pytest.mark.parametrize(
+    "index_type, removable",
+    [("flat", True), ("ivf_flat", True), ("hnsw", False), ("sq8", True)],
+)
+def test_supports_removal(index_type, removable):
+    assert supports_removal(store_with(index_type).index) is removable
+
+
+@pytest.mark.parametrize(
+    "index_type, description",
+    [
+        ("flat", {"type": "flat"}),
+        ("ivf_flat", {"type": "ivf_flat", "nlist": 4, "nprobe": 16}),
+        ("hnsw", {"type": "hnsw", "hnsw_m": 32, "ef_search": 64}),
+        ("sq8", {"type": "sq8"}),
+    ],
+)
+def test_describe_and_empty_like(index_type, description):
+    index = store_with(index_type).index
+
+    empty = empty_like(index)
+
+    assert describe_index(index) == description
+    assert describe_index(empty) == description
+    assert empty.ntotal == 0
+    assert empty.is_trained
+
+
+def test_unknown_index_type_and_params_are_rejected():
+    with pytest.raises(ValueError, match="Unknown index_type"):
+        build_index("lsh", VECTORS)
+    with pytest.raises(ValueError, match="Unknown index_params"):
+        build_index("flat", VECTORS, {"n_list": 4})
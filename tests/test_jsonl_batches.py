@@ -0,0 +1,70 @@
+import json
+import os
+
+from statschat.pdf_processing.jsonl_batches import (
+    BatchWriter,
+    drop_superseded,
+    iter_records,
+    list_batches,
+    migrate_legacy_json,
+)
+
+
+def records(*names):
+    return [{"file_name": name, "content": [{"page_text": name}]} for name in names]
+
+
+def test_batches_are_split_and_read_back_in_order(tmp_path):
+    with BatchWriter(tmp_path, records_per_batch=2) as batches:
+        for record in records("a", "b", "c"):
+            batches.write(record)
+
+    assert len(list_batches(tmp_path)) == 2
+    assert list(iter_records(tmp_path)) == records("a", "b", "c")
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_generators_are_streamed_as_lists(tmp_path):
+    with BatchWriter(tmp_path) as batches:
+        batches.write({"file_name": "a", "content": (page for page in [1, 2])})
+
+    assert list(iter_records(tmp_path)) == [{"file_name": "a", "content": [1, 2]}]
+
+
+def test_batches_are_ordered_by_timestamp_not_prefix(tmp_path):
+    (tmp_path / "legacy-20200101000000-1-0000.jsonl").write_text('{"n": 1}\n')
+    (tmp_path / "conversions-20240101000000-1-0000.jsonl").write_text('{"n": 2}\n')
+    (tmp_path / "conversions-20240101000000-1-0001.jsonl").write_text('{"n": 3}\n')
+
+    assert [record["n"] for record in iter_records(tmp_path)] == [1, 2, 3]
+
+
+def test_drop_superseded_rewrites_only_affected_batches(tmp_path):
+    with BatchWriter(tmp_path, records_per_batch=2) as batches:
+        for record in records("a", "b", "c"):
+            batches.write(record)
+    first, second = list_batches(tmp_path)
+    untouched = second.stat().st_mtime_ns
+
+    removed = drop_superseded(list_batches(tmp_path), {"b"})
+
+    assert removed == 1
+    assert [record["file_name"] for record in iter_records(tmp_path)] == ["a", "c"]
+    assert second.stat().st_mtime_ns == untouched
+
+
+def test_legacy_json_files_are_migrated_once(tmp_path):
+    with BatchWriter(tmp_path, prefix="conversions") as batches:
+        batches.write(records("a")[0])
+    for record in records("a", "old"):
+        path = tmp_path / f"{record['file_name']}.json"
+        path.write_text(json.dumps(record))
+        os.utime(path, (1e9, 1e9))
+    (tmp_path / "broken.json").write_text("{")
+
+    assert migrate_legacy_json(tmp_path) == 1
+    assert migrate_legacy_json(tmp_path) == 0
+
+    # The legacy batch is dated by its files, so it is read first
+    assert list(iter_records(tmp_path)) == records("old", "a")
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["broken.json"]
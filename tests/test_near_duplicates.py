@@ -0,0 +1,58 @@
+import numpy as np
+
+from statschat.embedding.near_duplicates import (
+    MERSENNE_PRIME,
+    NearDuplicateFilter,
+    lsh_bands,
+    mod_mersenne,
+)
+
+BOILERPLATE = (
+    "The Kenya National Bureau of Statistics is the principal government agency "
+    "responsible for the collection, analysis and dissemination of statistical "
+    "data in Kenya, and the custodian of official statistical information."
+)
+OTHER = (
+    "Consumer prices rose by 6.8 percent in the year to March, driven by food, "
+    "transport and housing costs across urban and rural households."
+)
+
+
+def test_near_duplicates_are_dropped():
+    near_duplicates = NearDuplicateFilter(threshold=0.8)
+
+    keep = near_duplicates.keep([BOILERPLATE, OTHER, BOILERPLATE + " Nairobi."])
+
+    assert keep == [True, True, False]
+    assert near_duplicates.n_dropped == 1
+    assert near_duplicates.chars_dropped == len(BOILERPLATE) + len(" Nairobi.")
+
+
+def test_state_is_kept_across_batches():
+    near_duplicates = NearDuplicateFilter()
+
+    assert near_duplicates.keep([BOILERPLATE]) == [True]
+    assert near_duplicates.keep([OTHER, BOILERPLATE]) == [True, False]
+
+
+def test_added_texts_are_not_kept_again():
+    near_duplicates = NearDuplicateFilter()
+
+    near_duplicates.add([BOILERPLATE])
+
+    assert near_duplicates.keep([BOILERPLATE, OTHER]) == [False, True]
+
+
+def test_lsh_bands_split_every_permutation():
+    bands, rows = lsh_bands(0.9, 128)
+
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.9) < 0.1
+
+
+def test_mod_mersenne_matches_python_modulo():
+    values = np.random.default_rng(0).integers(0, 2**63, 1000, dtype=np.uint64)
+
+    expected = [int(value) % int(MERSENNE_PRIME) for value in values]
+
+    assert mod_mersenne(values).tolist() == expected
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+SentenceTransformer = pytest.importorskip("sentence_transformers").SentenceTransformer
+
+from statschat.embedding.onnx_embeddings import (  # noqa: E402
+    MAX_FP32_DRIFT,
+    MAX_INT8_DRIFT,
+    PARITY_TEXTS,
+    OnnxEmbeddings,
+    cosine_drift,
+    export_onnx,
+)
+
+# Small model with the same architecture as the configured one
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+@pytest.fixture(scope="module")
+def onnx_root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("onnx_models")
+    export_onnx(MODEL_NAME, root, quantize=True)
+    return root
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return SentenceTransformer(MODEL_NAME, device="cpu").encode(PARITY_TEXTS)
+
+
+@pytest.mark.parametrize(
+    "quantize, max_drift", [(False, MAX_FP32_DRIFT), (True, MAX_INT8_DRIFT)]
+)
+def test_onnx_vectors_match_pytorch(onnx_root, reference, quantize, max_drift):
+    model = OnnxEmbeddings(MODEL_NAME, onnx_root, quantize=quantize)
+
+    drift = cosine_drift(reference, model.embed_documents(PARITY_TEXTS))
+
+    assert drift.max() <= max_drift
@@ -0,0 +1,35 @@
+import numpy as np
+
+from statschat.embedding.redundancy import RedundancyFilter
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_redundant_vectors_are_dropped():
+    distinct = vectors(3)
+    batch = np.vstack([distinct, 2 * distinct[0], distinct[1] + 1e-4])
+
+    redundancy = RedundancyFilter(threshold=0.99)
+
+    assert redundancy.keep(batch) == [True, True, True, False, False]
+    assert redundancy.n_dropped == 2
+    assert redundancy.index.ntotal == 3
+
+
+def test_state_is_kept_across_batches():
+    distinct = vectors(4)
+    redundancy = RedundancyFilter(threshold=0.99, batch_size=2)
+
+    assert redundancy.keep(distinct[:3]) == [True, True, True]
+    assert redundancy.keep(np.vstack([distinct[3], distinct[0]])) == [True, False]
+
+
+def test_added_vectors_are_not_kept_again():
+    distinct = vectors(3)
+    redundancy = RedundancyFilter(threshold=0.99)
+
+    redundancy.add(distinct[:2])
+
+    assert redundancy.keep(distinct) == [False, False, True]